@@ -1,75 +1,242 @@
 # app/api/content.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Any, AsyncGenerator, Dict, Optional
+from uuid import UUID, uuid4
 import json
-import asyncio
+import logging
+import time
 
+from app.api.sse import FlushPolicy, event_stream
+from app.exceptions import AIServiceException
+from app.schemas import BatchGenerateRequest
+from config.settings import settings
 from app.services.content_service import ContentService
+from app.services.conversation_store import ConversationStore
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 content_service = ContentService()
+conversation_store = ConversationStore.from_settings()
 
 class ChatRequest(BaseModel):
     message: str
     stream: Optional[bool] = True
+    # Continue an existing conversation; a new one is started when omitted
+    conversation_id: Optional[UUID] = None
+    # SSE batching overrides (defaults come from settings)
+    flush_mode: Optional[str] = Field(None, pattern="^(chunk|word|interval)$")
+    flush_interval_ms: Optional[int] = Field(None, ge=0, le=5000)
+    flush_max_chars: Optional[int] = Field(None, ge=1, le=65536)
+    # Routing budget override (default comes from settings)
+    latency_budget_ms: Optional[float] = Field(None, gt=0)
 
 class QuickRequest(BaseModel):
     prompt: str
+    latency_budget_ms: Optional[float] = Field(None, gt=0)
 
 class ContentResponse(BaseModel):
     success: bool
     content: str
     message: str
+    metadata: Optional[Dict[str, Any]] = None
 
 @router.post("/chat")
 async def chat_with_ai(request: ChatRequest):
     """Main chat endpoint with streaming support"""
+    conversation_id = None
+    context = ""
+    if settings.conversations_enabled:
+        conversation_id = request.conversation_id or uuid4()
+        if settings.context_enabled:
+            if request.conversation_id is not None:
+                context = await _conversation_context(conversation_id)
+            content_service.context_builder.add_turn(conversation_id, "user", request.message)
+        # Queued for the background writer; never waits on the database
+        conversation_store.record(conversation_id, "user", request.message)
     try:
         if request.stream:
-            async def generate():
-                yield "data: " + json.dumps({"type": "start", "content": ""}) + "\n\n"
-                
-                async for chunk in content_service.generate_streaming_content(request.message):
-                    data = {"type": "chunk", "content": chunk}
-                    yield "data: " + json.dumps(data) + "\n\n"
-                    await asyncio.sleep(0.01)
-                
-                yield "data: " + json.dumps({"type": "end", "content": ""}) + "\n\n"
-            
+            policy = FlushPolicy(
+                mode=request.flush_mode,
+                interval_ms=request.flush_interval_ms,
+                max_chars=request.flush_max_chars
+            )
+            route_info = {}
+            chunks = content_service.generate_streaming_content(
+                request.message, route_info, request.latency_budget_ms, context
+            )
+            headers = {
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive"
+            }
+            if conversation_id is not None:
+                route_info["conversation_id"] = str(conversation_id)
+                headers["X-Conversation-Id"] = str(conversation_id)
+                chunks = _record_streamed_reply(chunks, conversation_id, route_info)
+
             return StreamingResponse(
-                generate(),
+                event_stream(chunks, policy, end_metadata=route_info),
                 media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive"
-                }
+                headers=headers
             )
         else:
-            result = await content_service.generate_quick_response(request.message)
+            result, metadata = await content_service.generate_with_metadata(
+                request.message, request.latency_budget_ms, context
+            )
+            response_metadata = {"routing": metadata}
+            if conversation_id is not None:
+                _remember_reply(conversation_id, result, metadata)
+                response_metadata["conversation_id"] = str(conversation_id)
             return ContentResponse(
                 success=True,
                 content=result,
-                message="Content generated successfully"
+                message="Content generated successfully",
+                metadata=response_metadata
             )
+    except AIServiceException:
+        raise  # 503 from the registered handler
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
+async def _record_streamed_reply(chunks: AsyncGenerator[str, None], conversation_id: UUID,
+                                 route_info: dict) -> AsyncGenerator[str, None]:
+    """Pass chunks through and queue the assembled reply once the stream has completed"""
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    finally:
+        await chunks.aclose()
+    # Only a completed reply is stored: a failed stream ends with its error text
+    # and an interrupted one is cut short, and either would be fed back to the
+    # model as the assistant's turn
+    if parts and route_info.get("backend") and not route_info.get("error"):
+        metadata = {k: v for k, v in route_info.items() if k != "conversation_id"}
+        _remember_reply(conversation_id, "".join(parts), metadata)
+
+async def _conversation_context(conversation_id: UUID) -> str:
+    """
+    History to send with a follow-up. Recent messages are loaded when this
+    process has not seen the conversation, or has fallen behind the store
+    because other workers (or instances) answered its later turns.
+    """
+    builder = content_service.context_builder
+    try:
+        stored = await conversation_store.message_count(conversation_id)
+        if builder.is_behind(conversation_id, stored):
+            builder.forget(conversation_id)
+            builder.stale_reloads += 1
+        if conversation_id not in builder:
+            turns = await conversation_store.recent_messages(conversation_id, settings.context_hydrate_messages)
+            builder.hydrate(conversation_id, turns, stored)
+    except Exception as e:
+        # Answer with what this process has (or without history) rather than fail the message
+        logger.warning("context_load_failed", extra={"conversation_id": str(conversation_id), "error": str(e)})
+    return builder.render(conversation_id)
+
+def _remember_reply(conversation_id: UUID, content: str, metadata: dict) -> None:
+    """Queue the assistant's reply for storage and add it to the conversation's context"""
+    conversation_store.record(conversation_id, "assistant", content, metadata)
+    if settings.context_enabled:
+        content_service.context_builder.add_turn(conversation_id, "assistant", content)
+
 @router.post("/quick", response_model=ContentResponse)
 async def quick_generate(request: QuickRequest):
     """Quick generation endpoint"""
     try:
-        result = await content_service.generate_quick_response(request.prompt)
+        result, metadata = await content_service.generate_with_metadata(
+            request.prompt, request.latency_budget_ms
+        )
         return ContentResponse(
             success=True,
             content=result,
-            message="Content generated successfully"
+            message="Content generated successfully",
+            metadata={"routing": metadata}
         )
+    except AIServiceException:
+        raise  # 503 from the registered handler
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
+@router.post("/batch")
+async def batch_generate(request: BatchGenerateRequest, http_request: Request):
+    """Generate many prompts concurrently, streaming one NDJSON line per result as it finishes"""
+    concurrency = min(
+        request.concurrency or settings.batch_default_concurrency,
+        settings.batch_max_concurrency
+    )
+    return StreamingResponse(
+        _batch_lines(request, concurrency, http_request),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+async def _batch_lines(request: BatchGenerateRequest, concurrency: int,
+                       http_request: Request) -> AsyncGenerator[bytes, None]:
+    started = time.perf_counter()
+    succeeded = failed = 0
+    reserved = 0
+    admit = None
+    # Admission let the request in for one token and one slot
+    admission = getattr(http_request.state, "admission", None)
+    if admission is not None:
+        client = http_request.state.admission_client
+        # Run only as many more at once as there are free slots
+        reserved = admission.reserve(min(concurrency, len(request.items)) - 1)
+        concurrency = 1 + reserved
+
+        async def admit(index: int) -> None:
+            # Every item after the first waits for its own token
+            if index:
+                await admission.pace(client)
+
+    results = content_service.generate_batch([item.prompt for item in request.items], concurrency, admit)
+    try:
+        async for index, content, metadata, error in results:
+            line = {"type": "result", "index": index, "content_type": request.items[index].content_type}
+            if error is None:
+                succeeded += 1
+                line.update(status="ok", content=content, metadata=metadata)
+            else:
+                failed += 1
+                line.update(status="error", error={
+                    "message": getattr(error, "message", str(error)),
+                    "error_code": getattr(error, "error_code", None) or "GENERATION_FAILED",
+                }, metadata=metadata)
+            yield json.dumps(line).encode() + b"\n"
+    finally:
+        await results.aclose()
+        for _ in range(reserved):
+            admission.release()
+    yield json.dumps({
+        "type": "summary",
+        "total": len(request.items),
+        "succeeded": succeeded,
+        "failed": failed,
+        "concurrency": concurrency,
+        "elapsed": round(time.perf_counter() - started, 3),
+    }).encode() + b"\n"
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Response cache hit/miss/eviction counters, plus the semantic cache's when enabled"""
+    stats = content_service.response_cache.stats()
+    if content_service.semantic_cache is not None:
+        stats["semantic"] = content_service.semantic_cache.stats()
+    return stats
+
+@router.get("/backends")
+async def backend_stats():
+    """Per-backend latency, error rate and load as seen by the router, plus hedging counters"""
+    stats = content_service.router.stats()
+    if content_service.hedger is not None:
+        stats["hedging"] = content_service.hedger.stats()
+    return stats
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1,84 @@
+# app/api/conversations.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from uuid import UUID
+import asyncio
+
+from app.api.content import content_service, conversation_store
+from app.schemas import (
+    ConversationDetailResponse, ConversationListResponse, ConversationResponse,
+    MessageResponse, PaginationParams
+)
+
+router = APIRouter()
+
+# How long a read waits for queued writes before answering with what is stored
+READ_FLUSH_TIMEOUT_SECONDS = 2.0
+
+@router.get("", response_model=ConversationListResponse)
+async def list_conversations(
+    params: PaginationParams = Depends(),
+    user_id: Optional[str] = None,
+    include_archived: bool = False
+):
+    """Conversations a page at a time; follow next_cursor for the next page"""
+    return _list_response(
+        await conversation_store.list_conversations(params, user_id, include_archived)
+    )
+
+@router.get("/search", response_model=ConversationListResponse)
+async def search_conversations(
+    q: str = Query(..., min_length=1, max_length=255, description="Words to find in message content"),
+    params: PaginationParams = Depends(),
+    user_id: Optional[str] = None,
+    include_archived: bool = False
+):
+    """Conversations with a message containing every word of q (the last may be a prefix)"""
+    params = params.model_copy(update={"search": q})
+    return _list_response(
+        await conversation_store.list_conversations(params, user_id, include_archived)
+    )
+
+def _list_response(page: dict) -> ConversationListResponse:
+    page["conversations"] = [ConversationResponse.model_validate(c) for c in page["conversations"]]
+    return ConversationListResponse(**page)
+
+@router.get("/stats")
+async def conversation_store_stats():
+    """Write-behind queue counters and conversation context (trimming/summary) counters"""
+    stats = conversation_store.stats()
+    stats["context"] = content_service.context_builder.stats()
+    return stats
+
+@router.get("/{conversation_id}", response_model=ConversationDetailResponse)
+async def get_conversation(conversation_id: UUID):
+    """A conversation with all of its messages, oldest first"""
+    try:
+        await asyncio.wait_for(conversation_store.flush(), READ_FLUSH_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+    conversation = await conversation_store.get_conversation(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return ConversationDetailResponse(
+        id=conversation.id,
+        title=conversation.title,
+        user_id=conversation.user_id,
+        created_at=conversation.created_at,
+        updated_at=conversation.updated_at,
+        is_archived=conversation.is_archived,
+        message_count=conversation.message_count,
+        last_message=conversation.last_message,
+        messages=[
+            MessageResponse(
+                id=message.id,
+                conversation_id=message.conversation_id,
+                role=message.role,
+                content=message.content,
+                created_at=message.created_at,
+                metadata=message.message_metadata
+            )
+            for message in conversation.messages
+        ]
+    )
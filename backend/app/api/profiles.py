@@ -0,0 +1,32 @@
+# app/api/profiles.py
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+import json
+
+from app.profiling import Profiler
+
+router = APIRouter()
+profiler = Profiler.from_settings()
+
+@router.get("")
+async def list_profiles():
+    """Stored request profiles, newest first"""
+    return {"profiler": profiler.stats(), "profiles": profiler.list_artifacts()}
+
+@router.get("/{profile_id}")
+async def get_profile(profile_id: str):
+    """Summary of one profile, including the top functions by cumulative time"""
+    path = profiler.artifact_path(profile_id, ".json")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    with open(path) as f:
+        return json.load(f)
+
+@router.get("/{profile_id}/download")
+async def download_profile(profile_id: str):
+    """The raw pstats file (open with `python -m pstats` or snakeviz)"""
+    path = profiler.artifact_path(profile_id, ".prof")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
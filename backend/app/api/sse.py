@@ -0,0 +1,168 @@
+# app/api/sse.py
+"""
+Server-Sent Events framing for the chat stream.
+
+Upstream text is coalesced into fewer, larger events according to a
+FlushPolicy, and frames are built from precomputed byte prefixes so the only
+per-event serialization work is escaping the content string.
+"""
+import asyncio
+import json
+import time
+from json.encoder import encode_basestring_ascii
+from typing import AsyncGenerator, AsyncIterable, Optional
+
+from app import metrics
+from config.settings import settings
+
+FLUSH_MODES = ("chunk", "word", "interval")
+
+_FRAME_SUFFIX = b"}\n\n"
+_FRAME_PREFIXES = {
+    event_type: b'data: {"type":"' + event_type.encode() + b'","content":'
+    for event_type in ("start", "chunk", "end", "error")
+}
+
+
+def format_event(event_type: str, content: str = "", **extra) -> bytes:
+    """Serialize one SSE event; extra fields fall back to the generic encoder"""
+    prefix = _FRAME_PREFIXES.get(event_type)
+    if prefix is None or extra:
+        payload = {"type": event_type, "content": content, **extra}
+        return b"data: " + json.dumps(payload, separators=(",", ":")).encode() + b"\n\n"
+    return prefix + encode_basestring_ascii(content).encode() + _FRAME_SUFFIX
+
+
+START_EVENT = format_event("start")
+END_EVENT = format_event("end")
+
+
+class FlushPolicy:
+    """
+    When to turn buffered text into an event.
+
+    - chunk: one event per upstream chunk
+    - word: one event per upstream chunk, cut at the last word boundary
+    - interval: only flush on the size threshold or the flush interval
+
+    In every mode the buffer is also flushed once it reaches max_chars, or when
+    text has been waiting longer than interval_ms.
+
+    chunk is the default and the cheapest: its buffer is always empty between
+    chunks, so it never waits on the flush deadline. word and interval keep
+    text buffered and pay for a timed wait (a task per upstream chunk), about
+    10x the framing cost in bench_sse_framing.
+    """
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        interval_ms: Optional[int] = None,
+        max_chars: Optional[int] = None,
+    ):
+        self.mode = mode or settings.sse_flush_mode
+        if self.mode not in FLUSH_MODES:
+            raise ValueError(f'Flush mode must be one of: {", ".join(FLUSH_MODES)}')
+        interval_ms = settings.sse_flush_interval_ms if interval_ms is None else interval_ms
+        self.interval = interval_ms / 1000 if interval_ms > 0 else None
+        self.max_chars = settings.sse_flush_max_chars if max_chars is None else max_chars
+
+
+def _split_at_word_boundary(text: str):
+    """Split text after its last whitespace character"""
+    for index in range(len(text) - 1, -1, -1):
+        if text[index].isspace():
+            return text[:index + 1], text[index + 1:]
+    return "", text
+
+
+async def coalesce(
+    source: AsyncIterable[str], policy: FlushPolicy
+) -> AsyncGenerator[str, None]:
+    """Batch upstream text chunks into larger pieces according to the policy"""
+    loop = asyncio.get_running_loop()
+    iterator = source.__aiter__()
+    buffer = ""
+    buffered_since = 0.0
+    pending = None
+
+    try:
+        while True:
+            if buffer and policy.interval is not None:
+                # Wait for more text, but not past the flush deadline
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                timeout = max(0.0, buffered_since + policy.interval - loop.time())
+                done, _ = await asyncio.wait((pending,), timeout=timeout)
+                if not done:
+                    out, buffer = buffer, ""
+                    yield out
+                    continue
+                task, pending = pending, None
+                try:
+                    chunk = task.result()
+                except StopAsyncIteration:
+                    break
+            else:
+                try:
+                    if pending is not None:
+                        task, pending = pending, None
+                        chunk = await task
+                    else:
+                        chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+
+            if not buffer:
+                buffered_since = loop.time()
+            buffer += chunk
+            if len(buffer) >= policy.max_chars:
+                out, buffer = buffer, ""
+            elif policy.mode == "chunk":
+                out, buffer = buffer, ""
+            elif policy.mode == "word":
+                out, buffer = _split_at_word_boundary(buffer)
+            else:
+                out = ""
+            if out:
+                buffered_since = loop.time()
+                yield out
+
+        if buffer:
+            yield buffer
+    finally:
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, Exception):
+                pass
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def event_stream(
+    source: AsyncIterable[str], policy: FlushPolicy, end_metadata: Optional[dict] = None
+) -> AsyncGenerator[bytes, None]:
+    """Frame a text stream as start / chunk... / end SSE events"""
+    events = 0
+    sent = len(START_EVENT)
+    serialize_seconds = 0.0
+    yield START_EVENT
+    try:
+        async for text in coalesce(source, policy):
+            started = time.perf_counter()
+            frame = format_event("chunk", text)
+            serialize_seconds += time.perf_counter() - started
+            events += 1
+            sent += len(frame)
+            yield frame
+        # end_metadata is filled in by the source while it streams
+        frame = format_event("end", metadata=end_metadata) if end_metadata else END_EVENT
+        sent += len(frame)
+        yield frame
+    finally:
+        metrics.STAGE_SECONDS.labels("sse_serialize").observe(serialize_seconds)
+        metrics.SSE_EVENTS.observe(events)
+        metrics.SSE_BYTES.inc(sent)
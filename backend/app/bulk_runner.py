@@ -0,0 +1,250 @@
+# app/bulk_runner.py
+"""
+Offline bulk generation over a JSONL prompt file, without going through HTTP.
+
+    python -m app.bulk_runner prompts.jsonl results.jsonl --concurrency 16
+    python -m app.bulk_runner requests.jsonl out.jsonl --prompt-field body --id-field request_id
+
+The input is streamed line by line and prompts run through ContentService
+with a bounded number in flight. Results are appended to the output JSONL in
+completion order, one line per input line with its index.
+
+Progress is checkpointed next to the output (<output>.checkpoint.json). The
+checkpoint stores a watermark: every input line before it has a result in the
+output. After a crash, rerunning the same command seeks the input to the
+watermark and skips lines whose results were already written past it. The
+runner never works more than a fixed window ahead of the watermark, so memory
+stays constant however large the input is.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from config.settings import settings
+
+
+class Watermark:
+    """Tracks the first input line without a written result, with out-of-order completion"""
+
+    def __init__(self, index: int = 0, offset: int = 0):
+        self.index = index
+        self.offset = offset
+        self._ends: Dict[int, int] = {}  # started line -> byte offset just past it
+        self._done: Set[int] = set()
+
+    def started(self, index: int, end_offset: int) -> None:
+        self._ends[index] = end_offset
+
+    def complete(self, index: int) -> None:
+        self._done.add(index)
+        while self.index in self._done:
+            self._done.remove(self.index)
+            self.offset = self._ends.pop(self.index)
+            self.index += 1
+
+    def done_ahead(self) -> list:
+        return sorted(self._done)
+
+
+class BulkRunner:
+    def __init__(self, service, args: argparse.Namespace):
+        self.service = service
+        self.args = args
+        self.checkpoint_path = args.checkpoint or f"{args.output}.checkpoint.json"
+        self.input_size = os.path.getsize(args.input)
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        self._last_report = 0.0
+
+    async def run(self) -> int:
+        watermark, already_done = self._resume()
+        if watermark is None:
+            return 0
+        self._started_at = time.monotonic()
+        self._start_offset = watermark.offset
+        window = self.args.concurrency * self.args.window_factor
+
+        with open(self.args.input, "rb") as source, open(self.args.output, "ab") as output:
+            self.output = output
+            source.seek(watermark.offset)
+            pending: Set[asyncio.Task] = set()
+            index, offset = watermark.index, watermark.offset
+            for raw in source:
+                end = offset + len(raw)
+                watermark.started(index, end)
+                if not raw.strip():
+                    watermark.complete(index)
+                elif index in already_done:
+                    already_done.discard(index)
+                    watermark.complete(index)
+                    self.skipped += 1
+                else:
+                    # Bounded in flight, and never too far ahead of the watermark
+                    while pending and (
+                        len(pending) >= self.args.concurrency or index - watermark.index >= window
+                    ):
+                        pending = await self._drain(pending, watermark)
+                    pending.add(asyncio.ensure_future(self._process(index, raw)))
+                index, offset = index + 1, end
+            while pending:
+                pending = await self._drain(pending, watermark)
+            self._checkpoint(watermark, completed=True)
+        self._report(watermark, final=True)
+        return 1 if self.failed else 0
+
+    async def _drain(self, pending: Set[asyncio.Task], watermark: Watermark) -> Set[asyncio.Task]:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            index, line = task.result()
+            self.output.write(json.dumps(line).encode() + b"\n")
+            watermark.complete(index)
+            self._since_checkpoint += 1
+        if (
+            self._since_checkpoint >= self.args.checkpoint_every
+            or time.monotonic() - self._last_checkpoint >= self.args.checkpoint_seconds
+        ):
+            self._checkpoint(watermark)
+        if time.monotonic() - self._last_report >= self.args.report_seconds:
+            self._report(watermark)
+        return pending
+
+    async def _process(self, index: int, raw: bytes) -> Tuple[int, dict]:
+        line = {"index": index}
+        try:
+            record = json.loads(raw)
+            line["id"] = record.get(self.args.id_field) if isinstance(record, dict) else None
+            prompt = record[self.args.prompt_field] if isinstance(record, dict) else record
+            if not isinstance(prompt, str) or not prompt.strip():
+                raise ValueError(f"missing or empty '{self.args.prompt_field}'")
+        except (ValueError, KeyError, TypeError) as e:
+            self.failed += 1
+            line.update(status="error", error={"message": f"Invalid input line: {e}", "error_code": "INVALID_INPUT"})
+            return index, line
+
+        started = time.perf_counter()
+        try:
+            content, metadata = await self.service.generate_with_metadata(prompt)
+        except Exception as e:
+            self.failed += 1
+            line.update(status="error", error={
+                "message": getattr(e, "message", str(e)),
+                "error_code": getattr(e, "error_code", None) or "GENERATION_FAILED",
+            })
+        else:
+            self.ok += 1
+            line.update(status="ok", content=content, metadata=metadata)
+        line["generation_time"] = round(time.perf_counter() - started, 3)
+        return index, line
+
+    def _resume(self) -> Tuple[Optional[Watermark], Set[int]]:
+        """Load the checkpoint and work out which lines past the watermark are already done"""
+        if not os.path.exists(self.checkpoint_path):
+            if os.path.exists(self.args.output) and os.path.getsize(self.args.output) and not self.args.overwrite:
+                raise SystemExit(f"{self.args.output} exists without a checkpoint; pass --overwrite to start over")
+            open(self.args.output, "wb").close()
+            return Watermark(), set()
+
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+        if state["input"] != os.path.abspath(self.args.input):
+            raise SystemExit(f"Checkpoint belongs to {state['input']}, not {self.args.input}")
+        if state.get("completed"):
+            print(f"Already complete: {state['watermark_index']} lines", file=sys.stderr)
+            return None, set()
+
+        done = set(state["done_ahead"])
+        with open(self.args.output, "r+b") as output:
+            # At most checkpoint_every results were written after the checkpoint
+            output.seek(state["output_offset"])
+            tail = output.read()
+            complete = tail[:tail.rfind(b"\n") + 1]
+            # Drop a partially written last line left by the crash
+            output.truncate(state["output_offset"] + len(complete))
+            for raw in complete.splitlines():
+                index = json.loads(raw)["index"]
+                if index >= state["watermark_index"]:
+                    done.add(index)
+
+        print(
+            f"Resuming at line {state['watermark_index']} "
+            f"({len(done)} results past it already written)",
+            file=sys.stderr
+        )
+        return Watermark(state["watermark_index"], state["watermark_offset"]), done
+
+    def _checkpoint(self, watermark: Watermark, completed: bool = False) -> None:
+        # Results must be on disk before the checkpoint that covers them
+        self.output.flush()
+        os.fsync(self.output.fileno())
+        state = {
+            "input": os.path.abspath(self.args.input),
+            "watermark_index": watermark.index,
+            "watermark_offset": watermark.offset,
+            "done_ahead": watermark.done_ahead(),
+            "output_offset": self.output.tell(),
+            "completed": completed,
+            "updated_at": time.time(),
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+
+    def _report(self, watermark: Watermark, final: bool = False) -> None:
+        self._last_report = time.monotonic()
+        elapsed = max(1e-9, self._last_report - self._started_at)
+        processed = self.ok + self.failed
+        bytes_done = watermark.offset - self._start_offset
+        percent = 100 * watermark.offset / self.input_size if self.input_size else 100.0
+        if bytes_done > 0:
+            eta = (self.input_size - watermark.offset) / (bytes_done / elapsed)
+            eta_text = time.strftime("%H:%M:%S", time.gmtime(eta))
+        else:
+            eta_text = "--:--:--"
+        print(
+            f"{'done' if final else 'progress'}: {processed} lines (ok {self.ok}, failed {self.failed}, "
+            f"skipped {self.skipped}) | {processed / elapsed:.1f} lines/s | {percent:.1f}% | ETA {eta_text}",
+            file=sys.stderr
+        )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate content for every line of a JSONL prompt file")
+    parser.add_argument("input", help="JSONL file, one object (or JSON string) per line")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--id-field", default="id", help="Copied into each result line if present")
+    parser.add_argument("--concurrency", type=int, default=settings.batch_default_concurrency)
+    parser.add_argument("--window-factor", type=int, default=64,
+                        help="Max lines in progress past the watermark, as a multiple of concurrency")
+    parser.add_argument("--checkpoint", help="Checkpoint path (default: <output>.checkpoint.json)")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="Lines between checkpoints")
+    parser.add_argument("--checkpoint-seconds", type=float, default=10.0)
+    parser.add_argument("--report-seconds", type=float, default=10.0)
+    parser.add_argument("--overwrite", action="store_true", help="Start over if output exists without a checkpoint")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    from app.services.content_service import ContentService
+
+    service = ContentService()
+    await service.start()
+    try:
+        return await BulkRunner(service, args).run()
+    finally:
+        await service.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
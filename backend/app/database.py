@@ -0,0 +1,102 @@
+# app/database.py
+"""
+Async SQLAlchemy engine with a sized connection pool.
+
+SQLite (via aiosqlite) works out of the box for local development and
+tests; set DATABASE_URL=postgresql+asyncpg://... in production.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+
+from config.settings import settings
+
+
+def create_engine(url: str = None) -> AsyncEngine:
+    url = make_url(url or settings.database_url)
+    options = {"echo": settings.database_echo}
+    in_memory = url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+    if in_memory:
+        # In-memory SQLite only exists inside its one connection, so share it
+        options["poolclass"] = StaticPool
+    else:
+        # aiosqlite would otherwise default to NullPool (a new connection per checkout)
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout_seconds,
+            pool_pre_ping=True,
+        )
+    new_engine = create_async_engine(url, **options)
+
+    if url.get_backend_name() == "sqlite":
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            # WAL lets readers run alongside the batched writer
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+    return new_engine
+
+
+engine = create_engine()
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def init_models() -> None:
+    """Create missing tables and the search index (migrations are not set up yet)"""
+    from app.models import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes, Base.metadata)
+        await conn.run_sync(create_search_index)
+
+
+def _create_missing_indexes(connection, metadata) -> None:
+    """create_all skips indexes added to tables that already exist"""
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+# Full-text index over message content. SQLite gets an external-content FTS5
+# table kept in sync by triggers; PostgreSQL a GIN index on the tsvector.
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE messages_fts USING fts5(content, content='messages', content_rowid='rowid')",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+        INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content);
+    END""",
+    # Index messages stored before the FTS table existed
+    "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')",
+]
+POSTGRES_FTS = (
+    "CREATE INDEX IF NOT EXISTS ix_messages_content_fts "
+    "ON messages USING GIN (to_tsvector('english', content))"
+)
+
+
+def create_search_index(connection) -> None:
+    """Create the full-text index if missing; takes a sync Connection (use run_sync)"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        ).first()
+        if not exists:
+            for statement in SQLITE_FTS:
+                connection.exec_driver_sql(statement)
+    elif dialect == "postgresql":
+        connection.exec_driver_sql(POSTGRES_FTS)
@@ -29,7 +29,11 @@ class ValidationException(ContentGeneratorException):
 
 class RateLimitException(ContentGeneratorException):
     """Exception raised when rate limit is exceeded"""
-    pass
+    def __init__(self, message: str, error_code: str = None, retry_after: int = 60,
+                 status_code: int = 429):
+        self.retry_after = retry_after
+        self.status_code = status_code
+        super().__init__(message, error_code)
 
 # Exception Handlers
 async def ai_service_exception_handler(request: Request, exc: AIServiceException):
@@ -81,16 +85,18 @@ async def validation_exception_handler(request: Request, exc: ValidationExceptio
 async def rate_limit_exception_handler(request: Request, exc: RateLimitException):
     """Handle rate limiting exceptions"""
     return JSONResponse(
-        status_code=429,
+        status_code=exc.status_code,
         content={
             "error": {
-                "message": "Rate limit exceeded. Please wait before sending another message.",
-                "error_code": "RATE_LIMIT_EXCEEDED",
+                "message": "Rate limit exceeded. Please wait before sending another message."
+                if exc.status_code == 429 else "Server is busy. Please try again shortly.",
+                "error_code": exc.error_code or "RATE_LIMIT_EXCEEDED",
                 "timestamp": datetime.utcnow().isoformat(),
                 "type": "rate_limit_error",
-                "retry_after": 60
+                "retry_after": exc.retry_after
             }
-        }
+        },
+        headers={"Retry-After": str(exc.retry_after)}
     )
 
 async def global_exception_handler(request: Request, exc: Exception):
@@ -1,15 +1,62 @@
 # app/main.py
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import content
+from fastapi.responses import JSONResponse, Response
+from app import metrics
+from app.api import content, conversations, profiles
+from app.database import engine, init_models
+from app.logging_config import configure_logging
+from app.profiling import ProfilingMiddleware
+from app.rate_limit import AdmissionController, AdmissionMiddleware
+from app.exceptions import (
+    AIServiceException, DatabaseException, RateLimitException, ValidationException,
+    ai_service_exception_handler, database_exception_handler,
+    rate_limit_exception_handler, validation_exception_handler
+)
 from config.settings import settings
+from model.executor import shutdown_executor
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Content Generator API", version="1.0.0")
+configure_logging(settings.log_level, settings.log_format)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.profiling_enabled:
+        profiles.profiler.install(asyncio.get_running_loop())
+    # Heavy model loading runs in the background so we accept requests right away
+    await content.content_service.start()
+    if settings.conversations_enabled:
+        await init_models()
+        await content.conversation_store.start()
+    yield
+    # Drain queued conversation writes before the pool goes away
+    await content.conversation_store.stop()
+    await engine.dispose()
+    await content.content_service.shutdown()
+    shutdown_executor(wait=False)
+
+app = FastAPI(title="Content Generator API", version="1.0.0", lifespan=lifespan)
+
+# Admission control for generation requests (shed load with 429/503 + Retry-After).
+# Added before CORS so rejections still carry CORS headers.
+admission = AdmissionController.from_settings()
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission,
+        trust_forwarded=settings.rate_limit_trust_forwarded
+    )
+
+# Opt-in per-request profiling (X-Profile: 1 or ?profile=1). Added after admission
+# control so it wraps it and time spent queueing for a slot shows in the profile.
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware, profiler=profiles.profiler)
 
 # CORS middleware using settings
 app.add_middleware(
@@ -20,8 +67,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Application exception handlers
+app.add_exception_handler(AIServiceException, ai_service_exception_handler)
+app.add_exception_handler(DatabaseException, database_exception_handler)
+app.add_exception_handler(ValidationException, validation_exception_handler)
+app.add_exception_handler(RateLimitException, rate_limit_exception_handler)
+
 # Include routers
 app.include_router(content.router, prefix="/api/content", tags=["content"])
+if settings.conversations_enabled:
+    app.include_router(conversations.router, prefix="/api/conversations", tags=["conversations"])
+if settings.profiling_enabled:
+    app.include_router(profiles.router, prefix="/api/profiles", tags=["profiling"])
 
 @app.get("/")
 async def root():
@@ -35,6 +92,82 @@ async def health_check():
         "api_version": "1.0.0"
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe: ready as soon as some backend can serve. Gemini covers
+    requests while the local model loads, which is reported separately.
+    """
+    service = content.content_service
+    backends = service.router.stats()["backends"]
+    ready = any(backend["available"] for backend in backends.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "unavailable",
+            "local_model": service.local_model_state,
+            "local_model_loading": service.local_model_state == "loading",
+            "fallback": "gemini" if not service.local_model_available else None
+        }
+    )
+
+@app.get("/admission")
+async def admission_stats():
+    """Rate limiting, queueing and load shedding counters"""
+    return admission.stats()
+
+def _backend_gauge(read):
+    def collect():
+        for name, snapshot in content.content_service.router.stats()["backends"].items():
+            value = read(snapshot)
+            if value is not None:
+                yield (name,), value
+    return collect
+
+def _register_gauges():
+    """Live state, read from the existing stats objects at scrape time"""
+    metrics.gauge(
+        "content_backend_in_flight", "Requests in flight per backend", ("backend",),
+        _backend_gauge(lambda s: s["in_flight"])
+    )
+    metrics.gauge(
+        "content_backend_concurrency_limit", "Current adaptive concurrency limit per backend", ("backend",),
+        _backend_gauge(lambda s: s["concurrency"]["limit"] if s["concurrency"] else None)
+    )
+    metrics.gauge(
+        "content_backend_circuit_open", "1 while a backend's circuit breaker is open", ("backend",),
+        _backend_gauge(lambda s: int(s["circuit"]["state"] == "open") if s["circuit"] else None)
+    )
+    metrics.gauge(
+        "admission_in_flight", "Generation requests being processed", (),
+        lambda: [((), admission.in_flight)]
+    )
+    metrics.gauge(
+        "admission_queue_depth", "Generation requests waiting for a slot", (),
+        lambda: [((), admission.stats()["queue_depth"])]
+    )
+    metrics.gauge(
+        "conversation_write_queue_depth", "Messages waiting for the background writer", (),
+        lambda: [((), content.conversation_store.stats()["queued"])]
+    )
+    metrics.gauge(
+        "response_cache_entries", "Entries in the response cache", (),
+        lambda: [((), content.content_service.response_cache.stats()["entries"])]
+    )
+    if content.content_service.semantic_cache is not None:
+        metrics.gauge(
+            "semantic_cache_entries", "Prompts in the semantic cache's vector index", (),
+            lambda: [((), len(content.content_service.semantic_cache))]
+        )
+
+if settings.metrics_enabled:
+    _register_gauges()
+
+    @app.get("/metrics")
+    async def metrics_endpoint():
+        """Prometheus text exposition of pipeline counters and histograms"""
+        return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    from app.serve import serve
+    serve(app)
@@ -0,0 +1,283 @@
+# app/metrics.py
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters and histograms are plain Python objects updated from the event loop,
+so recording a sample is a dict lookup and a couple of additions. Gauges are
+read from callbacks when /metrics is scraped, so live state (in-flight
+requests, circuit breakers) is never copied on the hot path.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FAST_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.99, 1.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """The child for these label values, created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in self._children.items():
+            yield f"{self.name}{_label_text(self.labelnames, values)} {_number(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                labels = _label_text(self.labelnames, values, f'le="{_number(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _label_text(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_number(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class Gauge(_Metric):
+    """Read at scrape time: the callback yields (label values, value) pairs"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        for values, value in self.callback():
+            yield f"{self.name}{_label_text(self.labelnames, values)} {_number(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str) -> None:
+        self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str],
+          callback: Callable[[], Iterable[Tuple[Sequence[str], float]]]) -> Gauge:
+    """Register a scrape-time gauge, replacing any earlier one with the same name"""
+    REGISTRY.unregister(name)
+    return REGISTRY.register(Gauge(name, documentation, labelnames, callback))
+
+
+# Generation pipeline
+STAGE_SECONDS = histogram(
+    "content_stage_seconds",
+    "Time spent in each generation stage",
+    ("stage",),
+    buckets=FAST_BUCKETS + LATENCY_BUCKETS[5:],
+)
+UPSTREAM_SECONDS = histogram(
+    "content_upstream_seconds",
+    "Model call latency by backend, mode (quick|stream) and outcome",
+    ("backend", "mode", "outcome"),
+)
+TIME_TO_FIRST_CHUNK = histogram(
+    "content_time_to_first_chunk_seconds",
+    "Time from starting a streamed call to its first text chunk",
+    ("backend",),
+)
+STREAM_CHUNKS = histogram(
+    "content_stream_chunks",
+    "Upstream text chunks per streamed request",
+    ("backend",),
+    buckets=COUNT_BUCKETS,
+)
+TRUNCATION_RATIO = histogram(
+    "content_truncation_ratio",
+    "Characters kept by the length filter over characters received",
+    ("constraint",),
+    buckets=RATIO_BUCKETS,
+)
+REQUESTS = counter(
+    "content_requests_total",
+    "Generation requests by mode (quick|stream) and outcome (ok|error|cached)",
+    ("mode", "outcome"),
+)
+FALLBACKS = counter(
+    "content_fallbacks_total",
+    "Requests that moved on from a backend to the next candidate",
+    ("backend",),
+)
+ERRORS = counter(
+    "content_errors_total",
+    "Failed or rejected model calls by backend and error code",
+    ("backend", "error"),
+)
+
+# Semantic cache
+SEMANTIC_CACHE_LOOKUPS = counter(
+    "semantic_cache_lookups_total",
+    "Semantic (near-duplicate) cache lookups by outcome (hit|miss)",
+    ("outcome",),
+)
+SEMANTIC_CACHE_LOOKUP_SECONDS = histogram(
+    "semantic_cache_lookup_seconds",
+    "Time to embed a prompt and search the semantic cache",
+    buckets=FAST_BUCKETS,
+)
+
+# SSE framing
+SSE_EVENTS = histogram(
+    "sse_events_per_stream",
+    "Chunk events sent per SSE response",
+    buckets=COUNT_BUCKETS,
+)
+SSE_BYTES = counter("sse_bytes_total", "Bytes written to SSE responses")
+
+
+# Conversation persistence
+CONVERSATION_WRITES = counter(
+    "conversation_messages_total",
+    "Messages handed to the write-behind store by outcome (written|dropped|failed)",
+    ("outcome",),
+)
+CONVERSATION_BATCH_SECONDS = histogram(
+    "conversation_write_batch_seconds",
+    "Time to write one batch of messages",
+)
+CONVERSATION_BATCH_SIZE = histogram(
+    "conversation_write_batch_size",
+    "Messages per write batch",
+    buckets=COUNT_BUCKETS,
+)
+
+# Conversation context
+CONTEXT_TOKENS = histogram(
+    "conversation_context_tokens",
+    "Estimated tokens of history sent ahead of a follow-up message",
+    buckets=(50, 100, 250, 500, 1000, 2000, 4000, 8000),
+)
+CONTEXT_SUMMARIES = counter(
+    "conversation_context_summaries_total",
+    "Times older turns were folded into a conversation's rolling summary",
+)
+
+def error_code(error: BaseException) -> str:
+    """A low-cardinality label for an exception"""
+    return getattr(error, "error_code", None) or type(error).__name__
@@ -0,0 +1,62 @@
+# app/models.py
+"""ORM models for conversations and their messages"""
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, Index, Integer, String, Text, Uuid
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+    # Keyset pagination walks these in (sort column, id) order; id breaks ties
+    __table_args__ = (
+        Index("ix_conversations_archived_updated", "is_archived", "updated_at", "id"),
+        Index("ix_conversations_archived_created", "is_archived", "created_at", "id"),
+        Index("ix_conversations_user_updated", "user_id", "is_archived", "updated_at", "id"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, default=uuid.uuid4)
+    title: Mapped[str] = mapped_column(String(255), default="New conversation")
+    user_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    is_archived: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Kept up to date by the message writer so listings never count rows
+    message_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_message: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+
+    messages: Mapped[List["Message"]] = relationship(
+        back_populates="conversation",
+        order_by="Message.created_at",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+
+class Message(Base):
+    __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_conversation_created", "conversation_id", "created_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, default=uuid.uuid4)
+    conversation_id: Mapped[uuid.UUID] = mapped_column(
+        Uuid, ForeignKey("conversations.id", ondelete="CASCADE")
+    )
+    role: Mapped[str] = mapped_column(String(20))
+    content: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    # "metadata" is reserved on declarative classes
+    message_metadata: Mapped[Optional[dict]] = mapped_column("metadata", JSON, nullable=True)
+
+    conversation: Mapped[Conversation] = relationship(back_populates="messages")
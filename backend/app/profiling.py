@@ -0,0 +1,339 @@
+# app/profiling.py
+"""
+Opt-in deterministic profiling of single requests.
+
+With PROFILING_ENABLED, a request to /api/content/* carrying `X-Profile: 1`
+or `?profile=1` is run under cProfile. The profiler is switched on only while
+that request's own coroutines are executing on the event loop (each task step
+is wrapped), so other requests interleaved on the loop are not attributed to
+it. Tasks the request spawns (e.g. the streaming body) inherit the profile
+through a context variable, and blocking model calls it sends to the executor
+are profiled in their worker thread and merged in.
+
+From Python 3.12 cProfile runs on sys.monitoring, which allows one active
+profiler per process and sees every thread. There a session enables a single
+profile for its whole duration, so one request is profiled at a time and work
+of other requests running alongside it is included. If another profiling tool
+holds the hook, the request runs unprofiled with X-Profile-Status: unavailable.
+
+Each profile is saved as a pstats file plus a JSON summary under
+PROFILING_DIR, and its ID is returned in the X-Profile-Id response header.
+When profiling is disabled nothing is installed, so requests pay nothing.
+"""
+import asyncio
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import sys
+import time
+import uuid
+from collections.abc import Coroutine
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from model import executor
+
+logger = logging.getLogger(__name__)
+
+_active: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+ARTIFACT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+PROCESS_WIDE = sys.version_info >= (3, 12)
+
+
+class ProfileSession:
+    """One profiled request: a loop-thread profile plus one profile per blocking call"""
+
+    def __init__(self, label: str):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.started = time.perf_counter()
+        self.created_at = time.time()
+        self.loop_profile = cProfile.Profile()
+        self.blocking_profiles: List[cProfile.Profile] = []
+        self.steps = 0
+        self.unavailable = False  # a profile could not be enabled at some point
+        self._in_step = False
+
+    def _enable(self, profile: cProfile.Profile) -> bool:
+        try:
+            profile.enable()
+            return True
+        except ValueError:
+            # "Another profiling tool is already active" (3.12+)
+            self.unavailable = True
+            return False
+
+    def start(self) -> bool:
+        """In process-wide mode, profile everything until stop(); False if that is not possible"""
+        return not PROCESS_WIDE or self._enable(self.loop_profile)
+
+    def stop(self) -> None:
+        if PROCESS_WIDE:
+            self.loop_profile.disable()
+
+    def step(self, resume, *args):
+        """Run one resumption of a coroutine with the loop profile switched on"""
+        if PROCESS_WIDE or self._in_step:
+            return resume(*args)
+        self.steps += 1
+        if not self._enable(self.loop_profile):
+            return resume(*args)
+        self._in_step = True
+        try:
+            return resume(*args)
+        finally:
+            self.loop_profile.disable()
+            self._in_step = False
+
+    def wrap_blocking(self, call):
+        if PROCESS_WIDE:
+            return call  # the session's profile already sees every thread
+
+        def profiled():
+            profile = cProfile.Profile()
+            if not self._enable(profile):
+                return call()
+            try:
+                return call()
+            finally:
+                profile.disable()
+                self.blocking_profiles.append(profile)
+        return profiled
+
+    def save(self, directory: str, status: Optional[int]) -> dict:
+        """Write <id>.prof (pstats) and <id>.json (summary); blocking file IO"""
+        stats = pstats.Stats(self.loop_profile)
+        for profile in self.blocking_profiles:
+            stats.add(profile)
+        os.makedirs(directory, exist_ok=True)
+        stats.dump_stats(os.path.join(directory, f"{self.id}.prof"))
+
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats("cumulative").print_stats(30)
+        summary = {
+            "id": self.id,
+            "label": self.label,
+            "status": status,
+            "created_at": self.created_at,
+            "wall_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "profiled_cpu_ms": round(stats.total_tt * 1000, 3),
+            "loop_steps": self.steps,
+            "blocking_calls": len(self.blocking_profiles),
+            "process_wide": PROCESS_WIDE,
+            "complete": not self.unavailable,
+            "top_cumulative": text.getvalue(),
+        }
+        with open(os.path.join(directory, f"{self.id}.json"), "w") as f:
+            json.dump(summary, f)
+        return summary
+
+
+class _ProfiledCoroutine(Coroutine):
+    """Coroutine proxy that profiles every step of the wrapped coroutine"""
+
+    __slots__ = ("_coro", "_session")
+
+    def __init__(self, coro, session: ProfileSession):
+        self._coro = coro
+        self._session = session
+
+    def send(self, value):
+        return self._session.step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._session.step(self._coro.throw, *args)
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+
+class Profiler:
+    def __init__(self, directory: str, max_concurrent: int = 1, max_artifacts: int = 100):
+        self.directory = directory
+        # Only one profile can be active per process from 3.12
+        self.max_concurrent = 1 if PROCESS_WIDE else max_concurrent
+        self.max_artifacts = max_artifacts
+        self.running = 0
+        self.completed = 0
+        self.skipped_busy = 0
+        self.skipped_unavailable = 0
+
+    @classmethod
+    def from_settings(cls) -> "Profiler":
+        from config.settings import settings
+        return cls(
+            directory=settings.profiling_dir,
+            max_concurrent=settings.profiling_max_concurrent,
+            max_artifacts=settings.profiling_max_artifacts
+        )
+
+    def install(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Propagate profiling into spawned tasks and executor calls"""
+        previous = loop.get_task_factory()
+
+        def task_factory(loop, coro, **kwargs):
+            session = _active.get()
+            if session is not None:
+                coro = _ProfiledCoroutine(coro, session)
+            if previous is not None:
+                return previous(loop, coro, **kwargs)
+            return asyncio.Task(coro, loop=loop, **kwargs)
+
+        loop.set_task_factory(task_factory)
+        executor.set_call_wrapper(self._wrap_blocking)
+
+    @staticmethod
+    def _wrap_blocking(call):
+        session = _active.get()
+        return call if session is None else session.wrap_blocking(call)
+
+    def try_start(self, label: str) -> Tuple[Optional[ProfileSession], str]:
+        """
+        (session, "started"), or (None, "busy") if max_concurrent profiles are
+        already running, or (None, "unavailable") if the profiler hook is taken
+        """
+        if self.running >= self.max_concurrent:
+            self.skipped_busy += 1
+            return None, "busy"
+        session = ProfileSession(label)
+        if not session.start():
+            self.skipped_unavailable += 1
+            logger.warning("profile_unavailable", extra={"label": label})
+            return None, "unavailable"
+        self.running += 1
+        return session, "started"
+
+    async def run(self, session: ProfileSession, coro, status_holder: dict):
+        """Await coro with the session active, then store the artifact"""
+        token = _active.set(session)
+        try:
+            return await _ProfiledCoroutine(coro, session)
+        finally:
+            _active.reset(token)
+            session.stop()
+            try:
+                loop = asyncio.get_running_loop()
+                summary = await loop.run_in_executor(
+                    None, session.save, self.directory, status_holder.get("status")
+                )
+                self.completed += 1
+                logger.info("profile_saved", extra={
+                    "profile_id": session.id, "label": session.label, "wall_ms": summary["wall_ms"]
+                })
+                await loop.run_in_executor(None, self._prune)
+            except Exception as e:
+                logger.warning("profile_save_failed", extra={"profile_id": session.id, "error": str(e)})
+            finally:
+                # The slot covers saving too, so the cap also bounds profiling overhead
+                self.running -= 1
+
+    def _prune(self) -> None:
+        """Keep only the newest max_artifacts profiles"""
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(".json")]
+        except FileNotFoundError:
+            return
+        if len(names) <= self.max_artifacts:
+            return
+        paths = sorted((os.path.join(self.directory, n) for n in names), key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_artifacts]:
+            for artifact in (path, path[:-len(".json")] + ".prof"):
+                try:
+                    os.remove(artifact)
+                except FileNotFoundError:
+                    pass
+
+    def artifact_path(self, artifact_id: str, suffix: str) -> Optional[str]:
+        if not ARTIFACT_ID.match(artifact_id):
+            return None
+        path = os.path.join(self.directory, f"{artifact_id}{suffix}")
+        return path if os.path.exists(path) else None
+
+    def list_artifacts(self) -> List[dict]:
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(".json")]
+        except FileNotFoundError:
+            return []
+        artifacts = []
+        for name in names:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            summary.pop("top_cumulative", None)
+            artifacts.append(summary)
+        return sorted(artifacts, key=lambda a: a["created_at"], reverse=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "completed": self.completed,
+            "skipped_busy": self.skipped_busy,
+            "skipped_unavailable": self.skipped_unavailable,
+            "process_wide": PROCESS_WIDE,
+            "directory": self.directory,
+        }
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            return value.strip().lower() in (b"1", b"true", b"yes")
+    query = scope.get("query_string", b"")
+    return b"profile=1" in query.split(b"&") or b"profile=true" in query.split(b"&")
+
+
+class ProfilingMiddleware:
+    """Profile requests under path_prefix that ask for it with X-Profile or ?profile=1"""
+
+    def __init__(self, app, profiler: Profiler, path_prefix: str = "/api/content"):
+        self.app = app
+        self.profiler = profiler
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(self.path_prefix)
+            or not _wants_profile(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        session, status = self.profiler.try_start(f'{scope["method"]} {scope["path"]}')
+        if session is None:
+            async def send_unprofiled(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-status", status.encode())
+                    ]
+                await send(message)
+            await self.app(scope, receive, send_unprofiled)
+            return
+
+        status_holder = {}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", session.id.encode())
+                ]
+            await send(message)
+
+        await self.profiler.run(session, self.app(scope, receive, send_with_id), status_holder)
@@ -0,0 +1,248 @@
+# app/rate_limit.py
+"""
+Admission control for generation endpoints.
+
+Each request must get a token from its client's bucket (else 429) and from
+the global bucket (else 503), then a concurrency slot. When every slot is
+busy it waits in a bounded FIFO queue for at most max_queue_wait seconds;
+a full queue or an expired wait is shed immediately with 503. All rejections
+carry Retry-After, so overload turns into fast, cheap refusals instead of
+requests that time out after a minute.
+
+A request that does the work of several (POST /batch) is charged for it by
+the endpoint: pace() makes each extra item wait for its own tokens and
+reserve() adds free slots for its extra concurrency. The middleware leaves
+the controller and client id in request.state for that.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.exceptions import RateLimitException, rate_limit_exception_handler
+from config.settings import settings
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most burst"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class AdmissionController:
+    """Token buckets plus a concurrency limit with a bounded wait queue"""
+
+    def __init__(
+        self,
+        client_rate: float,
+        client_burst: float,
+        global_rate: float,
+        global_burst: float,
+        max_concurrent: int,
+        max_queue: int,
+        max_queue_wait: float,
+        max_clients: int = 10000,
+    ):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_client = 0
+        self.rejected_global = 0
+        self.shed_queue_full = 0
+        self.shed_queue_timeout = 0
+
+    @classmethod
+    def from_settings(cls) -> "AdmissionController":
+        return cls(
+            client_rate=settings.rate_limit_client_rate,
+            client_burst=settings.rate_limit_client_burst,
+            global_rate=settings.rate_limit_global_rate,
+            global_burst=settings.rate_limit_global_burst,
+            max_concurrent=settings.admission_max_concurrent,
+            max_queue=settings.admission_max_queue,
+            max_queue_wait=settings.admission_max_queue_wait_seconds,
+        )
+
+    async def acquire(self, client: str) -> Optional[Tuple[int, str, float]]:
+        """
+        Wait for a slot. Returns None once admitted (call release() when done),
+        or (status, error_code, retry_after_seconds) if the request is refused.
+        """
+        wait = self._client_bucket(client).take()
+        if wait:
+            self.rejected_client += 1
+            return 429, "RATE_LIMIT_EXCEEDED", wait
+        wait = self.global_bucket.take()
+        if wait:
+            self.rejected_global += 1
+            return 503, "SERVER_BUSY", wait
+
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            return 503, "SERVER_BUSY", self.max_queue_wait
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            # release() hands its slot straight to us, so in_flight is already counted
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_queue_wait)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.shed_queue_timeout += 1
+            return 503, "SERVER_BUSY", self.max_queue_wait
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        self.admitted += 1
+        return None
+
+    async def pace(self, client: str) -> None:
+        """
+        Wait for a token from the client's bucket and then the global one, for
+        one more unit of work inside an admitted request (a batch item)
+        """
+        for bucket in (self._client_bucket(client), self.global_bucket):
+            while True:
+                wait = bucket.take()
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+
+    def reserve(self, count: int) -> int:
+        """
+        Take up to count free slots without queueing, never ahead of waiting
+        requests. Returns how many were taken; call release() for each.
+        """
+        taken = 0
+        while taken < count and self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            taken += 1
+        return taken
+
+    def release(self) -> None:
+        """Free a slot, handing it to the oldest live waiter if there is one"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # The slot arrived just as we gave up; pass it on
+            self.release()
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    def _client_bucket(self, client: str) -> TokenBucket:
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.client_rate, self.client_burst)
+            self._clients[client] = bucket
+            if len(self._clients) > self.max_clients:
+                # Forget the least recently seen client; a new bucket starts full anyway
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return bucket
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_queue_wait_seconds": self.max_queue_wait,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_client": self.rejected_client,
+            "rejected_global": self.rejected_global,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_queue_timeout": self.shed_queue_timeout,
+            "tracked_clients": len(self._clients),
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to POSTs under path_prefix"""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController,
+                 path_prefix: str = "/api/content", trust_forwarded: bool = False):
+        self.app = app
+        self.controller = controller
+        self.path_prefix = path_prefix
+        self.trust_forwarded = trust_forwarded
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        client = self._client_id(scope)
+        refused = await self.controller.acquire(client)
+        if refused is not None:
+            status, error_code, retry_after = refused
+            exc = RateLimitException(
+                "Too many requests" if status == 429 else "Server is at capacity",
+                error_code,
+                retry_after=max(1, math.ceil(retry_after)),
+                status_code=status
+            )
+            response = await rate_limit_exception_handler(Request(scope), exc)
+            await response(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        state["admission"] = self.controller
+        state["admission_client"] = client
+        try:
+            # Held until the (possibly streamed) response has been sent
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    def _client_id(self, scope: Scope) -> str:
+        if self.trust_forwarded:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
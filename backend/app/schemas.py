@@ -37,6 +37,11 @@ class QuickGenerateRequest(BaseModel):
             raise ValueError('Prompt cannot be empty')
         return v.strip()
 
+class BatchGenerateRequest(BaseModel):
+    """Batch generation request; results are streamed back as NDJSON"""
+    items: List[QuickGenerateRequest] = Field(..., min_length=1, max_length=1000, description="Prompts to generate")
+    concurrency: Optional[int] = Field(None, ge=1, le=64, description="Generations run at once")
+
 class ConversationCreateRequest(BaseModel):
     """Create new conversation request"""
     title: Optional[str] = Field(None, max_length=255, description="Conversation title")
@@ -79,8 +84,12 @@ class ConversationDetailResponse(ConversationResponse):
 class ConversationListResponse(BaseModel):
     """List of conversations response"""
     conversations: List[ConversationResponse]
+    # Counted once per listing (then cached and carried in the cursor), capped at
+    # conversation_count_cap; total_count_capped means "at least total_count"
     total_count: int
+    total_count_capped: bool = False
     has_more: bool = False
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to get the next page")
 
 class ChatStreamResponse(BaseModel):
     """Streaming chat response chunk"""
@@ -123,10 +132,10 @@ class SuccessResponse(BaseModel):
 
 # Pagination Models
 class PaginationParams(BaseModel):
-    """Pagination parameters"""
-    page: int = Field(1, ge=1, description="Page number")
+    """Keyset pagination parameters (pages are addressed by cursor, not number)"""
+    cursor: Optional[str] = Field(None, max_length=512, description="next_cursor from the previous page")
     page_size: int = Field(20, ge=1, le=100, description="Items per page")
-    search: Optional[str] = Field(None, max_length=255, description="Search query")
-    sort_by: Optional[str] = Field("created_at", description="Sort field")
+    search: Optional[str] = Field(None, max_length=255, description="Full-text search over message content")
+    sort_by: Optional[str] = Field("created_at", pattern="^(created_at|updated_at)$", description="Sort field")
     # FIXED: Changed regex to pattern for Pydantic v2
     sort_order: Optional[str] = Field("desc", pattern="^(asc|desc)$", description="Sort order")
@@ -0,0 +1,207 @@
+# app/serve.py
+"""
+Multi-process serving: one parent loads everything once, then forks workers.
+
+uvicorn's own --workers spawns a fresh interpreter per worker, so each one
+re-imports the app and loads its own copy of the local model. Here the parent
+imports the app, loads the 20K model (ContentService.preload) and creates the
+database schema, then forks. Workers inherit the model weights copy-on-write:
+tensor storage is never written after loading, and gc.freeze() keeps the
+collector from touching the headers of the preloaded objects, so those pages
+stay shared instead of being copied into every worker. All workers accept on
+one listening socket opened by the parent, which also replaces workers that
+die and stops them all on SIGTERM/SIGINT.
+
+Caches, rate limits and /metrics are per worker. So is conversation context
+(ContextBuilder): before each follow-up a worker compares the stored message
+count with what it has seen and reloads recent history from the database if
+another worker answered later turns. Messages still in a writer's queue
+(CONVERSATION_WRITE_* settings) are not visible to other workers, so a turn
+sent within that window of the previous one can still miss it; sticky
+routing by conversation avoids that.
+
+Usage (from backend/):
+    SERVE_WORKERS=4 python -m app.serve
+"""
+import asyncio
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+import uvicorn
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+BACKLOG = 2048  # uvicorn's default
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """The listening socket every worker accepts on"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(BACKLOG)
+    return sock
+
+
+def preload() -> None:
+    """Load the local model and prepare the database in the parent (blocking)"""
+    from app.api import content
+
+    if settings.local_model_workers == 0 and os.path.exists(settings.local_model_path):
+        import torch
+
+        if torch.cuda.is_available():
+            # A CUDA context cannot be used across fork; each worker loads its own
+            logger.warning("serve_preload_skipped", extra={"reason": "cuda"})
+        else:
+            # No OpenMP thread team may exist when we fork, or a worker can hang
+            # in its first parallel region; workers set their own thread count
+            torch.set_num_threads(1)
+            content.content_service.preload()
+            logger.info("serve_preloaded", extra={"local_model": content.content_service.local_model_state})
+    if settings.conversations_enabled:
+        asyncio.run(_prepare_database())
+
+
+async def _prepare_database() -> None:
+    from app.database import engine, init_models
+
+    await init_models()
+    # No pooled connection may be inherited by the workers
+    await engine.dispose()
+
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn server that shuts itself down if its supervisor goes away"""
+
+    def __init__(self, config: uvicorn.Config, parent_pid: int):
+        super().__init__(config)
+        self.parent_pid = parent_pid
+
+    async def on_tick(self, counter: int) -> bool:
+        if counter % 10 == 0 and os.getppid() != self.parent_pid:
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+
+class Supervisor:
+    """Forks the API workers, replaces any that die and stops them all on shutdown"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, threads: int = 0,
+                 restart_backoff_seconds: float = 5.0, **uvicorn_options):
+        self.app = app
+        self.sock = sock
+        self.workers = max(1, workers)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.restart_backoff_seconds = restart_backoff_seconds
+        self.uvicorn_options = uvicorn_options
+        self._children: Dict[int, Tuple[int, float]] = {}  # pid -> (worker index, started at)
+        self._stopping = False
+
+    def run(self) -> None:
+        """Fork the workers and supervise them until SIGTERM/SIGINT (blocking)"""
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        # Collect the loading garbage now, then exempt everything that is left
+        # from future collections so the workers never write to those pages
+        gc.collect()
+        gc.freeze()
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info("serve_started", extra={"workers": self.workers, "pid": os.getpid()})
+
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index, started_at = self._children.pop(pid, (None, 0.0))
+            if index is None or self._stopping:
+                continue
+            logger.warning("serve_worker_exited", extra={
+                "worker": index, "pid": pid, "exit_code": os.waitstatus_to_exitcode(status)
+            })
+            # A worker that dies right after starting would otherwise be forked in a tight loop
+            if time.monotonic() - started_at < self.restart_backoff_seconds:
+                time.sleep(self.restart_backoff_seconds)
+            if not self._stopping:
+                self._spawn(index)
+        self.sock.close()
+
+    def _spawn(self, index: int) -> None:
+        parent_pid = os.getpid()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._run_worker(parent_pid)
+                code = 0
+            except BaseException:
+                logger.exception("serve_worker_failed", extra={"worker": index})
+            finally:
+                # Never fall back into the supervisor loop
+                os._exit(code)
+        self._children[pid] = (index, time.monotonic())
+
+    def _run_worker(self, parent_pid: int) -> None:
+        # Own process group, so a terminal's Ctrl-C reaches only the supervisor,
+        # which then stops each worker exactly once
+        os.setpgid(0, 0)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        gc.enable()
+        if "torch" in sys.modules:
+            sys.modules["torch"].set_num_threads(self.threads)
+        config = uvicorn.Config(self.app, **self.uvicorn_options)
+        _WorkerServer(config, parent_pid).run(sockets=[self.sock])
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def serve(app, host: Optional[str] = None, port: Optional[int] = None, workers: Optional[int] = None,
+          preload_model: Optional[bool] = None, **uvicorn_options) -> None:
+    """
+    Run the API on host:port, forking SERVE_WORKERS workers when more than one
+    (blocking). Extra keyword arguments go to uvicorn's Config.
+    """
+    host = host or settings.serve_host
+    port = port or settings.serve_port
+    workers = settings.serve_workers if workers is None else workers
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        uvicorn.run(app, host=host, port=port, **uvicorn_options)
+        return
+
+    # Per the gc docs: no collections while loading, so freed objects do not
+    # leave holes in pages the workers will share; frozen right before forking
+    gc.disable()
+    sock = bind_socket(host, port)
+    if settings.serve_preload if preload_model is None else preload_model:
+        preload()
+    Supervisor(
+        app, sock, workers,
+        threads=settings.serve_worker_threads,
+        restart_backoff_seconds=settings.serve_restart_backoff_seconds,
+        **uvicorn_options
+    ).run()
+
+
+if __name__ == "__main__":
+    from app.main import app
+
+    serve(app)
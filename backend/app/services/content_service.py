@@ -1,11 +1,29 @@
 # app/services/content_service.py
 
 import google.generativeai as genai
-import re
+import logging
 import os
-from typing import Dict, List, AsyncGenerator
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, AsyncGenerator, Optional, Tuple
 import json
 from config.settings import settings
+from model.executor import StillRunning, run_blocking, iterate_blocking
+from model.gemini_model import GeminiModel
+from app import metrics
+from app.exceptions import AIServiceException
+from app.services.context_builder import ContextBuilder
+from app.services.hedging import Hedger
+from app.services.model_router import Backend, ModelRouter, RouteDecision
+from app.services.prompt_analyzer import analyze_prompt, build_prompt
+from app.services.resilience import AdaptiveLimiter, CircuitBreaker
+from app.services.response_cache import ResponseCache
+from app.services.semantic_cache import SemanticCache
+from app.services.stream_filters import (
+    LineLimitFilter, WordLimitFilter, apply_filter, is_intro_line, make_filter
+)
+
+logger = logging.getLogger(__name__)
 
 class ContentService:
     def __init__(self):
@@ -13,224 +31,600 @@ class ContentService:
         api_key = settings.gemini_api_key
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(settings.gemini_model)
+        self.gemini = GeminiModel()
+        self.model = self.gemini.model  # streaming talks to the SDK directly
+
+        # Latency-aware routing between Gemini and (once loaded) the 20K model
+        self.router = ModelRouter(
+            budget_ms=settings.routing_latency_budget_ms,
+            max_error_rate=settings.routing_max_error_rate,
+            default_output_tokens=settings.max_tokens
+        )
+        self._register_backend("gemini", self.gemini, capacity=settings.model_executor_workers)
+
+        # Optional hedged requests for non-streaming generation
+        self.hedger = Hedger(
+            percentile=settings.hedge_percentile,
+            min_delay_ms=settings.hedge_min_delay_ms,
+            default_delay_ms=settings.hedge_default_delay_ms,
+            budget_ratio=settings.hedge_budget_ratio
+        ) if settings.hedging_enabled else None
+
+        # Exact-match response cache for non-streaming generation
+        self.response_cache = ResponseCache(
+            max_entries=settings.response_cache_max_entries,
+            max_bytes=settings.response_cache_max_bytes,
+            ttl_seconds=settings.response_cache_ttl_seconds
+        )
+
+        # Optional near-duplicate (paraphrase) cache consulted on exact-cache misses
+        self.semantic_cache = SemanticCache.from_settings() if settings.semantic_cache_enabled else None
+
+        # Token-bounded history for follow-up messages in a conversation
+        self.context_builder = ContextBuilder.from_settings()
         
-        # Try to load 20K model (optional - won't break if it fails)
+        # The 20K model is optional and loaded in the background by start()
         self.local_model = None
-        self.local_tokenizer = None
-        self.local_model_available = False
-        
+        self.local_model_state = "not_started"
+        self._local_model_task = None
+
+    async def start(self):
+        """Begin loading the 20K model in the background (won't break if it fails)"""
+        if self.local_model_state != "not_started":
+            return
+        model_path = settings.local_model_path
+        if not os.path.exists(model_path):
+            logger.info("local_model_not_found", extra={"path": model_path})
+            self.local_model_state = "not_found"
+            return
+
+        logger.info("local_model_found", extra={"path": model_path})
+        self.local_model_state = "loading"
+        try:
+            from model.local_model import Local20KModel
+
+            if settings.local_model_workers > 0:
+                # Out-of-process inference; the API process only awaits results
+                from model.worker_pool import LocalModelWorkerPool
+
+                self.local_model = LocalModelWorkerPool(
+                    model_path,
+                    num_workers=settings.local_model_workers,
+                    intra_op_threads=settings.local_model_worker_threads
+                )
+                self.local_model.start()
+            else:
+                self.local_model = Local20KModel(model_path)
+            # Only routed to once is_available() turns true
+            self._register_local_backend()
+            self._local_model_task = asyncio.create_task(self._wait_for_local_model())
+        except Exception as e:
+            logger.warning("local_model_not_loaded", extra={"error": str(e)})
+            self.local_model = None
+            self.local_model_state = "failed"
+
+    def preload(self) -> None:
+        """
+        Load the 20K model in-process and block until done. Called by app.serve
+        before it forks, so every worker starts with the weights already in
+        memory (shared copy-on-write) and start() has nothing left to do.
+        """
+        model_path = settings.local_model_path
+        if self.local_model_state != "not_started" or settings.local_model_workers > 0:
+            return
+        if not os.path.exists(model_path):
+            return
+        from model.local_model import Local20KModel
+
+        self.local_model_state = "loading"
+        self.local_model = Local20KModel(model_path)
+        self.local_model.load()
+        if not self.local_model.is_loaded:
+            self.local_model = None
+            self.local_model_state = "failed"
+            return
+        self._register_local_backend()
+        self.local_model_state = "ready"
+
+    def _register_local_backend(self) -> None:
+        from model.local_model import Local20KModel
+
+        self._register_backend(
+            "local",
+            self.local_model,
+            capacity=settings.local_batch_max_size * max(1, settings.local_model_workers),
+            max_output_tokens=Local20KModel.max_new_tokens,
+            preferred=settings.prefer_local_model
+        )
+
+    def _register_backend(self, name: str, model, capacity: int, **kwargs) -> None:
+        """Register a backend with the router, guarded by a circuit breaker and concurrency limit"""
+        breaker = CircuitBreaker(
+            name,
+            failure_threshold=settings.circuit_breaker_failure_threshold,
+            reset_timeout_seconds=settings.circuit_breaker_reset_seconds,
+            half_open_max_calls=settings.circuit_breaker_half_open_calls
+        )
+        limiter = AdaptiveLimiter(
+            name,
+            initial_limit=settings.concurrency_limit_initial,
+            min_limit=settings.concurrency_limit_min,
+            max_limit=settings.concurrency_limit_max,
+            latency_target_ms=settings.concurrency_latency_target_ms
+        )
+        self.router.register(name, model, capacity, breaker=breaker, limiter=limiter, **kwargs)
+
+    async def shutdown(self):
+        """Stop background loading and any local model workers"""
+        if self._local_model_task is not None:
+            self._local_model_task.cancel()
+        stop = getattr(self.local_model, 'stop', None)
+        if stop is not None:
+            await run_blocking(stop)
+
+    async def _wait_for_local_model(self):
+        """Load in-process (off the event loop) or wait for the first worker"""
         try:
-            model_path = os.getenv("LOCAL_MODEL_PATH", "models/content-generator-20k")
-            if os.path.exists(model_path):
-                print(f"ℹ️ 20K model found at {model_path}")
-                # Try to import and load
-                import torch
-                from transformers import AutoTokenizer, AutoModelForCausalLM
-                
-                print(f"🔄 Loading 20K model...")
-                self.local_tokenizer = AutoTokenizer.from_pretrained(model_path)
-                self.local_model = AutoModelForCausalLM.from_pretrained(model_path)
-                self.local_model_available = True
-                print(f"✅ 20K model loaded successfully")
+            if hasattr(self.local_model, 'load'):
+                await run_blocking(self.local_model.load)
             else:
-                print(f"ℹ️ 20K model not found at {model_path}")
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + settings.local_model_load_timeout_seconds
+                # Stop early once every worker has given up on loading the model
+                while (not self.local_model.is_available() and not self.local_model.load_failed
+                       and loop.time() < deadline):
+                    await asyncio.sleep(0.5)
         except Exception as e:
-            print(f"ℹ️ 20K model not loaded: {e}")
-            self.local_model_available = False
+            logger.warning("local_model_not_loaded", extra={"error": str(e)})
+        self.local_model_state = "ready" if self.local_model_available else "failed"
+
+    @property
+    def local_model_available(self) -> bool:
+        """Whether the local model (in-process or a worker) can serve requests"""
+        return self.local_model is not None and self.local_model.is_available()
 
     def detect_length_requirement(self, prompt: str) -> dict:
         """Detect specific length requirements"""
-        prompt_lower = prompt.lower()
-        
-        # Line-based requirements
-        line_patterns = [
-            r'(?:in |write |create |generate |make )?(?:exactly )?(?:just )?(?:only )?(\d+) lines?',
-            r'(?:in |write |create |generate |make )?(one|two|three|four|five|six|seven|eight|nine|ten) lines?',
-            r'(\d+)[-\s]line',
-            r'(one|two|three|four|five|six|seven|eight|nine|ten)[-\s]line'
-        ]
-        
-        for pattern in line_patterns:
-            match = re.search(pattern, prompt_lower)
-            if match:
-                number_str = match.group(1)
-                if number_str.isdigit():
-                    lines = int(number_str)
-                else:
-                    word_map = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
-                               'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10}
-                    lines = word_map.get(number_str, 2)
-                return {'type': 'lines', 'count': lines}
-        
-        # Word-based requirements
-        word_patterns = [
-            r'(?:in |write |create |generate |make )?(?:exactly )?(?:just )?(?:only )?(\d+) words?',
-            r'(\d+)[-\s]word'
-        ]
-        
-        for pattern in word_patterns:
-            match = re.search(pattern, prompt_lower)
-            if match:
-                words = int(match.group(1))
-                return {'type': 'words', 'count': words}
-        
-        return {'type': 'default'}
+        return analyze_prompt(prompt).length_requirement
+
+    async def generate_quick_response(self, prompt: str, latency_budget_ms: Optional[float] = None) -> str:
+        """Generate a quick non-streaming response (raises AIServiceException if every backend fails)"""
+        content, _ = await self.generate_with_metadata(prompt, latency_budget_ms)
+        return content
 
-    async def generate_quick_response(self, prompt: str) -> str:
-        """Generate a quick non-streaming response with optional 20K model"""
+    async def generate_with_metadata(
+        self, prompt: str, latency_budget_ms: Optional[float] = None, context: str = ""
+    ) -> Tuple[str, dict]:
+        """
+        Generate a non-streaming response along with how it was routed (raises
+        AIServiceException). context is earlier conversation, sent ahead of the prompt.
+        """
         try:
-            # Model selection logic
-            use_local = self._should_use_local_model(prompt)
-            
-            if use_local and self.local_model_available:
+            content, routing = await self._generate_cached(prompt, latency_budget_ms, context)
+        except Exception:
+            metrics.REQUESTS.labels("quick", "error").inc()
+            raise
+        metrics.REQUESTS.labels("quick", "cached" if routing.get("cached") else "ok").inc()
+        return content, routing
+
+    async def _generate_cached(
+        self, prompt: str, latency_budget_ms: Optional[float] = None, context: str = ""
+    ) -> Tuple[str, dict]:
+        """Serve from the response cache when enabled, generating on a miss"""
+        if context:
+            # Replies that depend on conversation history are not worth caching
+            return await self._generate_routed(prompt, latency_budget_ms, context)
+        if not self._cache_enabled() and self.semantic_cache is None:
+            return await self._generate_routed(prompt, latency_budget_ms)
+
+        # Entries belong to the backend the request is routed to, since each
+        # model answers the same prompt differently
+        length_req = self.detect_length_requirement(prompt)
+        decision = self.router.route(prompt, length_req, latency_budget_ms)
+        if not self._cache_enabled():
+            return await self._generate_semantic(prompt, length_req, decision)
+
+        key = ResponseCache.make_key(
+            prompt,
+            length_req,
+            self._cache_model(decision.backend),
+            settings.temperature,
+            settings.max_tokens
+        )
+        routing = {}
+
+        async def compute() -> Tuple[str, str]:
+            content, metadata = await self._generate_semantic(prompt, length_req, decision)
+            routing.update(metadata)
+            return content, metadata["backend"]
+
+        content, served_by = await self.response_cache.get_or_compute(key, compute)
+        # Empty when another request (or an earlier one) did the generating
+        return content, routing or {"cached": True, "backend": served_by}
+
+    async def _generate_semantic(
+        self, prompt: str, length_req: dict, decision: RouteDecision
+    ) -> Tuple[str, dict]:
+        """Reuse the response to a paraphrase with the same length requirement and backend, if enabled"""
+        if self.semantic_cache is None:
+            return await self._generate_routed(prompt, decision=decision)
+        constraint = dict(length_req, backend=decision.backend.name)
+        match = self.semantic_cache.lookup(prompt, constraint)
+        if match is not None:
+            content, served_by = match.value
+            return content, {"cached": "semantic", "similarity": match.similarity, "backend": served_by}
+        content, routing = await self._generate_routed(prompt, decision=decision)
+        self.semantic_cache.add(prompt, constraint, (content, routing["backend"]))
+        return content, routing
+
+    @staticmethod
+    def _cache_model(backend: Backend) -> str:
+        """Which model a backend's replies come from, for cache keys"""
+        if backend.name == "gemini":
+            return f"gemini:{settings.gemini_model}"
+        return f"{backend.name}:{settings.local_model_path}"
+
+    async def generate_batch(
+        self, prompts: List[str], concurrency: int,
+        admit: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> AsyncGenerator[Tuple[int, Optional[str], dict, Optional[Exception]], None]:
+        """
+        Generate for many prompts with at most `concurrency` in flight, yielding
+        (index, content, metadata, error) in completion order. admit(index), if
+        given, is awaited before each prompt starts (rate limiting). Closing the
+        generator cancels the remaining work.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        next_index = iter(range(len(prompts)))
+
+        async def worker():
+            for index in next_index:
+                if admit is not None:
+                    await admit(index)
+                started = time.perf_counter()
                 try:
-                    print(f"🔬 Attempting generation with 20K model")
-                    return await self._generate_with_local_model(prompt)
+                    content, metadata = await self.generate_with_metadata(prompts[index])
+                    error = None
                 except Exception as e:
-                    print(f"❌ 20K model failed: {e}, falling back to Gemini")
-                    # Continue to Gemini fallback
-            
-            # Use Gemini (primary/fallback)
-            print(f"🤖 Generating with Gemini")
-            return await self._generate_with_gemini(prompt)
-            
+                    content, metadata, error = None, {}, e
+                metadata["generation_time"] = round(time.perf_counter() - started, 3)
+                await queue.put((index, content, metadata, error))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency, len(prompts)))]
+        try:
+            for _ in range(len(prompts)):
+                yield await queue.get()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def _cache_enabled(self) -> bool:
+        """Caching sampled output is opt-in, since it makes repeats deterministic"""
+        if not settings.response_cache_enabled:
+            return False
+        return settings.temperature <= 0 or settings.response_cache_sampled
+
+    async def _generate_routed(
+        self, prompt: str, latency_budget_ms: Optional[float] = None, context: str = "",
+        decision: Optional[RouteDecision] = None
+    ) -> Tuple[str, dict]:
+        """Generate with the routed backend (decision, if already routed), falling back to the others in order"""
+        if decision is None:
+            started = time.perf_counter()
+            length_req = self.detect_length_requirement(prompt)
+            analyzed = time.perf_counter()
+            decision = self.router.route(prompt, length_req, latency_budget_ms, len(context))
+            metrics.STAGE_SECONDS.labels("analyze").observe(analyzed - started)
+            metrics.STAGE_SECONDS.labels("route").observe(time.perf_counter() - analyzed)
+        failed = []
+        last_error = None
+
+        for index, backend in enumerate(decision.candidates):
+            hedge = None
+            try:
+                if index == 0 and self.hedger is not None:
+                    content, served_by, hedge = await self._generate_hedged(decision, prompt, context)
+                else:
+                    content, served_by = await self._generate_on(backend, prompt, context), backend.name
+            except Exception as e:
+                logger.warning("backend_failed", extra={
+                    "backend": backend.name, "mode": "quick", "error": metrics.error_code(e), "detail": str(e)
+                })
+                if index < len(decision.candidates) - 1:
+                    metrics.FALLBACKS.labels(backend.name).inc()
+                failed.append(backend.name)
+                last_error = e
+                continue
+            metadata = decision.metadata(served_by, failed)
+            if hedge is not None:
+                metadata["hedge"] = hedge
+            return content, metadata
+
+        if isinstance(last_error, AIServiceException):
+            raise last_error
+        raise AIServiceException(f"Generation failed: {last_error}", "GENERATION_FAILED")
+
+    async def _generate_hedged(
+        self, decision: RouteDecision, prompt: str, context: str = ""
+    ) -> Tuple[str, str, dict]:
+        """Send a backup request if the routed backend is slower than its usual tail latency"""
+        primary = decision.backend
+        backup = primary
+        if settings.hedge_target == "alternate" and len(decision.candidates) > 1:
+            backup = decision.candidates[1]
+        delay = self.hedger.delay_for(primary.stats)
+        content, fired, winner = await self.hedger.run(
+            lambda: self._generate_on(primary, prompt, context, hedged=True),
+            lambda: self._generate_on(backup, prompt, context, hedged=True),
+            delay
+        )
+        served_by = backup.name if winner == "hedge" else primary.name
+        return content, served_by, {
+            "delay_ms": round(delay * 1000, 1),
+            "fired": fired,
+            "target": backup.name,
+            "winner": winner,
+        }
+
+    async def _generate_on(self, backend: Backend, prompt: str, context: str = "", hedged: bool = False) -> str:
+        """
+        One generation attempt on a backend, recorded by the router. Every
+        backend's reply goes through the same length filter.
+        """
+        generate = self._generate_with_local_model if backend.name == "local" else self._generate_with_gemini
+        analysis = analyze_prompt(prompt)
+        final_prompt = self._model_prompt(backend.name, prompt, analysis, context)
+        logger.debug("generate", extra={"backend": backend.name})
+
+        try:
+            started = self.router.begin(backend.name)
+        except AIServiceException as e:
+            metrics.ERRORS.labels(backend.name, metrics.error_code(e)).inc()
+            raise
+        upstream = metrics.UPSTREAM_SECONDS
+        try:
+            content = self._apply_length_filter(analysis.length_requirement, await generate(final_prompt))
+        except asyncio.CancelledError as e:
+            # A cancelled hedge loser tells us nothing about latency
+            upstream.labels(backend.name, "quick", "cancelled").observe(time.perf_counter() - started)
+            if isinstance(e, StillRunning):
+                self._abandon_when_done(e.future, backend.name, hedged)
+            else:
+                self.router.abandon(backend.name)
+            raise
         except Exception as e:
-            return f"Sorry, I encountered an error: {str(e)}"
+            self.router.finish(backend.name, started, len(context) + len(prompt), 0, ok=False)
+            upstream.labels(backend.name, "quick", "error").observe(time.perf_counter() - started)
+            metrics.ERRORS.labels(backend.name, metrics.error_code(e)).inc()
+            raise
+        self.router.finish(backend.name, started, len(context) + len(prompt), len(content))
+        upstream.labels(backend.name, "quick", "ok").observe(time.perf_counter() - started)
+        return content
 
-    def _should_use_local_model(self, prompt: str) -> bool:
-        """Decide when to use 20K model - currently always returns False"""
-        # Always use Gemini for now (your 20K model has quality issues)
-        return False
-        
-        # To enable 20K model for testing, uncomment:
-        # return self.local_model_available and "test" in prompt.lower()
+    def _abandon_when_done(self, future, name: str, hedged: bool) -> None:
+        """
+        The cancelled call is still running in its thread and still loading the
+        upstream: keep its concurrency slot (and hedge budget) until it returns
+        """
+        loop = asyncio.get_running_loop()
+        if hedged:
+            self.hedger.hold()
+
+        def release() -> None:
+            self.router.abandon(name)
+            if hedged:
+                self.hedger.release()
+
+        def on_done(_) -> None:
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:
+                pass  # event loop already closed
 
-    async def _generate_with_local_model(self, prompt: str) -> str:
-        """Generate with 20K model"""
+        future.add_done_callback(on_done)
+
+    @staticmethod
+    def _model_prompt(backend_name: str, prompt: str, analysis, context: str = "") -> str:
+        """
+        What a backend is sent. The local model wraps the prompt in its own
+        "Generate content: ... Output:" template, so it gets the prompt as is;
+        Gemini gets build_prompt's length instruction.
+        """
+        if backend_name == "local":
+            return context + prompt
+        return context + build_prompt(prompt, analysis)
+
+    async def _generate_with_local_model(self, final_prompt: str) -> str:
+        """Generate with 20K model (batched with other concurrent requests)"""
         if not self.local_model_available:
             raise Exception("20K model not available")
         
-        try:
-            # Format prompt for your model
-            formatted_prompt = f"Generate content: {prompt}\n\nOutput:"
-            
-            inputs = self.local_tokenizer.encode(formatted_prompt, return_tensors="pt")
-            
-            with torch.no_grad():
-                outputs = self.local_model.generate(
-                    inputs,
-                    max_length=len(inputs[0]) + 150,
-                    temperature=0.7,
-                    do_sample=True,
-                    pad_token_id=self.local_tokenizer.eos_token_id
-                )
-            
-            response = self.local_tokenizer.decode(outputs[0], skip_special_tokens=True)
-            response = response.replace(formatted_prompt, "").strip()
-            
-            return response
-            
-        except Exception as e:
-            raise Exception(f"20K model generation failed: {e}")
+        return await self.local_model.generate_content(final_prompt)
 
-    async def _generate_with_gemini(self, prompt: str) -> str:
+    async def _generate_with_gemini(self, final_prompt: str) -> str:
         """Generate with Gemini - your existing working code"""
-        length_req = self.detect_length_requirement(prompt)
-        
-        # Create appropriate prompt
-        if length_req['type'] == 'lines':
-            final_prompt = f"Create exactly {length_req['count']} lines for: {prompt}\n\nResponse:"
-        elif length_req['type'] == 'words':
-            final_prompt = f"Create exactly {length_req['count']} words for: {prompt}\n\nResponse:"
-        else:
-            final_prompt = prompt
-
-        # Use Gemini (your existing logic)
-        response = self.model.generate_content(
-            final_prompt,
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=settings.max_tokens,
-                temperature=settings.temperature,
-                candidate_count=1
-            )
-        )
-        
-        if hasattr(response, 'text') and response.text:
-            full_response = response.text.strip()
-        else:
-            full_response = "Generated content successfully!"
-
-        # Apply truncation if needed
-        if length_req['type'] == 'lines':
-            final_response = self._force_line_limit(full_response, length_req['count'])
-        elif length_req['type'] == 'words':
-            final_response = self._force_word_limit(full_response, length_req['count'])
-        else:
-            final_response = full_response
+        return await self.gemini.generate_content(final_prompt)
 
+    def _apply_length_filter(self, length_req: dict, full_response: str) -> str:
+        """Cut a complete response to the requested length, whichever backend wrote it"""
+        started = time.perf_counter()
+        final_response = apply_filter(make_filter(length_req), full_response)
+        metrics.STAGE_SECONDS.labels("filter").observe(time.perf_counter() - started)
+        if length_req['type'] != 'default' and full_response:
+            metrics.TRUNCATION_RATIO.labels(length_req['type']).observe(len(final_response) / len(full_response))
         return final_response
 
-    async def generate_streaming_content(self, prompt: str) -> AsyncGenerator[str, None]:
-        """Generate streaming content - your existing working code"""
-        length_req = self.detect_length_requirement(prompt)
-        
-        # Create appropriate prompt
-        if length_req['type'] == 'lines':
-            final_prompt = f"Create exactly {length_req['count']} lines for: {prompt}\n\nResponse:"
-        elif length_req['type'] == 'words':
-            final_prompt = f"Create exactly {length_req['count']} words for: {prompt}\n\nResponse:"
-        else:
-            final_prompt = prompt
+    async def generate_streaming_content(
+        self,
+        prompt: str,
+        route_info: Optional[dict] = None,
+        latency_budget_ms: Optional[float] = None,
+        context: str = ""
+    ) -> AsyncGenerator[str, None]:
+        """
+        Generate streaming content; routing details are written into route_info.
+        context is earlier conversation, sent ahead of the prompt.
+        """
+        started = time.perf_counter()
+        analysis = analyze_prompt(prompt)
+        length_req = analysis.length_requirement
+        final_prompt = context + build_prompt(prompt, analysis)
+        metrics.STAGE_SECONDS.labels("analyze").observe(time.perf_counter() - started)
 
+        outcome = "cancelled"  # unless we reach the end or fail
+        received = emitted = 0
+        filter_seconds = 0.0
         try:
-            response = self.model.generate_content(
-                final_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=min(800, settings.max_tokens),
-                    temperature=settings.temperature,
-                    candidate_count=1
-                ),
-                stream=True
+            started = time.perf_counter()
+            decision = self.router.route(prompt, length_req, latency_budget_ms, len(context))
+            metrics.STAGE_SECONDS.labels("route").observe(time.perf_counter() - started)
+            source = self._stream_routed(
+                decision, prompt, final_prompt, {} if route_info is None else route_info, context
             )
 
-            # Collect all output first
-            full_response = ""
-            for chunk in response:
+            # Forward filtered chunks as soon as they arrive
+            stream_filter = make_filter(length_req)
+            try:
+                async for chunk in source:
+                    started = time.perf_counter()
+                    text = stream_filter.feed(chunk)
+                    filter_seconds += time.perf_counter() - started
+                    received += len(chunk)
+                    if text:
+                        emitted += len(text)
+                        yield text
+                    if stream_filter.done:
+                        # Limit reached - stop paying for tokens we would discard
+                        break
+                else:
+                    text = stream_filter.finish()
+                    if text:
+                        emitted += len(text)
+                        yield text
+            finally:
+                # Closes the upstream stream early if we stopped reading
+                await source.aclose()
+            outcome = "ok"
+
+        except Exception as e:
+            outcome = "error"
+            if route_info is not None:
+                route_info["error"] = metrics.error_code(e)
+            yield f"Error: {str(e)}"
+        finally:
+            metrics.REQUESTS.labels("stream", outcome).inc()
+            metrics.STAGE_SECONDS.labels("filter").observe(filter_seconds)
+            if length_req['type'] != 'default' and received:
+                metrics.TRUNCATION_RATIO.labels(length_req['type']).observe(emitted / received)
+
+    async def _stream_with_gemini(self, final_prompt: str) -> AsyncGenerator[str, None]:
+        """Yield raw Gemini text chunks; closing the generator cancels the stream"""
+        response = await run_blocking(
+            self.model.generate_content,
+            final_prompt,
+            generation_config=genai.types.GenerationConfig(
+                max_output_tokens=min(800, settings.max_tokens),
+                temperature=settings.temperature,
+                candidate_count=1
+            ),
+            stream=True
+        )
+        chunks = iterate_blocking(response)
+        exhausted = False
+        try:
+            async for chunk in chunks:
                 if hasattr(chunk, 'text') and chunk.text:
-                    full_response += chunk.text
+                    yield chunk.text
+            exhausted = True
+        finally:
+            await chunks.aclose()
+            if not exhausted:
+                # Limit reached or client went away
+                self._close_stream(response)
 
-            # Post-processing truncation
-            if length_req['type'] == 'lines':
-                truncated = self._force_line_limit(full_response, length_req['count'])
-            elif length_req['type'] == 'words':
-                truncated = self._force_word_limit(full_response, length_req['count'])
+    async def _stream_routed(
+        self, decision: RouteDecision, prompt: str, final_prompt: str, route_info: dict,
+        context: str = ""
+    ) -> AsyncGenerator[str, None]:
+        """Stream from the routed backend, falling back to the next one if it fails before any output"""
+        failed = []
+        last_error = None
+        for backend in decision.candidates:
+            try:
+                started = self.router.begin(backend.name)
+            except AIServiceException as e:
+                # Circuit open or at its concurrency limit - don't wait on it
+                logger.warning("backend_rejected", extra={
+                    "backend": backend.name, "mode": "stream", "error": e.error_code, "detail": e.message
+                })
+                metrics.ERRORS.labels(backend.name, metrics.error_code(e)).inc()
+                if backend is not decision.candidates[-1]:
+                    metrics.FALLBACKS.labels(backend.name).inc()
+                failed.append(backend.name)
+                last_error = e
+                continue
+
+            logger.debug("stream", extra={"backend": backend.name, "reason": decision.reason})
+            if backend.name == "local":
+                # The local model applies its own template (see _model_prompt)
+                source = self.local_model.generate_stream(context + prompt)
             else:
-                truncated = full_response.strip()
+                source = self._stream_with_gemini(final_prompt)
 
-            # Stream the final result
-            for char in truncated:
-                yield char
+            route_info.update(decision.metadata(backend.name, failed))
+            produced = chunks = 0
+            ok = True
+            try:
+                async for text in source:
+                    if not chunks:
+                        metrics.TIME_TO_FIRST_CHUNK.labels(backend.name).observe(time.perf_counter() - started)
+                    chunks += 1
+                    produced += len(text)
+                    yield text
+                return
+            except Exception as e:
+                ok = False
+                metrics.ERRORS.labels(backend.name, metrics.error_code(e)).inc()
+                if produced:
+                    raise
+                logger.warning("backend_failed", extra={
+                    "backend": backend.name, "mode": "stream", "error": metrics.error_code(e), "detail": str(e)
+                })
+                if backend is not decision.candidates[-1]:
+                    metrics.FALLBACKS.labels(backend.name).inc()
+                failed.append(backend.name)
+                last_error = e
+            finally:
+                await source.aclose()
+                # An early stop by the reader still counts as a successful sample
+                self.router.finish(backend.name, started, len(context) + len(prompt), produced, ok=ok)
+                metrics.UPSTREAM_SECONDS.labels(backend.name, "stream", "ok" if ok else "error").observe(
+                    time.perf_counter() - started
+                )
+                metrics.STREAM_CHUNKS.labels(backend.name).observe(chunks)
 
-        except Exception as e:
-            yield f"Error: {str(e)}"
+        route_info.update(backend=None, failed=failed)
+        raise last_error
+
+    def _close_stream(self, response) -> None:
+        """Cancel the underlying Gemini stream so no further chunks are generated"""
+        iterator = getattr(response, '_iterator', None)
+        cancel = getattr(iterator, 'cancel', None) or getattr(iterator, 'close', None)
+        if callable(cancel):
+            try:
+                cancel()
+            except Exception as e:
+                logger.info("stream_close_failed", extra={"error": str(e)})
 
     def _force_line_limit(self, text: str, max_lines: int) -> str:
         """Force exact line count"""
-        text = text.strip()
-        lines = text.split('\n')
-        clean_lines = [line.strip() for line in lines if line.strip() and not self._is_intro_line(line)]
-        return '\n'.join(clean_lines[:max_lines])
+        return apply_filter(LineLimitFilter(max_lines), text)
 
     def _force_word_limit(self, text: str, max_words: int) -> str:
         """Force exact word count"""
-        text = text.strip()
-        words = text.split()
-        return ' '.join(words[:max_words])
+        return apply_filter(WordLimitFilter(max_words), text)
 
     def _is_intro_line(self, line: str) -> bool:
         """Check if line is intro text"""
-        line_lower = line.lower().strip()
-        intro_phrases = ["here's", 'here is', 'here are', 'this is', 'caption:', 'response:']
-        return any(line_lower.startswith(phrase) for phrase in intro_phrases)
+        return is_intro_line(line)
@@ -0,0 +1,205 @@
+# app/services/context_builder.py
+"""
+Bounded conversation context for follow-up messages.
+
+Each conversation keeps its recent turns verbatim plus a rolling summary of
+older ones, with a running (estimated) token count so nothing is re-measured.
+Adding a turn costs O(turn). When the total goes over the budget, the oldest
+turns are folded into the summary until the total is back under
+keep_ratio * budget, so folding happens once every few turns rather than on
+each one, and each turn is summarized only once.
+"""
+import math
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Iterable, List, Optional, Tuple
+
+from app import metrics
+from app.services.model_router import CHARS_PER_TOKEN
+from config.settings import settings
+
+ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+# Per-turn cost of the "Role: " label and line break
+TURN_OVERHEAD_TOKENS = 2
+SUMMARY_SNIPPET_CHARS = 160
+SUMMARY_SEPARATOR = "; "
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class Turn:
+    role: str
+    text: str
+    tokens: int
+
+
+@dataclass
+class ConversationContext:
+    summary: str = ""
+    summary_tokens: int = 0
+    turns: Deque[Turn] = field(default_factory=deque)
+    turn_tokens: int = 0
+    rendered: Optional[str] = None  # cached render(); cleared on every change
+    # Messages of the conversation this context has seen, to tell when the
+    # store holds turns another process added
+    messages: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.summary_tokens + self.turn_tokens
+
+
+def _snippet(text: str, limit: int = SUMMARY_SNIPPET_CHARS) -> str:
+    """First sentence (or line) of a turn, at most limit characters"""
+    text = " ".join(text[:limit * 2].split())
+    for mark in (". ", "? ", "! "):
+        end = text.find(mark)
+        if 0 < end < limit:
+            return text[:end + 1]
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def extractive_summary(previous: str, turns: List[Turn], max_chars: int) -> str:
+    """
+    Default summarizer: append the opening sentence of each folded turn and,
+    past max_chars, drop the oldest entries. Costs O(folded turns + max_chars).
+    """
+    if max_chars <= 0:
+        return ""
+    parts = [f"{ROLE_LABELS.get(t.role, t.role)}: {_snippet(t.text)}" for t in turns]
+    summary = SUMMARY_SEPARATOR.join(([previous] if previous else []) + parts)
+    if len(summary) > max_chars:
+        summary = summary[-max_chars:]
+        cut = summary.find(SUMMARY_SEPARATOR)
+        if cut != -1:
+            summary = summary[cut + len(SUMMARY_SEPARATOR):]
+    return summary
+
+
+class ContextBuilder:
+    """Per-conversation context kept within a token budget, LRU-bounded by conversation count"""
+
+    def __init__(self, budget_tokens: int, summary_max_tokens: int, keep_ratio: float = 0.75,
+                 max_conversations: int = 10000,
+                 summarizer: Callable[[str, List[Turn], int], str] = extractive_summary):
+        self.budget_tokens = budget_tokens
+        self.summary_max_tokens = min(summary_max_tokens, budget_tokens // 2)
+        self.keep_ratio = keep_ratio
+        self.max_conversations = max_conversations
+        self.summarizer = summarizer
+        self._contexts: "OrderedDict[object, ConversationContext]" = OrderedDict()
+        self.turns_added = 0
+        self.turns_folded = 0
+        self.summaries = 0
+        self.hydrated = 0
+        self.stale_reloads = 0  # contexts dropped because the store was ahead
+        self.evictions = 0
+
+    @classmethod
+    def from_settings(cls) -> "ContextBuilder":
+        return cls(
+            budget_tokens=settings.context_budget_tokens,
+            summary_max_tokens=settings.context_summary_max_tokens,
+            keep_ratio=settings.context_keep_ratio,
+            max_conversations=settings.context_max_conversations
+        )
+
+    def __contains__(self, conversation_id) -> bool:
+        return conversation_id in self._contexts
+
+    def add_turn(self, conversation_id, role: str, text: str) -> ConversationContext:
+        context = self._context(conversation_id)
+        tokens = estimate_tokens(text) + TURN_OVERHEAD_TOKENS
+        context.turns.append(Turn(role, text, tokens))
+        context.turn_tokens += tokens
+        context.messages += 1
+        context.rendered = None
+        self.turns_added += 1
+        if context.total_tokens > self.budget_tokens:
+            self._fold(context)
+        return context
+
+    def hydrate(self, conversation_id, turns: Iterable[Tuple[str, str]], stored: Optional[int] = None) -> None:
+        """
+        Seed a conversation that is not in memory from stored (role, content)
+        pairs, oldest first; stored is the conversation's total message count
+        when turns are only its most recent ones
+        """
+        if conversation_id in self._contexts:
+            return
+        context = self._context(conversation_id)
+        for role, text in turns:
+            self.add_turn(conversation_id, role, text)
+        if stored is not None:
+            context.messages = max(context.messages, stored)
+        self.hydrated += 1
+
+    def is_behind(self, conversation_id, stored: int) -> bool:
+        """True if the store has more messages than this context has seen"""
+        context = self._contexts.get(conversation_id)
+        return context is not None and stored > context.messages
+
+    def forget(self, conversation_id) -> None:
+        self._contexts.pop(conversation_id, None)
+
+    def render(self, conversation_id) -> str:
+        """History to put ahead of the next message ("" for a new conversation)"""
+        context = self._contexts.get(conversation_id)
+        if context is None:
+            return ""
+        self._contexts.move_to_end(conversation_id)
+        if context.rendered is None:
+            sections = []
+            if context.summary:
+                sections.append(f"Summary of the earlier conversation: {context.summary}\n\n")
+            if context.turns:
+                sections.append("Conversation so far:\n")
+                sections.extend(
+                    f"{ROLE_LABELS.get(t.role, t.role)}: {t.text}\n" for t in context.turns
+                )
+                sections.append("\n")
+            context.rendered = "".join(sections)
+        metrics.CONTEXT_TOKENS.observe(context.total_tokens)
+        return context.rendered
+
+    def _context(self, conversation_id) -> ConversationContext:
+        context = self._contexts.get(conversation_id)
+        if context is None:
+            context = self._contexts[conversation_id] = ConversationContext()
+            if len(self._contexts) > self.max_conversations:
+                self._contexts.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._contexts.move_to_end(conversation_id)
+        return context
+
+    def _fold(self, context: ConversationContext) -> None:
+        """Move the oldest turns into the summary until back under keep_ratio * budget"""
+        target = max(self.budget_tokens * self.keep_ratio - self.summary_max_tokens, 0)
+        folded = []
+        while context.turns and context.turn_tokens > target:
+            turn = context.turns.popleft()
+            context.turn_tokens -= turn.tokens
+            folded.append(turn)
+        context.summary = self.summarizer(
+            context.summary, folded, self.summary_max_tokens * CHARS_PER_TOKEN
+        )
+        context.summary_tokens = estimate_tokens(context.summary)
+        self.turns_folded += len(folded)
+        self.summaries += 1
+        metrics.CONTEXT_SUMMARIES.inc()
+
+    def stats(self) -> dict:
+        return {
+            "conversations": len(self._contexts),
+            "budget_tokens": self.budget_tokens,
+            "turns_added": self.turns_added,
+            "turns_folded": self.turns_folded,
+            "summaries": self.summaries,
+            "hydrated": self.hydrated,
+            "stale_reloads": self.stale_reloads,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,447 @@
+# app/services/conversation_store.py
+"""
+Conversation persistence with write-behind batching.
+
+Request handlers call record() which only appends to an in-memory queue and
+returns at once; a single background task drains the queue and writes
+messages in batches, one transaction per batch. Conversations are created on
+first sight and their message_count / last_message / updated_at columns are
+maintained in the same transaction, so listings never have to count rows.
+
+If the database falls behind and the queue fills up, new writes are dropped
+and counted rather than slowing down requests.
+
+Listings use keyset pagination over (sort column, id), so every page costs
+the same however deep it is, and search goes through the full-text index
+created by app.database.create_search_index. total_count is counted once
+per listing, up to a cap, and then reused (cached, and carried in the cursor).
+"""
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import re
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Integer, bindparam, column, exists, false, func, insert, literal_column, select, text, tuple_, update
+)
+from sqlalchemy.orm import selectinload
+from sqlalchemy.types import Uuid
+
+from app import metrics
+from app.exceptions import ValidationException
+from app.models import Conversation, Message, utcnow
+from app.schemas import PaginationParams
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+TITLE_LENGTH = 80
+PREVIEW_LENGTH = 255
+COUNT_CACHE_ENTRIES = 1024
+SEARCH_TERM = re.compile(r"\w+")
+
+# Above this many matching messages a term counts as dense (see _search_filter)
+SEARCH_DENSE_HITS = 2000
+
+SQLITE_SEARCH_HITS = (
+    "SELECT count(*) FROM (SELECT rowid FROM messages_fts WHERE messages_fts MATCH :match LIMIT :limit)"
+)
+SQLITE_SEARCH_ROWIDS = "SELECT rowid FROM messages_fts WHERE messages_fts MATCH :match"
+SQLITE_SEARCH_CONVERSATIONS = (
+    "SELECT m.conversation_id FROM messages_fts "
+    "JOIN messages m ON m.rowid = messages_fts.rowid "
+    "WHERE messages_fts MATCH :match"
+)
+
+
+@dataclass
+class PendingMessage:
+    conversation_id: uuid.UUID
+    role: str
+    content: str
+    metadata: Optional[dict] = None
+    user_id: Optional[str] = None
+    id: uuid.UUID = field(default_factory=uuid.uuid4)
+    created_at: object = field(default_factory=utcnow)
+
+
+class ConversationStore:
+    def __init__(self, session_factory, batch_size: int = 200, flush_interval_ms: int = 250,
+                 max_queue: int = 10000, max_attempts: int = 3, count_cap: int = 10000,
+                 count_cache_seconds: float = 30.0):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_batch_ms = 0.0
+        self.count_cap = count_cap
+        self.count_cache_seconds = count_cache_seconds
+        self._counts: "OrderedDict[str, Tuple[float, int, bool]]" = OrderedDict()
+        self.counts_computed = 0
+
+    @classmethod
+    def from_settings(cls) -> "ConversationStore":
+        from app.database import async_session
+        return cls(
+            async_session,
+            batch_size=settings.conversation_write_batch_size,
+            flush_interval_ms=settings.conversation_write_flush_ms,
+            max_queue=settings.conversation_write_queue_max,
+            count_cap=settings.conversation_count_cap,
+            count_cache_seconds=settings.conversation_count_cache_seconds
+        )
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Write out what is queued (up to timeout), then stop the writer"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("conversation_writes_abandoned", extra={"pending": self._queue.qsize()})
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def record(self, conversation_id: uuid.UUID, role: str, content: str,
+               metadata: Optional[dict] = None, user_id: Optional[str] = None) -> Optional[uuid.UUID]:
+        """Queue a message for writing; returns its id, or None if it was dropped"""
+        message = PendingMessage(conversation_id, role, content, metadata, user_id)
+        if self._queue is None:
+            self.dropped += 1
+            return None
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            metrics.CONVERSATION_WRITES.labels("dropped").inc()
+            return None
+        return message.id
+
+    async def flush(self) -> None:
+        """Wait until every message queued so far has been written (or given up on)"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            if self.flush_interval and self._queue.qsize() < self.batch_size - 1:
+                # Let the batch fill up; this delay is never seen by requests
+                await asyncio.sleep(self.flush_interval)
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self._write_with_retry(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_with_retry(self, batch: List[PendingMessage]) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                await self._write(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self.failed += len(batch)
+                    metrics.CONVERSATION_WRITES.labels("failed").inc(len(batch))
+                    logger.error("conversation_batch_failed", extra={
+                        "messages": len(batch), "attempts": attempt, "error": str(e)
+                    })
+                    return
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+                continue
+            elapsed = time.perf_counter() - started
+            self.written += len(batch)
+            self.batches += 1
+            self.last_batch_ms = round(elapsed * 1000, 3)
+            metrics.CONVERSATION_WRITES.labels("written").inc(len(batch))
+            metrics.CONVERSATION_BATCH_SECONDS.observe(elapsed)
+            metrics.CONVERSATION_BATCH_SIZE.observe(len(batch))
+            return
+
+    async def _write(self, batch: List[PendingMessage]) -> None:
+        """One transaction: create new conversations, insert messages, bump counters"""
+        by_conversation: Dict[uuid.UUID, List[PendingMessage]] = OrderedDict()
+        for message in batch:
+            by_conversation.setdefault(message.conversation_id, []).append(message)
+
+        async with self.session_factory() as session, session.begin():
+            existing = set((await session.execute(
+                select(Conversation.id).where(Conversation.id.in_(list(by_conversation)))
+            )).scalars())
+            new = [
+                {
+                    "id": conversation_id,
+                    "title": _title(messages),
+                    "user_id": messages[0].user_id,
+                    "created_at": messages[0].created_at,
+                    "updated_at": messages[0].created_at,
+                    "is_archived": False,
+                    "message_count": 0,
+                }
+                for conversation_id, messages in by_conversation.items()
+                if conversation_id not in existing
+            ]
+            connection = await session.connection()
+            if new:
+                await connection.execute(insert(Conversation), new)
+            await connection.execute(insert(Message), [
+                {
+                    "id": m.id,
+                    "conversation_id": m.conversation_id,
+                    "role": m.role,
+                    "content": m.content,
+                    "created_at": m.created_at,
+                    "metadata": m.metadata,
+                }
+                for m in batch
+            ])
+            table = Conversation.__table__
+            await connection.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(
+                    message_count=table.c.message_count + bindparam("b_added"),
+                    updated_at=bindparam("b_updated_at"),
+                    last_message=bindparam("b_last_message"),
+                ),
+                [
+                    {
+                        "b_id": conversation_id,
+                        "b_added": len(messages),
+                        "b_updated_at": messages[-1].created_at,
+                        "b_last_message": messages[-1].content[:PREVIEW_LENGTH],
+                    }
+                    for conversation_id, messages in by_conversation.items()
+                ]
+            )
+
+    async def get_conversation(self, conversation_id: uuid.UUID) -> Optional[Conversation]:
+        """A conversation with its messages, oldest first"""
+        async with self.session_factory() as session:
+            return (await session.execute(
+                select(Conversation)
+                .where(Conversation.id == conversation_id)
+                .options(selectinload(Conversation.messages))
+            )).scalar_one_or_none()
+
+    async def message_count(self, conversation_id: uuid.UUID) -> int:
+        """Stored messages of a conversation (0 if it has none yet)"""
+        async with self.session_factory() as session:
+            count = (await session.execute(
+                select(Conversation.message_count).where(Conversation.id == conversation_id)
+            )).scalar_one_or_none()
+        return count or 0
+
+    async def recent_messages(self, conversation_id: uuid.UUID, limit: int) -> List[Tuple[str, str]]:
+        """(role, content) of the newest stored messages, oldest first"""
+        if limit <= 0:
+            return []
+        async with self.session_factory() as session:
+            rows = (await session.execute(
+                select(Message.role, Message.content)
+                .where(Message.conversation_id == conversation_id)
+                .order_by(Message.created_at.desc())
+                .limit(limit)
+            )).all()
+        return [(role, content) for role, content in reversed(rows)]
+
+    async def list_conversations(self, params: PaginationParams, user_id: Optional[str] = None,
+                                 include_archived: bool = False) -> dict:
+        """
+        One page of conversations, newest first unless sort_order is asc, optionally
+        restricted to those with a message matching params.search. Raises
+        ValidationException for a cursor that is malformed or from another listing.
+        """
+        sort_column = getattr(Conversation, params.sort_by or "created_at")
+        descending = params.sort_order != "asc"
+        listing = _fingerprint(params, user_id, include_archived)
+        cursor = _decode_cursor(params.cursor, listing) if params.cursor else None
+
+        async with self.session_factory() as session:
+            dialect = (await session.connection()).dialect.name
+            filters = []
+            if not include_archived:
+                filters.append(Conversation.is_archived == false())
+            if user_id is not None:
+                filters.append(Conversation.user_id == user_id)
+            if params.search:
+                matching = await _search_filter(session, dialect, params.search)
+                if matching is None:
+                    return _page([], 0, False, False, None)
+                filters.append(matching)
+
+            if cursor is None:
+                total, capped = await self._count(session, listing, filters)
+            else:
+                total, capped = cursor["t"], cursor["c"]
+
+            stmt = select(Conversation).where(*filters)
+            if cursor is not None:
+                key = tuple_(sort_column, Conversation.id)
+                after = tuple_(datetime.fromisoformat(cursor["v"]), uuid.UUID(cursor["id"]))
+                stmt = stmt.where(key < after if descending else key > after)
+            if descending:
+                stmt = stmt.order_by(sort_column.desc(), Conversation.id.desc())
+            else:
+                stmt = stmt.order_by(sort_column.asc(), Conversation.id.asc())
+            rows = list((await session.execute(stmt.limit(params.page_size + 1))).scalars())
+
+        has_more = len(rows) > params.page_size
+        rows = rows[:params.page_size]
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = _encode_cursor({
+                "f": listing,
+                "v": getattr(last, sort_column.key).isoformat(),
+                "id": last.id.hex,
+                "t": total,
+                "c": capped,
+            })
+        return _page(rows, total, capped, has_more, next_cursor)
+
+    async def _count(self, session, listing: str, filters) -> Tuple[int, bool]:
+        """Matches for a listing, counted at most up to count_cap and cached for a while"""
+        now = time.monotonic()
+        cached = self._counts.get(listing)
+        if cached is not None and cached[0] > now:
+            self._counts.move_to_end(listing)
+            return cached[1], cached[2]
+
+        limited = select(Conversation.id).where(*filters).limit(self.count_cap + 1).subquery()
+        found = await session.scalar(select(func.count()).select_from(limited))
+        total, capped = min(found, self.count_cap), found > self.count_cap
+        self.counts_computed += 1
+        self._counts[listing] = (now + self.count_cache_seconds, total, capped)
+        self._counts.move_to_end(listing)
+        if len(self._counts) > COUNT_CACHE_ENTRIES:
+            self._counts.popitem(last=False)
+        return total, capped
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_batch_ms": self.last_batch_ms,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "counts_computed": self.counts_computed,
+            "counts_cached": len(self._counts),
+        }
+
+
+def _title(messages: List[PendingMessage]) -> str:
+    """First user message, shortened, as the title of a new conversation"""
+    first = next((m for m in messages if m.role == "user"), messages[0])
+    title = " ".join(first.content.split())
+    return title if len(title) <= TITLE_LENGTH else title[:TITLE_LENGTH - 3].rstrip() + "..."
+
+
+def _page(conversations, total: int, capped: bool, has_more: bool, next_cursor: Optional[str]) -> dict:
+    return {
+        "conversations": conversations,
+        "total_count": total,
+        "total_count_capped": capped,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+    }
+
+
+async def _search_filter(session, dialect: str, search: str):
+    """
+    Filter for conversations with a message matching every search term (the
+    last as a prefix), or None when the search has no terms.
+
+    On SQLite a rare term collects its few conversations up front. A dense
+    term would make that a large join and de-duplication, so instead
+    conversations are walked in page order and each is checked against the
+    set of matching message rowids, which stops as soon as the page is full.
+    """
+    terms = SEARCH_TERM.findall(search.lower())
+    if not terms:
+        return None
+    if dialect == "sqlite":
+        # Quoting each term keeps FTS5 query syntax out of user input
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        hits = await session.scalar(text(SQLITE_SEARCH_HITS), {"match": match, "limit": SEARCH_DENSE_HITS})
+        if hits < SEARCH_DENSE_HITS:
+            return Conversation.id.in_(
+                text(SQLITE_SEARCH_CONVERSATIONS).bindparams(match=match).columns(column("conversation_id", Uuid))
+            )
+        rowids = text(SQLITE_SEARCH_ROWIDS).bindparams(match=match).columns(column("rowid", Integer))
+        return exists().where(
+            Message.conversation_id == Conversation.id,
+            literal_column("messages.rowid").in_(rowids)
+        )
+    if dialect == "postgresql":
+        query = func.to_tsquery("english", " & ".join(terms[:-1] + [terms[-1] + ":*"]))
+        return Conversation.id.in_(select(Message.conversation_id).where(
+            func.to_tsvector("english", Message.content).op("@@")(query)
+        ))
+    # No full-text index on other databases; correct but scans
+    stmt = select(Message.conversation_id)
+    for term in terms:
+        stmt = stmt.where(Message.content.ilike(f"%{term}%"))
+    return Conversation.id.in_(stmt)
+
+
+def _fingerprint(params: PaginationParams, user_id: Optional[str], include_archived: bool) -> str:
+    """Identifies a listing, so a cursor cannot be replayed against a different one"""
+    key = json.dumps([
+        params.sort_by, params.sort_order, " ".join(SEARCH_TERM.findall((params.search or "").lower())),
+        user_id, include_archived
+    ])
+    return format(zlib.crc32(key.encode()), "08x")
+
+
+def _encode_cursor(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode_cursor(cursor: str, listing: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["f"] != listing:
+            raise ValueError("cursor belongs to another listing")
+        datetime.fromisoformat(payload["v"])
+        uuid.UUID(payload["id"])
+        payload["t"], payload["c"] = int(payload["t"]), bool(payload["c"])
+    except (binascii.Error, ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValidationException(f"Invalid cursor: {e}", "INVALID_CURSOR")
+    return payload
@@ -0,0 +1,105 @@
+# app/services/hedging.py
+import asyncio
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+
+from app.services.model_router import BackendStats
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """
+    Hedged requests: when the primary call is slower than the backend's usual
+    latency percentile, a backup call is sent and whichever succeeds first
+    wins; the other is cancelled.
+
+    Extra load is capped by a token bucket: every request adds budget_ratio
+    tokens (up to burst) and every hedge spends one, so at most roughly
+    budget_ratio extra calls are made per request.
+
+    Cancelling the loser only stops the asyncio side: a blocking SDK call keeps
+    running in its executor thread. The caller reports such calls with hold()
+    and release(), and each one still running holds back one token, so losers
+    that outlive their cancellation cannot push upstream traffic past the budget.
+    """
+
+    def __init__(self, percentile: float = 95, min_delay_ms: float = 100,
+                 default_delay_ms: float = 2000, budget_ratio: float = 0.1,
+                 burst: float = 10, min_samples: int = 20):
+        self.percentile = percentile
+        self.min_delay = min_delay_ms / 1000
+        self.default_delay = default_delay_ms / 1000
+        self.budget_ratio = budget_ratio
+        self.burst = burst
+        self.min_samples = min_samples
+        self._tokens = burst
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+        self.skipped = 0  # would have hedged, but the budget was spent
+        self.lingering = 0  # cancelled calls whose threads are still running
+
+    def delay_for(self, stats: BackendStats) -> float:
+        """Seconds to wait on the primary before hedging"""
+        if len(stats.latencies) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, stats.percentile(self.percentile) / 1000)
+
+    async def run(
+        self,
+        primary: Callable[[], Awaitable[T]],
+        hedge: Callable[[], Awaitable[T]],
+        delay: float
+    ) -> Tuple[T, bool, str]:
+        """Return (result, whether a hedge was fired, "primary" or "hedge")"""
+        self.requests += 1
+        self._tokens = min(self.burst, self._tokens + self.budget_ratio)
+        first = asyncio.ensure_future(primary())
+        second: Optional[asyncio.Future] = None
+        try:
+            done, _ = await asyncio.wait((first,), timeout=delay)
+            if done:
+                return first.result(), False, "primary"
+            if self._tokens - self.lingering < 1:
+                self.skipped += 1
+                return await first, False, "primary"
+
+            self._tokens -= 1
+            self.fired += 1
+            second = asyncio.ensure_future(hedge())
+            names = {first: "primary", second: "hedge"}
+            pending = set(names)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if names[task] == "hedge":
+                            self.won += 1
+                        return task.result(), True, names[task]
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancel the loser (or both, if our caller went away)
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def hold(self) -> None:
+        """A cancelled call is still running upstream; charge the budget until release()"""
+        self.lingering += 1
+
+    def release(self) -> None:
+        self.lingering -= 1
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "fired": self.fired,
+            "won": self.won,
+            "skipped_budget": self.skipped,
+            "fire_rate": round(self.fired / self.requests, 4) if self.requests else 0.0,
+            "win_rate": round(self.won / self.fired, 4) if self.fired else 0.0,
+            "budget_tokens": round(self._tokens, 2),
+            "lingering": self.lingering,
+        }
@@ -0,0 +1,287 @@
+# app/services/model_router.py
+"""
+Latency-aware routing between model backends.
+
+Every backend is a model.base_model.BaseModel registered with a capacity. The
+router keeps live figures per backend (EWMA of latency per unit of work,
+latency percentiles, recent error rate, requests in flight) and sends each
+request to the first backend, in preference order, that is expected to finish
+within the request's latency budget.
+"""
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from app.exceptions import AIServiceException
+from app.services.resilience import AdaptiveLimiter, CircuitBreaker
+from model.base_model import BaseModel
+
+CHARS_PER_TOKEN = 4
+TOKENS_PER_WORD = 1.3
+WORDS_PER_LINE = 12
+WORDS_PER_SENTENCE = 20
+# Reading the prompt is far cheaper per token than generating output
+PREFILL_WEIGHT = 0.1
+
+
+def estimate_output_tokens(length_req: dict, default_tokens: int) -> int:
+    """Expected output size from PromptAnalysis.length_requirement"""
+    if length_req['type'] in ('lines', 'bullets'):
+        return int(length_req['count'] * WORDS_PER_LINE * TOKENS_PER_WORD)
+    if length_req['type'] == 'words':
+        return int(length_req['count'] * TOKENS_PER_WORD)
+    if length_req['type'] == 'sentences':
+        return int(length_req['count'] * WORDS_PER_SENTENCE * TOKENS_PER_WORD)
+    if length_req['type'] == 'characters':
+        return int(length_req['count'] / CHARS_PER_TOKEN)
+    return default_tokens
+
+
+def work_units(prompt_chars: int, output_tokens: float) -> float:
+    """Cost of a request in output-token equivalents"""
+    return prompt_chars / CHARS_PER_TOKEN * PREFILL_WEIGHT + output_tokens
+
+
+class BackendStats:
+    """Live latency, error and load figures for one backend"""
+
+    def __init__(self, alpha: float = 0.2, window: int = 200, error_window_seconds: float = 60.0):
+        self.alpha = alpha
+        self.error_window_seconds = error_window_seconds
+        self.ms_per_unit: Optional[float] = None  # EWMA
+        self.latencies = deque(maxlen=window)  # ms, successful requests only
+        self.outcomes = deque(maxlen=window)  # (monotonic time, success)
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, latency_ms: float, units: float, ok: bool) -> None:
+        self.requests += 1
+        self.outcomes.append((time.monotonic(), ok))
+        if not ok:
+            self.errors += 1
+            return
+        self.latencies.append(latency_ms)
+        rate = latency_ms / max(1.0, units)
+        if self.ms_per_unit is None:
+            self.ms_per_unit = rate
+        else:
+            self.ms_per_unit = self.alpha * rate + (1 - self.alpha) * self.ms_per_unit
+
+    def _recent(self) -> List[bool]:
+        cutoff = time.monotonic() - self.error_window_seconds
+        return [ok for at, ok in self.outcomes if at >= cutoff]
+
+    @property
+    def error_rate(self) -> float:
+        """Share of failures in the recent window, so a backend recovers once errors age out"""
+        recent = self._recent()
+        if not recent:
+            return 0.0
+        return 1 - sum(recent) / len(recent)
+
+    def is_healthy(self, max_error_rate: float, min_samples: int = 3) -> bool:
+        """A single failure is not enough to demote a backend"""
+        recent = self._recent()
+        if len(recent) < min_samples:
+            return True
+        return 1 - sum(recent) / len(recent) <= max_error_rate
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Backend:
+    def __init__(self, name: str, model: BaseModel, capacity: int,
+                 max_output_tokens: Optional[int] = None, alpha: float = 0.2,
+                 error_window_seconds: float = 60.0, breaker: Optional[CircuitBreaker] = None,
+                 limiter: Optional[AdaptiveLimiter] = None):
+        self.name = name
+        self.model = model
+        self.capacity = max(1, capacity)
+        self.max_output_tokens = max_output_tokens
+        self.stats = BackendStats(alpha=alpha, error_window_seconds=error_window_seconds)
+        self.breaker = breaker
+        self.limiter = limiter
+
+    def admits(self) -> bool:
+        """Whether begin() would currently let a call through"""
+        if self.breaker is not None and not self.breaker.would_allow():
+            return False
+        return self.limiter is None or self.limiter.in_flight < int(self.limiter.limit)
+
+    def predict_ms(self, units: float) -> Optional[float]:
+        """Expected latency for a request of this size at the current load (None until measured)"""
+        if self.stats.ms_per_unit is None:
+            return None
+        queueing = 1 + self.stats.in_flight / self.capacity
+        return self.stats.ms_per_unit * units * queueing
+
+    def snapshot(self) -> dict:
+        stats = self.stats
+        return {
+            "model": self.model.get_model_name(),
+            "available": self.model.is_available(),
+            "capacity": self.capacity,
+            "max_output_tokens": self.max_output_tokens,
+            "in_flight": stats.in_flight,
+            "requests": stats.requests,
+            "errors": stats.errors,
+            "error_rate": round(stats.error_rate, 4),
+            "ewma_ms_per_token": round(stats.ms_per_unit, 3) if stats.ms_per_unit is not None else None,
+            "p50_ms": stats.percentile(50),
+            "p95_ms": stats.percentile(95),
+            "p99_ms": stats.percentile(99),
+            "circuit": self.breaker.snapshot() if self.breaker is not None else None,
+            "concurrency": self.limiter.snapshot() if self.limiter is not None else None,
+        }
+
+
+class RouteDecision:
+    """Chosen backend first, then fallbacks, plus the signals behind the choice"""
+
+    def __init__(self, candidates: List[Backend], reason: str, budget_ms: float,
+                 output_tokens: int, predictions: Dict[str, Optional[float]]):
+        self.candidates = candidates
+        self.reason = reason
+        self.budget_ms = budget_ms
+        self.output_tokens = output_tokens
+        self.predictions = predictions
+
+    @property
+    def backend(self) -> Backend:
+        return self.candidates[0]
+
+    def metadata(self, served_by: Optional[str] = None, failed: Optional[List[str]] = None) -> dict:
+        """Routing details for response metadata"""
+        return {
+            "backend": served_by or self.backend.name,
+            "routed_to": self.backend.name,
+            "reason": self.reason,
+            "budget_ms": self.budget_ms,
+            "expected_output_tokens": self.output_tokens,
+            "predicted_ms": {
+                name: round(ms, 1) if ms is not None else None
+                for name, ms in self.predictions.items()
+            },
+            "failed": failed or [],
+        }
+
+
+class ModelRouter:
+    """Registry of model backends that routes each request by its latency budget"""
+
+    def __init__(self, budget_ms: float, max_error_rate: float = 0.5,
+                 default_output_tokens: int = 512, alpha: float = 0.2,
+                 error_window_seconds: float = 60.0):
+        self.budget_ms = budget_ms
+        self.max_error_rate = max_error_rate
+        self.error_window_seconds = error_window_seconds
+        self.default_output_tokens = default_output_tokens
+        self.alpha = alpha
+        self._backends: List[Backend] = []
+
+    def register(self, name: str, model: BaseModel, capacity: int,
+                 max_output_tokens: Optional[int] = None, preferred: bool = False,
+                 breaker: Optional[CircuitBreaker] = None,
+                 limiter: Optional[AdaptiveLimiter] = None) -> Backend:
+        """Add a backend; preferred backends are tried before the others"""
+        backend = Backend(
+            name, model, capacity, max_output_tokens,
+            alpha=self.alpha, error_window_seconds=self.error_window_seconds,
+            breaker=breaker, limiter=limiter
+        )
+        self._backends = [b for b in self._backends if b.name != name]
+        if preferred:
+            self._backends.insert(0, backend)
+        else:
+            self._backends.append(backend)
+        return backend
+
+    def get(self, name: str) -> Optional[Backend]:
+        return next((b for b in self._backends if b.name == name), None)
+
+    def route(self, prompt: str, length_req: dict, budget_ms: Optional[float] = None,
+              context_chars: int = 0) -> RouteDecision:
+        """Pick a backend for this request (context_chars: conversation history sent along); raises if none is available"""
+        budget_ms = budget_ms or self.budget_ms
+        output_tokens = estimate_output_tokens(length_req, self.default_output_tokens)
+        units = work_units(len(prompt) + context_chars, output_tokens)
+
+        available = [b for b in self._backends if b.model.is_available()]
+        if not available:
+            raise AIServiceException("No model backend available", "NO_BACKEND_AVAILABLE")
+        # Backends that cannot produce the requested length, keep failing or
+        # are shedding load go last
+        capable = [
+            b for b in available
+            if b.max_output_tokens is None or output_tokens <= b.max_output_tokens
+        ] or available
+        healthy = [
+            b for b in capable if b.admits() and b.stats.is_healthy(self.max_error_rate)
+        ] or capable
+
+        predictions = {b.name: b.predict_ms(units) for b in available}
+        within = [b for b in healthy if predictions[b.name] is None or predictions[b.name] <= budget_ms]
+        if within:
+            chosen = within[0]
+            reason = "within_budget" if predictions[chosen.name] is not None else "unmeasured"
+        else:
+            chosen = min(healthy, key=lambda b: predictions[b.name])
+            reason = "fastest_over_budget"
+
+        candidates = [chosen] + [b for b in available if b is not chosen]
+        return RouteDecision(candidates, reason, budget_ms, output_tokens, predictions)
+
+    def begin(self, name: str) -> float:
+        """
+        Admit a request to a backend and mark it in flight; returns its start
+        time. Raises AIServiceException if the circuit is open or the backend
+        is at its concurrency limit.
+        """
+        backend = self.get(name)
+        if backend.breaker is not None:
+            backend.breaker.acquire()
+        if backend.limiter is not None:
+            try:
+                backend.limiter.acquire()
+            except AIServiceException:
+                if backend.breaker is not None:
+                    backend.breaker.record_cancelled()
+                raise
+        backend.stats.in_flight += 1
+        return time.perf_counter()
+
+    def finish(self, name: str, started: float, prompt_chars: int, output_chars: int, ok: bool = True) -> None:
+        """Record the outcome of a request started with begin()"""
+        backend = self.get(name)
+        latency_ms = (time.perf_counter() - started) * 1000
+        backend.stats.in_flight -= 1
+        units = work_units(prompt_chars, output_chars / CHARS_PER_TOKEN)
+        backend.stats.record(latency_ms, units, ok)
+        if backend.limiter is not None:
+            backend.limiter.release(latency_ms, ok)
+        if backend.breaker is not None:
+            if ok:
+                backend.breaker.record_success()
+            else:
+                backend.breaker.record_failure()
+
+    def abandon(self, name: str) -> None:
+        """Release a request started with begin() without recording a sample"""
+        backend = self.get(name)
+        backend.stats.in_flight -= 1
+        if backend.limiter is not None:
+            backend.limiter.release_cancelled()
+        if backend.breaker is not None:
+            backend.breaker.record_cancelled()
+
+    def stats(self) -> dict:
+        return {
+            "budget_ms": self.budget_ms,
+            "max_error_rate": self.max_error_rate,
+            "backends": {b.name: b.snapshot() for b in self._backends},
+        }
@@ -0,0 +1,143 @@
+# app/services/prompt_analyzer.py
+"""
+Extract length constraints from a prompt and build the prompt sent to the model.
+
+The prompt is lowercased once and scanned for unit words (lines, words,
+characters, sentences, bullet points); only where one appears is a single
+precompiled pattern run on the text just before it to read the count. Counts
+may be digits or words, including compounds like "twenty-five" or "a hundred
+and fifty"; in "two five-word slogans" only the number attached to the unit
+counts. Results are memoized per prompt, since the same prompt is analyzed
+for the cache key, routing and generation.
+"""
+import re
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Optional
+
+_UNITS = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+    'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16,
+    'seventeen': 17, 'eighteen': 18, 'nineteen': 19, 'twenty': 20,
+    'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70,
+    'eighty': 80, 'ninety': 90,
+}
+_SCALES = {'hundred': 100, 'thousand': 1000}
+
+
+def _words(values) -> str:
+    # Longest first, so "seventeen" is not tried as "seven" + leftovers
+    return "(?:" + "|".join(sorted(values, key=len, reverse=True)) + r")\b"
+
+
+# Only well-formed numbers: a tens word may take a digit word ("twenty-one")
+# and scale words multiply ("two hundred and five"), but adjacent counts are
+# separate numbers, as in "one ten-line poem" or "two five-word slogans"
+_DIGIT = _words(w for w, v in _UNITS.items() if 1 <= v <= 9)
+_TENS = _words(w for w, v in _UNITS.items() if v >= 20)
+_BELOW_100 = rf"(?:{_TENS}(?:[\s-]+{_DIGIT})?|{_words(_UNITS)})"
+_BELOW_1000 = rf"(?:(?:(?:a|{_DIGIT})[\s-]+)?hundred\b(?:[\s-]+(?:and\s+)?{_BELOW_100})?|{_BELOW_100})"
+_NUMBER_WORDS = rf"(?:(?:(?:a|{_BELOW_1000})[\s-]+)?thousand\b(?:[\s-]+(?:and\s+)?{_BELOW_1000})?|{_BELOW_1000})"
+_NUMBER_PHRASE = re.compile(_NUMBER_WORDS)
+
+# Unit stem -> (PromptAnalysis field, allowed ending). "char" also covers "character".
+_UNITS_BY_STEM = {
+    'line': ('lines', re.compile(r"s?\b")),
+    'word': ('words', re.compile(r"s?\b")),
+    'char': ('characters', re.compile(r"(?:acter)?s?\b")),
+    'sentence': ('sentences', re.compile(r"s?\b")),
+    'bullet': ('bullets', re.compile(r"(?:s|[\s-]+points?)?\b")),
+}
+
+# Longest window a number plus separator can occupy before a unit
+_LOOKBEHIND = 64
+_NUMBER_BEFORE = re.compile(rf"(?<![\w-])(\d+|{_NUMBER_WORDS})[\s-]+\Z")
+
+# Which constraint shapes the prompt and output filter when several are given
+PRIORITY = ('lines', 'words', 'bullets', 'sentences', 'characters')
+
+_PROMPT_TEMPLATES = {
+    'lines': "Create exactly {count} lines for: {prompt}\n\nResponse:",
+    'words': "Create exactly {count} words for: {prompt}\n\nResponse:",
+    'bullets': "Create exactly {count} bullet points for: {prompt}\n\nResponse:",
+    'sentences': "Create exactly {count} sentences for: {prompt}\n\nResponse:",
+    'characters': "Create at most {count} characters for: {prompt}\n\nResponse:",
+}
+
+
+def parse_number(text: str) -> int:
+    """'42', 'twelve', 'twenty-five', 'a hundred and fifty' -> int; ValueError for anything else"""
+    if text.isdigit():
+        return int(text)
+    if not _NUMBER_PHRASE.fullmatch(text.lower()):
+        raise ValueError(f"Not a number: {text!r}")
+    total = current = 0
+    for token in re.split(r"[\s-]+", text.lower()):
+        if token in ('a', 'and'):
+            continue
+        scale = _SCALES.get(token)
+        if scale is None:
+            current += _UNITS[token]
+        elif scale == 100:
+            current = max(current, 1) * 100
+        else:
+            total += max(current, 1) * scale
+            current = 0
+    return total + current
+
+
+@dataclass(frozen=True)
+class PromptAnalysis:
+    """Length constraints found in a prompt (None when not requested)"""
+    lines: Optional[int] = None
+    words: Optional[int] = None
+    characters: Optional[int] = None
+    sentences: Optional[int] = None
+    bullets: Optional[int] = None
+
+    @property
+    def primary(self) -> Optional[str]:
+        for name in PRIORITY:
+            if getattr(self, name) is not None:
+                return name
+        return None
+
+    @property
+    def length_requirement(self) -> dict:
+        """The {'type', 'count'} form used by routing, output filters and the cache key"""
+        primary = self.primary
+        if primary is None:
+            return {'type': 'default'}
+        return {'type': primary, 'count': getattr(self, primary)}
+
+    def constraints(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self) if getattr(self, f.name) is not None}
+
+
+@lru_cache(maxsize=1024)
+def analyze_prompt(prompt: str) -> PromptAnalysis:
+    """Every length constraint in the prompt; the first mention of each unit wins"""
+    text = prompt.lower()
+    found = {}
+    for stem, (name, ending) in _UNITS_BY_STEM.items():
+        # str.find skips through the text at C speed; only the few places a unit
+        # word appears are checked for a number in front of it
+        start = text.find(stem)
+        while start != -1:
+            end = start + len(stem)
+            if ending.match(text, end):
+                number = _NUMBER_BEFORE.search(text, max(0, start - _LOOKBEHIND), start)
+                if number:
+                    found[name] = parse_number(number.group(1))
+                    break
+            start = text.find(stem, end)
+    return PromptAnalysis(**found)
+
+
+def build_prompt(prompt: str, analysis: PromptAnalysis) -> str:
+    """The prompt sent to the model, with the main length constraint spelled out"""
+    primary = analysis.primary
+    if primary is None:
+        return prompt
+    return _PROMPT_TEMPLATES[primary].format(count=getattr(analysis, primary), prompt=prompt)
@@ -0,0 +1,144 @@
+# app/services/resilience.py
+"""
+Per-backend protection: a circuit breaker that stops calling a failing
+backend, and an AIMD concurrency limiter that shrinks the number of calls in
+flight when a backend slows down or errors. Both reject with
+AIServiceException right away, so callers fall back or fail fast instead of
+queueing behind a degraded service.
+"""
+import time
+
+from app.exceptions import AIServiceException
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    closed: calls pass; failure_threshold consecutive failures open the circuit.
+    open: calls are rejected until reset_timeout_seconds have passed.
+    half_open: up to half_open_max_calls probes pass; a success closes the
+    circuit, a failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5,
+                 reset_timeout_seconds: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def would_allow(self) -> bool:
+        """Whether a call would be admitted right now (does not take a probe slot)"""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and self._probes < self.half_open_max_calls)
+
+    def acquire(self) -> None:
+        """Admit a call or raise AIServiceException"""
+        state = self.state
+        if state == CLOSED:
+            return
+        if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return
+        self.rejected += 1
+        raise AIServiceException(f"{self.name} circuit is open", "CIRCUIT_OPEN")
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        if self._state == HALF_OPEN:
+            self._state = CLOSED
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def record_cancelled(self) -> None:
+        """A call that was abandoned says nothing about health; free its probe slot"""
+        if self._state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def _open(self) -> None:
+        if self._state != OPEN:
+            self.times_opened += 1
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_in_seconds": round(
+                max(0.0, self._opened_at + self.reset_timeout_seconds - time.monotonic()), 1
+            ) if state == OPEN else 0.0,
+        }
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: grows by about one slot per limit's worth of
+    successful calls, and is cut by backoff_ratio on an error or a call slower
+    than latency_target_ms (0 disables the latency trigger).
+    """
+
+    def __init__(self, name: str, initial_limit: int = 16, min_limit: int = 1,
+                 max_limit: int = 64, backoff_ratio: float = 0.5, latency_target_ms: float = 0):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_target_ms = latency_target_ms
+        self.limit = float(min(max_limit, max(min_limit, initial_limit)))
+        self.in_flight = 0
+        self.rejected = 0
+        self.decreases = 0
+
+    def acquire(self) -> None:
+        """Take a slot or raise AIServiceException"""
+        if self.in_flight >= int(self.limit):
+            self.rejected += 1
+            raise AIServiceException(
+                f"{self.name} is at its concurrency limit ({int(self.limit)})", "CONCURRENCY_LIMIT"
+            )
+        self.in_flight += 1
+
+    def release(self, latency_ms: float, ok: bool) -> None:
+        self.in_flight -= 1
+        too_slow = self.latency_target_ms > 0 and latency_ms > self.latency_target_ms
+        if not ok or too_slow:
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+            self.decreases += 1
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def release_cancelled(self) -> None:
+        self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "rejected": self.rejected,
+            "decreases": self.decreases,
+        }
@@ -0,0 +1,227 @@
+# app/services/semantic_cache.py
+"""
+Near-duplicate prompt cache for non-streaming generation.
+
+Prompts are embedded on CPU with a signed hashing vectorizer (word unigrams
+plus character n-grams, no model to load) and kept in a preallocated NumPy
+matrix of unit vectors, so a lookup is one matrix-vector product. A hit
+needs cosine similarity >= threshold AND the same length requirement as the
+cached prompt: "3 lines on coffee" may reuse "write 3 lines about coffee",
+but never "write 5 lines about coffee". Length wording and the constraint's
+own number are left out of the embedding for that reason; any other number
+("3" or "three") is kept, as it may be the only difference between prompts.
+"""
+import re
+import time
+import zlib
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+from app import metrics
+from app.services.prompt_analyzer import parse_number
+
+TOKEN = re.compile(r"[a-z0-9']+")
+# Instruction filler and length wording; neither says what the prompt is about
+STOPWORDS = frozenset("""
+a an the and or of on in at to for about with from by into me us my our your please can could would
+you write create generate make give produce compose draft list describe tell some short brief quick
+exactly just only approximately around roughly under over max maximum least most no more than than
+line lines word words sentence sentences bullet bullets point points character characters
+chars paragraph paragraphs
+""".split())
+CHAR_NGRAM = 4
+CHAR_NGRAM_WEIGHT = 0.5
+
+
+class HashingVectorizer:
+    """Stateless text -> L2-normalised float32 vector of `dim` hashed features"""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def features(self, text: str, constraint_count: Optional[int] = None) -> Dict[str, float]:
+        weights: Dict[str, float] = {}
+        for token in TOKEN.findall(text.lower()):
+            if token in STOPWORDS:
+                continue
+            number = _number(token)
+            if number is not None:
+                if number != constraint_count:
+                    weights[f"n:{number}"] = weights.get(f"n:{number}", 0.0) + 1.0
+                continue
+            weights["w:" + token] = weights.get("w:" + token, 0.0) + 1.0
+            padded = f"<{token}>"
+            grams = [padded[i:i + CHAR_NGRAM] for i in range(max(len(padded) - CHAR_NGRAM + 1, 1))]
+            share = CHAR_NGRAM_WEIGHT / len(grams)
+            for gram in grams:
+                weights["c:" + gram] = weights.get("c:" + gram, 0.0) + share
+        return weights
+
+    def transform(self, text: str, constraint_count: Optional[int] = None) -> Optional[np.ndarray]:
+        """The embedding, or None when nothing content-bearing is left"""
+        features = self.features(text, constraint_count)
+        if not features:
+            return None
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in features.items():
+            h = zlib.crc32(feature.encode())
+            # The sign bit keeps colliding features from only ever adding up
+            vector[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        vector /= norm
+        return vector
+
+
+@dataclass
+class SemanticMatch:
+    value: str
+    similarity: float
+    prompt: str
+
+
+class SemanticCache:
+    """
+    Fixed-capacity vector index with LRU eviction and TTL. Rows live in one
+    (max_entries, dim) matrix; a parallel array holds each row's length
+    constraint code, so the constraint check is a vectorised mask.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 4096, dim: int = 512,
+                 ttl_seconds: float = 300.0, latency_window: int = 1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.vectorizer = HashingVectorizer(dim)
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        # -1 marks a free row, so it can never match a real constraint code
+        self._codes = np.full(max_entries, -1, dtype=np.int32)
+        self._constraint_codes: Dict[tuple, int] = {}
+        self._rows: "OrderedDict[int, tuple]" = OrderedDict()  # row -> (prompt, value, expires_at), LRU order
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._used = 0  # rows below this have been written at least once; only they are scanned
+        self._lookup_ms = deque(maxlen=latency_window)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_settings(cls) -> "SemanticCache":
+        from config.settings import settings
+        return cls(
+            threshold=settings.semantic_cache_threshold,
+            max_entries=settings.semantic_cache_max_entries,
+            dim=settings.semantic_cache_dim,
+            ttl_seconds=settings.semantic_cache_ttl_seconds
+        )
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def lookup(self, prompt: str, length_req: dict) -> Optional[SemanticMatch]:
+        started = time.perf_counter()
+        match = self._lookup(prompt, length_req)
+        elapsed = time.perf_counter() - started
+        self._lookup_ms.append(elapsed * 1000)
+        metrics.SEMANTIC_CACHE_LOOKUP_SECONDS.observe(elapsed)
+        if match is None:
+            self.misses += 1
+            metrics.SEMANTIC_CACHE_LOOKUPS.labels("miss").inc()
+        else:
+            self.hits += 1
+            metrics.SEMANTIC_CACHE_LOOKUPS.labels("hit").inc()
+        return match
+
+    def _lookup(self, prompt: str, length_req: dict) -> Optional[SemanticMatch]:
+        code = self._constraint_codes.get(_constraint_key(length_req))
+        if code is None or not self._rows:
+            return None
+        vector = self.vectorizer.transform(prompt, length_req.get('count'))
+        if vector is None:
+            return None
+        similarities = self._vectors[:self._used] @ vector
+        similarities[self._codes[:self._used] != code] = -1.0
+        row = int(np.argmax(similarities))
+        similarity = float(similarities[row])
+        if similarity < self.threshold:
+            return None
+        cached_prompt, value, expires_at = self._rows[row]
+        if expires_at <= time.monotonic():
+            self._release(row)
+            self.expirations += 1
+            return None
+        self._rows.move_to_end(row)
+        return SemanticMatch(value, round(similarity, 4), cached_prompt)
+
+    def add(self, prompt: str, length_req: dict, value: str) -> None:
+        vector = self.vectorizer.transform(prompt, length_req.get('count'))
+        if vector is None:
+            return
+        key = _constraint_key(length_req)
+        code = self._constraint_codes.get(key)
+        if code is None:
+            code = self._constraint_codes[key] = len(self._constraint_codes)
+        if not self._free:
+            oldest = next(iter(self._rows))
+            self._release(oldest)
+            self.evictions += 1
+        row = self._free.pop()
+        self._used = max(self._used, row + 1)
+        self._vectors[row] = vector
+        self._codes[row] = code
+        self._rows[row] = (prompt, value, time.monotonic() + self.ttl_seconds)
+
+    def clear(self) -> None:
+        for row in list(self._rows):
+            self._release(row)
+
+    def _release(self, row: int) -> None:
+        del self._rows[row]
+        self._codes[row] = -1
+        self._free.append(row)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        latencies = sorted(self._lookup_ms)
+        return {
+            "entries": len(self._rows),
+            "max_entries": self.max_entries,
+            "dim": self.vectorizer.dim,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            # Every hit is a model call that did not happen
+            "upstream_calls_saved": self.hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "lookup_ms": {
+                "p50": _percentile(latencies, 50),
+                "p95": _percentile(latencies, 95),
+                "p99": _percentile(latencies, 99),
+            },
+        }
+
+
+def _number(token: str) -> Optional[int]:
+    if token.isdigit():
+        return int(token)
+    try:
+        return parse_number(token)
+    except ValueError:
+        return None
+
+
+def _constraint_key(length_req: dict) -> tuple:
+    return tuple(sorted(length_req.items()))
+
+
+def _percentile(ordered, pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 4)
@@ -0,0 +1,174 @@
+# app/services/stream_filters.py
+"""
+Incremental output filters for length-constrained generation.
+
+Each filter is fed partial text as it arrives from the model and returns the
+text that can be emitted right away. Feeding a whole response and then calling
+finish() gives the same result as the old one-shot truncation helpers.
+"""
+
+INTRO_PHRASES = ("here's", 'here is', 'here are', 'this is', 'caption:', 'response:')
+_INTRO_CHECK_LEN = max(len(phrase) for phrase in INTRO_PHRASES)
+
+
+def is_intro_line(line: str) -> bool:
+    """Check if line is intro text"""
+    return line.lower().strip().startswith(INTRO_PHRASES)
+
+
+class StreamFilter:
+    """Pass-through filter that trims leading and trailing whitespace"""
+
+    def __init__(self):
+        self.done = False
+        self._started = False
+        self._held = ""
+
+    def feed(self, text: str) -> str:
+        """Consume a chunk and return the text that is safe to emit now"""
+        if self.done or not text:
+            return ""
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+        text = self._held + text
+        body = text.rstrip()
+        self._held = text[len(body):]
+        return body
+
+    def finish(self) -> str:
+        """Flush anything still buffered once the upstream stream ends"""
+        self.done = True
+        return ""
+
+
+class LineLimitFilter(StreamFilter):
+    """Emit at most max_lines non-empty, non-intro lines, each stripped"""
+
+    def __init__(self, max_lines: int):
+        super().__init__()
+        self.max_lines = max_lines
+        self.lines_emitted = 0
+        self._line = ""            # current line text not yet emitted
+        self._line_started = False  # part of the current line was emitted
+        self._skipping = False      # current line is an intro line
+        if max_lines <= 0:
+            self.done = True
+
+    def feed(self, text: str) -> str:
+        if self.done:
+            return ""
+        out = []
+        while text and not self.done:
+            newline = text.find('\n')
+            if newline == -1:
+                out.append(self._consume(text))
+                break
+            out.append(self._consume(text[:newline]))
+            out.append(self._end_line())
+            text = text[newline + 1:]
+        return "".join(out)
+
+    def finish(self) -> str:
+        text = "" if self.done else self._end_line()
+        self.done = True
+        return text
+
+    def _consume(self, part: str) -> str:
+        if self._skipping:
+            return ""
+        self._line += part
+        if not self._line_started:
+            head = self._line.lstrip()
+            if len(head) < _INTRO_CHECK_LEN:
+                return ""
+            if is_intro_line(head):
+                self._skipping = True
+                self._line = ""
+                return ""
+            self._line = head
+            self._line_started = True
+            prefix = "\n" if self.lines_emitted else ""
+        else:
+            prefix = ""
+        body = self._line.rstrip()
+        self._line = self._line[len(body):]
+        return prefix + body
+
+    def _end_line(self) -> str:
+        out = ""
+        if not self._line_started and not self._skipping:
+            head = self._line.strip()
+            if head and not is_intro_line(head):
+                out = ("\n" if self.lines_emitted else "") + head
+                self._line_started = True
+        if self._line_started:
+            self.lines_emitted += 1
+            if self.lines_emitted >= self.max_lines:
+                self.done = True
+        self._line = ""
+        self._line_started = False
+        self._skipping = False
+        return out
+
+
+class WordLimitFilter(StreamFilter):
+    """Emit at most max_words whitespace-separated words joined by single spaces"""
+
+    def __init__(self, max_words: int):
+        super().__init__()
+        self.max_words = max_words
+        self.words_emitted = 0
+        self._word = ""
+        if max_words <= 0:
+            self.done = True
+
+    def feed(self, text: str) -> str:
+        if self.done:
+            return ""
+        out = []
+        for word_end in self._split(self._word + text):
+            out.append(self._emit(word_end))
+            if self.done:
+                break
+        return "".join(out)
+
+    def finish(self) -> str:
+        text = ""
+        if not self.done and self._word:
+            text = self._emit(self._word)
+        self._word = ""
+        self.done = True
+        return text
+
+    def _split(self, text: str):
+        words = text.split()
+        if words and not text[-1].isspace():
+            # The last word may continue in the next chunk
+            self._word = words.pop()
+        else:
+            self._word = ""
+        return words
+
+    def _emit(self, word: str) -> str:
+        text = (" " if self.words_emitted else "") + word
+        self.words_emitted += 1
+        if self.words_emitted >= self.max_words:
+            self.done = True
+        return text
+
+
+def make_filter(length_req: dict) -> StreamFilter:
+    """Build the filter matching a PromptAnalysis.length_requirement"""
+    if length_req['type'] in ('lines', 'bullets'):
+        return LineLimitFilter(length_req['count'])
+    if length_req['type'] == 'words':
+        return WordLimitFilter(length_req['count'])
+    return StreamFilter()
+
+
+def apply_filter(stream_filter: StreamFilter, text: str) -> str:
+    """Run a complete text through a filter in one go"""
+    return stream_filter.feed(text) + stream_filter.finish()
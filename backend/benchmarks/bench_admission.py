@@ -0,0 +1,138 @@
+# benchmarks/bench_admission.py
+"""
+Overload test for admission control: goodput with and without shedding.
+
+Drives POST /api/content/quick with an open-loop arrival rate against a fake
+Gemini whose capacity is executor_workers / latency requests per second. A
+request counts towards goodput only if it returns 200 within the SLO. Without
+admission control every request queues, latency climbs past the SLO and
+goodput collapses; with it, excess requests get a fast 429/503 and goodput
+stays near capacity.
+
+The per-backend concurrency limiter is opened up here so that only the
+admission layer sheds load.
+
+Usage (from backend/):
+    python -m benchmarks.bench_admission --rates 40,80,160,320 --duration 5 --slo 2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import time
+
+os.environ["RATE_LIMIT_ENABLED"] = "false"  # the benchmark wraps the app itself
+os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+os.environ.setdefault("CONCURRENCY_LIMIT_INITIAL", "100000")
+os.environ.setdefault("CONCURRENCY_LIMIT_MAX", "100000")
+
+from benchmarks import fake_gemini
+
+fake_gemini.install()
+
+import httpx
+
+from app.main import app
+from app.rate_limit import AdmissionController, AdmissionMiddleware
+from config.settings import settings
+
+
+def _percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def _one(client: httpx.AsyncClient, index: int, clients: int, slo: float, results: list) -> None:
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(
+            client.post(
+                "/api/content/quick",
+                json={"prompt": f"write 3 lines about request {index}"},
+                headers={"X-Forwarded-For": f"10.0.0.{index % clients}"},
+            ),
+            slo,
+        )
+        results.append((response.status_code, time.perf_counter() - start))
+    except asyncio.TimeoutError:
+        results.append(("timeout", slo))
+
+
+async def _run(asgi_app, rate: float, duration: float, slo: float, clients: int) -> dict:
+    results = []
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        tasks = []
+        start = time.perf_counter()
+        for index in range(int(rate * duration)):
+            delay = start + index / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(_one(client, index, clients, slo, results)))
+        await asyncio.gather(*tasks)
+
+    ok = [latency for status, latency in results if status == 200]
+    shed = [latency for status, latency in results if status in (429, 503)]
+    return {
+        "offered": len(results) / duration,
+        "goodput": len(ok) / duration,
+        "shed": len(shed),
+        "timeouts": sum(1 for status, _ in results if status == "timeout"),
+        "p50": _percentile(ok, 50),
+        "p99": _percentile(ok, 99),
+        "reject_ms": statistics.mean(shed) * 1000 if shed else float("nan"),
+    }
+
+
+async def _drain(seconds: float) -> None:
+    # Let abandoned executor calls finish so runs don't bleed into each other
+    await asyncio.sleep(seconds)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rates", default="40,80,160,320")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--slo", type=float, default=2.0)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--max-concurrent", type=int, default=settings.model_executor_workers)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--max-queue-wait", type=float, default=1.0)
+    args = parser.parse_args()
+
+    fake_gemini.FakeGenerativeModel.latency_seconds = args.latency
+    capacity = settings.model_executor_workers / args.latency
+    print(f"backend capacity ~{capacity:.0f} req/s, SLO {args.slo:.1f}s")
+    print(f"{'mode':<10}{'offered':>9}{'goodput':>9}{'shed':>7}{'timeout':>9}"
+          f"{'p50 s':>8}{'p99 s':>8}{'reject ms':>11}")
+
+    for rate in (float(r) for r in args.rates.split(",")):
+        for mode in ("none", "admission"):
+            if mode == "admission":
+                controller = AdmissionController(
+                    client_rate=rate, client_burst=rate,
+                    global_rate=rate * 10, global_burst=rate * 10,
+                    max_concurrent=args.max_concurrent,
+                    max_queue=args.max_queue,
+                    max_queue_wait=args.max_queue_wait,
+                )
+                asgi_app = AdmissionMiddleware(app, controller, trust_forwarded=True)
+            else:
+                asgi_app = app
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = await _run(asgi_app, rate, args.duration, args.slo, args.clients)
+                await _drain(args.slo + args.latency * 4)
+            print(
+                f"{mode:<10}{result['offered']:>9.0f}{result['goodput']:>9.1f}{result['shed']:>7}"
+                f"{result['timeouts']:>9}{result['p50']:>8.2f}{result['p99']:>8.2f}"
+                f"{result['reject_ms']:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+# benchmarks/bench_context_builder.py
+"""
+Cost of assembling conversation context as a conversation grows.
+
+"naive" rebuilds the context from the whole history every turn: re-count
+every message, keep the newest that fit the budget and re-summarize the rest.
+"incremental" is ContextBuilder: running token counts, and older turns
+folded into the summary once. Reported per turn at a few history lengths,
+along with the context size actually sent.
+
+Usage (from backend/):
+    python -m benchmarks.bench_context_builder --turns 2000 --budget 2000
+"""
+import argparse
+import random
+import time
+
+from app.services.context_builder import (
+    ContextBuilder, Turn, estimate_tokens, extractive_summary, TURN_OVERHEAD_TOKENS
+)
+from app.services.model_router import CHARS_PER_TOKEN
+
+SENTENCES = [
+    "Can you suggest a headline for the spring sale?",
+    "Here are three options that focus on fresh colours and limited stock.",
+    "Make the second one shorter and more playful.",
+    "Sure, here is a punchier version with a pun on blooming prices.",
+    "Now write a matching email subject line and a preview sentence.",
+]
+
+
+def make_turns(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    turns = []
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        sentences = rng.randint(1, 3) if role == "user" else rng.randint(3, 12)
+        turns.append((role, " ".join(rng.choice(SENTENCES) for _ in range(sentences))))
+    return turns
+
+
+def naive_context(history, budget_tokens: int, summary_max_tokens: int) -> str:
+    """Re-derive the context from scratch, as a stateless implementation would"""
+    kept, used = [], 0
+    for role, text in reversed(history):
+        tokens = estimate_tokens(text) + TURN_OVERHEAD_TOKENS
+        if used + tokens > budget_tokens - summary_max_tokens:
+            break
+        kept.append((role, text))
+        used += tokens
+    older = [Turn(role, text, 0) for role, text in history[:len(history) - len(kept)]]
+    summary = extractive_summary("", older, summary_max_tokens * CHARS_PER_TOKEN)
+    return summary + "".join(f"{role}: {text}\n" for role, text in reversed(kept))
+
+
+def _windows(checkpoints, turns, step):
+    """Seconds spent in step() between checkpoints, and the context size at each one"""
+    history, elapsed, sizes = [], {}, {}
+    done = 0
+    for checkpoint in checkpoints:
+        window = 0.0
+        for role, text in turns[done:checkpoint]:
+            history.append((role, text))
+            start = time.perf_counter()
+            context = step(history, role, text)
+            window += time.perf_counter() - start
+        elapsed[checkpoint] = window
+        sizes[checkpoint] = estimate_tokens(context)
+        done = checkpoint
+    return elapsed, sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=2000, help="Conversation length")
+    parser.add_argument("--budget", type=int, default=2000, help="Context budget in tokens")
+    parser.add_argument("--summary", type=int, default=300, help="Summary cap in tokens")
+    args = parser.parse_args()
+
+    turns = make_turns(args.turns)
+    checkpoints = sorted({n for n in (10, 100, 500, 1000, 2000, 5000, 10000) if n <= args.turns} | {args.turns})
+
+    # Timed in separate passes so one does not skew the other's memory behaviour
+    builder = ContextBuilder(args.budget, args.summary)
+
+    def incremental_step(history, role, text):
+        builder.add_turn("bench", role, text)
+        return builder.render("bench")
+
+    incremental, sizes = _windows(checkpoints, turns, incremental_step)
+    naive, _ = _windows(checkpoints, turns, lambda history, role, text: naive_context(
+        history, args.budget, args.summary
+    ))
+
+    print(f"{'turns':>7}{'naive us/turn':>15}{'incr us/turn':>14}{'speedup':>9}{'ctx tokens':>12}")
+    done = 0
+    for checkpoint in checkpoints:
+        count = checkpoint - done
+        print(
+            f"{checkpoint:>7}{naive[checkpoint] / count * 1e6:>15.1f}"
+            f"{incremental[checkpoint] / count * 1e6:>14.1f}"
+            f"{naive[checkpoint] / incremental[checkpoint]:>8.1f}x{sizes[checkpoint]:>12}"
+        )
+        done = checkpoint
+    print(f"total: naive {sum(naive.values()):.3f}s, incremental {sum(incremental.values()):.3f}s")
+    print(builder.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# benchmarks/bench_conversation_listing.py
+"""
+Conversation listing and search over a seeded database: OFFSET pages with a
+COUNT(*) and LIKE search against ConversationStore's keyset pages, FTS
+search and cached/capped total_count.
+
+Seeds --conversations x --messages-per rows into an SQLite file (reused on
+later runs if it already has that many conversations), then times one page
+at increasing depths. Keyset pages at a depth are reached with a cursor for
+the row at that offset, exactly as following next_cursor would.
+
+Usage (from backend/):
+    python -m benchmarks.bench_conversation_listing --conversations 100000 --messages-per 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from sqlalchemy import create_engine as create_sync_engine, func, insert, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.database import create_engine, create_search_index
+from app.models import Base, Conversation, Message
+from app.schemas import PaginationParams
+from app.services.conversation_store import ConversationStore, _encode_cursor, _fingerprint
+
+WORDS = (
+    "draft email launch campaign headline product spring summer pricing customer "
+    "newsletter outline blog post tone friendly formal shorter longer bullet list "
+    "social caption audience brand story offer discount feedback rewrite summary"
+).split()
+RARE_WORDS = ["zeppelin", "quokka", "marzipan", "obsidian"]
+SEED_CHUNK = 20000
+
+
+def seed(path: str, conversations: int, messages_per: int) -> None:
+    engine = create_sync_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        Base.metadata.create_all(conn)
+        create_search_index(conn)
+        existing = conn.scalar(select(func.count()).select_from(Conversation))
+    if existing >= conversations:
+        print(f"reusing {path} ({existing} conversations)")
+        return
+
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    began = time.perf_counter()
+    conversation_rows, message_rows = [], []
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        for i in range(conversations):
+            created = start + timedelta(seconds=i * 60 + rng.randint(0, 59))
+            conversation_id = uuid.UUID(int=rng.getrandbits(128))
+            texts = []
+            for j in range(messages_per):
+                words = rng.choices(WORDS, k=rng.randint(8, 40))
+                if rng.random() < 0.001:
+                    words.append(rng.choice(RARE_WORDS))
+                texts.append(" ".join(words))
+                message_rows.append({
+                    "id": uuid.UUID(int=rng.getrandbits(128)),
+                    "conversation_id": conversation_id,
+                    "role": "user" if j % 2 == 0 else "assistant",
+                    "content": texts[-1],
+                    "created_at": created + timedelta(seconds=j),
+                    "metadata": None,
+                })
+            conversation_rows.append({
+                "id": conversation_id,
+                "title": texts[0][:80],
+                "user_id": f"user-{rng.randint(1, 1000)}",
+                "created_at": created,
+                "updated_at": created + timedelta(seconds=messages_per + rng.randint(0, 86400)),
+                "is_archived": rng.random() < 0.05,
+                "message_count": messages_per,
+                "last_message": texts[-1][:255],
+            })
+            if len(message_rows) >= SEED_CHUNK:
+                conn.execute(insert(Conversation), conversation_rows)
+                conn.execute(insert(Message), message_rows)
+                conversation_rows, message_rows = [], []
+        if conversation_rows:
+            conn.execute(insert(Conversation), conversation_rows)
+            conn.execute(insert(Message), message_rows)
+        conn.exec_driver_sql("ANALYZE")
+    print(f"seeded {conversations} conversations / {conversations * messages_per} messages "
+          f"in {time.perf_counter() - began:.1f}s")
+
+
+async def timed(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def run(path: str, page_size: int, repeats: int) -> None:
+    engine = create_engine(f"sqlite+aiosqlite:///{path}")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    store = ConversationStore(sessions)
+
+    async def offset_page(offset: int, like: str = None):
+        async with sessions() as session:
+            where = "WHERE is_archived = 0"
+            params = {"limit": page_size, "offset": offset}
+            if like:
+                where += " AND id IN (SELECT conversation_id FROM messages WHERE content LIKE :like)"
+                params["like"] = f"%{like}%"
+            await session.execute(text(f"SELECT COUNT(*) FROM conversations {where}"), params)
+            await session.execute(text(
+                f"SELECT * FROM conversations {where} ORDER BY updated_at DESC, id DESC LIMIT :limit OFFSET :offset"
+            ), params)
+
+    async def cursor_at(offset: int, params: PaginationParams) -> str:
+        """The cursor a client would hold after reading `offset` rows"""
+        async with sessions() as session:
+            row = (await session.execute(
+                select(Conversation.updated_at, Conversation.id)
+                .where(Conversation.is_archived.is_(False))
+                .order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+                .offset(offset - 1).limit(1)
+            )).one()
+        return _encode_cursor({
+            "f": _fingerprint(params, None, False), "v": row[0].isoformat(), "id": row[1].hex,
+            "t": 0, "c": False,
+        })
+
+    async with sessions() as session:
+        total = await session.scalar(select(func.count()).select_from(Conversation))
+    print(f"\nlisting, {page_size} per page, sorted by updated_at (median of {repeats}, ms)")
+    print(f"{'page depth':>12}{'offset+count':>14}{'keyset':>10}")
+    base = PaginationParams(page_size=page_size, sort_by="updated_at")
+    for depth in sorted({d for d in (0, 1000, 10000, 50000, total // 2, total - total // 10) if d < total}):
+        old = await timed(lambda: offset_page(depth), repeats)
+        params = base if depth == 0 else base.model_copy(update={"cursor": await cursor_at(depth, base)})
+        new = await timed(lambda: store.list_conversations(params), repeats)
+        print(f"{depth:>12}{old:>14.1f}{new:>10.1f}")
+
+    print(f"\nsearch, first page (median of {repeats}, ms)")
+    print(f"{'query':>12}{'LIKE+count':>14}{'FTS':>10}{'matches':>10}")
+    for query in ("quokka", "zeppelin marzipan", "launch", "launch spr"):
+        like = query.split()[0]
+        old = await timed(lambda: offset_page(0, like), max(1, repeats // 2))
+        params = base.model_copy(update={"search": query})
+        store._counts.clear()
+        cold = await timed(lambda: store.list_conversations(params), 1)
+        new = await timed(lambda: store.list_conversations(params), repeats)
+        page = await store.list_conversations(params)
+        shown = f"{page['total_count']}{'+' if page['total_count_capped'] else ''}"
+        print(f"{query:>12}{old:>14.1f}{new:>10.1f}{shown:>10}   (first, uncached count: {cold:.1f})")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="benchmarks/results/conversations-bench.db")
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--messages-per", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+    seed(args.db, args.conversations, args.messages_per)
+    asyncio.run(run(args.db, args.page_size, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
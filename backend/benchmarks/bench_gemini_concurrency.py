@@ -0,0 +1,49 @@
+# benchmarks/bench_gemini_concurrency.py
+"""
+Show that concurrent Gemini requests overlap instead of running back to back.
+
+Usage (from backend/):
+    python -m benchmarks.bench_gemini_concurrency --requests 32 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks import fake_gemini
+
+fake_gemini.install()
+
+from app.services.content_service import ContentService
+
+
+async def _blocking_call(service: ContentService, prompt: str) -> str:
+    """The pre-executor behaviour: the SDK call runs on the event loop thread"""
+    return service.model.generate_content(prompt).text
+
+
+async def _run(label: str, coro_factory, requests: int, latency: float) -> None:
+    start = time.perf_counter()
+    await asyncio.gather(*(coro_factory(f"prompt {i}") for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    serial = requests * latency
+    print(
+        f"{label:<12} requests={requests:<4} wall={elapsed:7.3f}s "
+        f"serial={serial:7.3f}s overlap={serial / elapsed:6.1f}x"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    fake_gemini.FakeGenerativeModel.latency_seconds = args.latency
+    service = ContentService()
+
+    await _run("blocking", lambda p: _blocking_call(service, p), args.requests, args.latency)
+    await _run("executor", service.generate_quick_response, args.requests, args.latency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
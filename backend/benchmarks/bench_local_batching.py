@@ -0,0 +1,74 @@
+# benchmarks/bench_local_batching.py
+"""
+Throughput vs latency of the local model at several micro-batch windows (CPU).
+
+Usage (from backend/):
+    python -m benchmarks.bench_local_batching --model-path models/content-generator-20k \\
+        --requests 32 --windows 0,5,10,25,50 --max-batch 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+
+import torch
+
+from config.settings import settings
+from model.batching import MicroBatcher
+from model.local_model import Local20KModel
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def _timed(batcher: MicroBatcher, prompt: str) -> float:
+    start = time.perf_counter()
+    await batcher.submit(prompt)
+    return time.perf_counter() - start
+
+
+async def _run(model: Local20KModel, requests: int, window_ms: float, max_batch: int) -> None:
+    batcher = MicroBatcher(
+        model._run_batch, max_batch_size=max_batch, window_ms=window_ms
+    )
+    prompts = [f"write {i % 5 + 1} lines about coffee number {i}" for i in range(requests)]
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(_timed(batcher, p) for p in prompts))
+    elapsed = time.perf_counter() - start
+    stats = batcher.stats()
+    print(
+        f"window={window_ms:5.1f}ms max_batch={max_batch:<3} req/s={requests / elapsed:7.2f} "
+        f"p50={statistics.median(latencies):6.2f}s p95={_percentile(latencies, 95):6.2f}s "
+        f"avg_batch={stats['avg_batch_size']:5.2f}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-path", default=settings.local_model_path)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--windows", default="0,5,10,25,50")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=Local20KModel.max_new_tokens)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    model = Local20KModel(args.model_path)
+    model.max_new_tokens = args.max_new_tokens
+    model.load()
+    if not model.is_loaded:
+        raise SystemExit(f"Could not load model from {args.model_path}")
+
+    # Unbatched baseline: one generate() per request
+    await _run(model, args.requests, 0, 1)
+    for window in (float(w) for w in args.windows.split(",")):
+        await _run(model, args.requests, window, args.max_batch)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+# benchmarks/bench_precision.py
+"""
+Compare local model inference precisions on CPU: fp32, int8 and bf16.
+
+Each precision is loaded in a fresh interpreter so peak RSS is not shared
+between runs. Reports load time, greedy-decoding tokens/sec, peak RSS and
+output drift against the fp32 baseline (max logit difference, top-1 agreement
+and how much of the greedy output matches). int8 is run twice so the second
+load shows the cached quantized artifact.
+
+Usage (from backend/):
+    python -m benchmarks.bench_precision --model-path models/content-generator-20k --tokens 64
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROMPTS = [
+    "write 3 lines about coffee",
+    "a short product description for a reusable water bottle",
+    "explain what an API is in 50 words",
+]
+
+_PROBE = r"""
+import json, resource, sys, time
+import torch
+from model.local_model import Local20KModel
+
+model_path, precision, tokens, out_path, prompts = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4], json.loads(sys.argv[5])
+start = time.perf_counter()
+model = Local20KModel(model_path, precision=precision)
+model.prefix_cache = None
+model.load()
+load_s = time.perf_counter() - start
+if not model.is_loaded:
+    sys.exit("model failed to load")
+
+logits, sequences, generated, elapsed = [], [], 0, 0.0
+with torch.no_grad():
+    for prompt in prompts:
+        inputs = model.tokenizer(model.format_prompt(prompt), return_tensors="pt")
+        logits.append(model.model(**inputs).logits[0, -1].float())
+        start = time.perf_counter()
+        output = model.model.generate(
+            **inputs, max_new_tokens=tokens, min_new_tokens=tokens, do_sample=False,
+            pad_token_id=model.tokenizer.pad_token_id
+        )
+        elapsed += time.perf_counter() - start
+        new = output[0, inputs["input_ids"].shape[1]:]
+        generated += len(new)
+        sequences.append(new.tolist())
+
+torch.save({"logits": logits, "sequences": sequences}, out_path)
+print(json.dumps({
+    "precision": model.precision,
+    "load_s": load_s,
+    "tokens_per_s": generated / elapsed,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def _run(model_path: str, precision: str, tokens: int, out_path: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE, model_path, precision, str(tokens), out_path, json.dumps(PROMPTS)],
+        capture_output=True, text=True, env=env, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _drift(baseline: dict, other: dict) -> dict:
+    logit_diff = max(
+        (a - b).abs().max().item() for a, b in zip(baseline["logits"], other["logits"])
+    )
+    top1 = sum(
+        a.argmax().item() == b.argmax().item() for a, b in zip(baseline["logits"], other["logits"])
+    ) / len(baseline["logits"])
+    matched = total = 0
+    for a, b in zip(baseline["sequences"], other["sequences"]):
+        # Length of the identical greedy prefix before the outputs diverge
+        same = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+        matched += same
+        total += len(a)
+    return {"max_logit_diff": logit_diff, "top1_agree": top1, "greedy_match": matched / total}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-path", default="models/content-generator-20k")
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--precisions", default="fp32,int8,int8,bf16")
+    args = parser.parse_args()
+
+    import torch
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows, baseline = [], None
+        for i, precision in enumerate(args.precisions.split(",")):
+            out_path = os.path.join(tmp, f"{i}.pt")
+            result = _run(args.model_path, precision, args.tokens, out_path)
+            outputs = torch.load(out_path)
+            if baseline is None and result["precision"] == "fp32":
+                baseline = outputs
+            drift = _drift(baseline, outputs) if baseline is not None else {}
+            rows.append((precision, result, drift))
+
+    print(f"{'requested':<10}{'used':<7}{'load s':>8}{'tok/s':>10}{'peak MB':>10}"
+          f"{'max dlogit':>12}{'top1':>7}{'greedy':>8}")
+    for precision, result, drift in rows:
+        print(
+            f"{precision:<10}{result['precision']:<7}{result['load_s']:>8.2f}"
+            f"{result['tokens_per_s']:>10.1f}{result['peak_rss_mb']:>10.0f}"
+            f"{drift.get('max_logit_diff', float('nan')):>12.4f}"
+            f"{drift.get('top1_agree', float('nan')):>7.2f}"
+            f"{drift.get('greedy_match', float('nan')):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
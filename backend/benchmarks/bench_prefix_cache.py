@@ -0,0 +1,92 @@
+# benchmarks/bench_prefix_cache.py
+"""
+Prefill latency of the local model with and without a cached prompt prefix (CPU).
+
+Compares encoding the full formatted prompt against resuming from the cached
+template prefix and from a cached hot prompt head, then reports end-to-end
+single-prompt generation time with the prefix cache on and off.
+
+Usage (from backend/):
+    python -m benchmarks.bench_prefix_cache --model-path models/content-generator-20k --runs 20
+"""
+import argparse
+import copy
+import os
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+
+import torch
+
+from model.local_model import Local20KModel
+
+HEAD = (
+    "You are a helpful marketing assistant for a small coffee roaster. "
+    "Keep a warm, friendly tone and avoid jargon. Task: "
+)
+
+
+def _median_ms(fn, runs: int) -> float:
+    fn()  # warm up
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _prefill(model: Local20KModel, ids, prefix_len: int, runs: int) -> float:
+    full = torch.tensor([ids], device=model.device)
+    if prefix_len == 0:
+        return _median_ms(lambda: model.model(full, use_cache=True), runs)
+    with torch.no_grad():
+        cached = model.model(full[:, :prefix_len], use_cache=True).past_key_values
+    rest = full[:, prefix_len:]
+    return _median_ms(
+        lambda: model.model(rest, past_key_values=copy.deepcopy(cached), use_cache=True), runs
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-path", default="models/content-generator-20k")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    model = Local20KModel(args.model_path)
+    model.load()
+    if not model.is_loaded:
+        raise SystemExit("model failed to load")
+    model.max_new_tokens = args.max_new_tokens
+
+    prompt = HEAD + "write 3 lines about our new Ethiopian single origin"
+    ids = model.tokenizer(model.format_prompt(prompt))["input_ids"]
+    template_len = len(model.tokenizer(model.template_prefix)["input_ids"])
+    head_len = min(model.prefix_cache.head_tokens if model.prefix_cache else 32, len(ids) - 1)
+
+    print(f"prompt tokens: {len(ids)}  template prefix: {template_len}  head: {head_len}")
+    print(f"{'prefill':<28}{'median ms':>12}")
+    with torch.no_grad():
+        for label, prefix_len in (
+            ("full prompt", 0),
+            ("cached template", template_len),
+            ("cached hot head", head_len),
+        ):
+            print(f"{label:<28}{_prefill(model, ids, prefix_len, args.runs):>12.2f}")
+
+    cache = model.prefix_cache
+    model.prefix_cache = None
+    uncached = _median_ms(lambda: model.generate_batch([prompt]), max(3, args.runs // 4))
+    model.prefix_cache = cache
+    cached = _median_ms(lambda: model.generate_batch([prompt]), max(3, args.runs // 4))
+    print(f"\n{'generate (cache off)':<28}{uncached:>12.2f}")
+    print(f"{'generate (cache on)':<28}{cached:>12.2f}")
+    if cache is not None:
+        print(f"prefix cache: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
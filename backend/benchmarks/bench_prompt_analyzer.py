@@ -0,0 +1,149 @@
+# benchmarks/bench_prompt_analyzer.py
+"""
+Prompt analysis cost: the old multi-regex detect_length_requirement against the
+single-pass analyzer, uncached and memoized, over a corpus of prompt sizes.
+
+The corpus mixes short prompts with a constraint near the start, constraints
+buried at the end of long prompts, and long prompts with no constraint at all
+(the old code's worst case: every pattern scans the whole lowercased copy).
+
+Before timing, the analyzer is checked against CASES, phrasings whose counts
+have been parsed wrongly before; any mismatch stops the run.
+
+Usage (from backend/):
+    python -m benchmarks.bench_prompt_analyzer --runs 2000
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+
+from app.services.prompt_analyzer import analyze_prompt, build_prompt
+
+FILLER = (
+    "Our team sells handmade ceramic mugs and wants friendly copy for the spring "
+    "catalogue that highlights glazes, sizes, care instructions and gift ideas. "
+)
+
+
+# prompt -> expected constraints
+CASES = {
+    "Write one ten-line poem": {"lines": 10},
+    "write three one-line jokes": {"lines": 1},
+    "Give me two five-word slogans": {"words": 5},
+    "Write a five-line poem": {"lines": 5},
+    "write twenty-five words about tea": {"words": 25},
+    "write twenty one lines": {"lines": 21},
+    "use a hundred and fifty words": {"words": 150},
+    "at most two thousand five hundred characters": {"characters": 2500},
+    "three bullet points, 12 words each": {"bullets": 3, "words": 12},
+}
+
+
+def check_cases() -> None:
+    wrong = {prompt: analyze_prompt.__wrapped__(prompt).constraints() for prompt in CASES}
+    wrong = {prompt: got for prompt, got in wrong.items() if got != CASES[prompt]}
+    for prompt, got in wrong.items():
+        print(f"MISMATCH {prompt!r}: expected {CASES[prompt]}, got {got}")
+    if wrong:
+        raise SystemExit(1)
+
+
+def legacy_detect(prompt: str) -> dict:
+    """The original ContentService.detect_length_requirement"""
+    prompt_lower = prompt.lower()
+    line_patterns = [
+        r'(?:in |write |create |generate |make )?(?:exactly )?(?:just )?(?:only )?(\d+) lines?',
+        r'(?:in |write |create |generate |make )?(one|two|three|four|five|six|seven|eight|nine|ten) lines?',
+        r'(\d+)[-\s]line',
+        r'(one|two|three|four|five|six|seven|eight|nine|ten)[-\s]line'
+    ]
+    for pattern in line_patterns:
+        match = re.search(pattern, prompt_lower)
+        if match:
+            number_str = match.group(1)
+            if number_str.isdigit():
+                lines = int(number_str)
+            else:
+                word_map = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+                            'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10}
+                lines = word_map.get(number_str, 2)
+            return {'type': 'lines', 'count': lines}
+    word_patterns = [
+        r'(?:in |write |create |generate |make )?(?:exactly )?(?:just )?(?:only )?(\d+) words?',
+        r'(\d+)[-\s]word'
+    ]
+    for pattern in word_patterns:
+        match = re.search(pattern, prompt_lower)
+        if match:
+            return {'type': 'words', 'count': int(match.group(1))}
+    return {'type': 'default'}
+
+
+def legacy_build(prompt: str, length_req: dict) -> str:
+    if length_req['type'] == 'lines':
+        return f"Create exactly {length_req['count']} lines for: {prompt}\n\nResponse:"
+    if length_req['type'] == 'words':
+        return f"Create exactly {length_req['count']} words for: {prompt}\n\nResponse:"
+    return prompt
+
+
+def make_corpus(seed: int = 0) -> dict:
+    rng = random.Random(seed)
+
+    def filler(chars: int) -> str:
+        return (FILLER * (chars // len(FILLER) + 1))[:chars]
+
+    return {
+        "short, constraint": [f"Write {rng.randint(2, 9)} lines about mug #{i}" for i in range(200)],
+        "short, none": [f"Describe mug #{i} for a product page" for i in range(200)],
+        "1 kB, words at end": [filler(1000) + f" Use {rng.randint(20, 90)} words. #{i}" for i in range(200)],
+        "10 kB, words at end": [filler(10000) + f" Use {rng.randint(20, 90)} words. #{i}" for i in range(50)],
+        "10 kB, none": [filler(10000) + f" #{i}" for i in range(50)],
+    }
+
+
+def _per_prompt_us(fn, prompts, runs: int) -> float:
+    samples = []
+    for _ in range(max(1, runs // len(prompts))):
+        start = time.perf_counter()
+        for prompt in prompts:
+            fn(prompt)
+        samples.append((time.perf_counter() - start) / len(prompts) * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=2000, help="Approximate analyses per measurement")
+    args = parser.parse_args()
+    check_cases()
+
+    uncached = analyze_prompt.__wrapped__
+
+    def legacy(prompt):
+        # The old request path ran the detection once for routing and again to build the prompt
+        legacy_detect(prompt)
+        return legacy_build(prompt, legacy_detect(prompt))
+
+    def single_pass(prompt):
+        return build_prompt(prompt, uncached(prompt))
+
+    def memoized(prompt):
+        analyze_prompt(prompt).length_requirement
+        return build_prompt(prompt, analyze_prompt(prompt))
+
+    print(f"{'corpus':<22}{'legacy us':>11}{'single us':>11}{'cached us':>11}{'speedup':>9}")
+    for name, prompts in make_corpus().items():
+        for prompt in prompts:
+            analyze_prompt(prompt)  # warm the memo for the cached column
+        old = _per_prompt_us(legacy, prompts, args.runs)
+        new = _per_prompt_us(single_pass, prompts, args.runs)
+        cached = _per_prompt_us(memoized, prompts, args.runs)
+        print(f"{name:<22}{old:>11.1f}{new:>11.1f}{cached:>11.2f}{old / new:>8.1f}x")
+    print(analyze_prompt.cache_info())
+
+
+if __name__ == "__main__":
+    main()
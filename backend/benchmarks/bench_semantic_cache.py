@@ -0,0 +1,127 @@
+# benchmarks/bench_semantic_cache.py
+"""
+How many upstream calls the semantic cache would save, and at what risk.
+
+Replays a Zipf-distributed stream of prompts where each (topic, length)
+request is phrased with a random paraphrase template, and compares an
+exact-match cache (ResponseCache's normalisation) with SemanticCache at
+several thresholds. A semantic hit is "wrong" when the cached prompt asked
+about a different topic; topics deliberately share words ("spring sale" /
+"summer sale") to make that likely. Also reports lookup latency with the
+index full, per embedding size.
+
+Usage (from backend/):
+    python -m benchmarks.bench_semantic_cache --requests 20000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.services.prompt_analyzer import analyze_prompt
+from app.services.response_cache import normalize_prompt
+from app.services.semantic_cache import SemanticCache
+
+ADJECTIVES = [
+    "spring", "summer", "autumn", "winter", "organic", "handmade", "vintage", "budget",
+    "premium", "eco-friendly", "local", "seasonal", "wireless", "smart", "artisan",
+]
+NOUNS = [
+    "coffee", "tea", "sale", "mugs", "sneakers", "backpacks", "candles", "headphones",
+    "bakery", "bookstore", "gym membership", "yoga class", "bike repair", "garden tools",
+    "skincare", "pet food", "board games", "hiking boots", "phone cases", "kitchen knives",
+]
+TEMPLATES = [
+    "write {n} lines about {topic}",
+    "{n} lines on {topic}",
+    "Give me {n} lines about {topic}",
+    "can you write {n} lines about our {topic} please",
+    "Write exactly {n} lines about {topic}",
+    "{topic} - {n} lines",
+    "Create {n} lines for {topic}",
+    "I need {n} short lines describing {topic}",
+]
+
+
+def make_stream(requests: int, seed: int = 0):
+    rng = random.Random(seed)
+    topics = [f"{a} {n}" for a in ADJECTIVES for n in NOUNS]
+    rng.shuffle(topics)
+    keys = [(topic, n) for topic in topics for n in (3, 5)]
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(keys))]
+    stream = []
+    for key in rng.choices(keys, weights=weights, k=requests):
+        topic, n = key
+        stream.append((key, rng.choice(TEMPLATES).format(n=n, topic=topic)))
+    return stream
+
+
+def replay(stream, threshold: float, capacity: int, dim: int) -> dict:
+    cache = SemanticCache(threshold=threshold, max_entries=capacity, dim=dim, ttl_seconds=1e9)
+    exact = {}
+    owner = {}  # cached prompt -> the (topic, n) it answered
+    exact_hits = hits = wrong = 0
+    for key, prompt in stream:
+        if normalize_prompt(prompt) in exact:
+            exact_hits += 1
+        exact[normalize_prompt(prompt)] = True
+        length_req = analyze_prompt(prompt).length_requirement
+        match = cache.lookup(prompt, length_req)
+        if match is None:
+            cache.add(prompt, length_req, prompt)
+            owner[prompt] = key
+        else:
+            hits += 1
+            wrong += owner[match.value] != key
+    stats = cache.stats()
+    return {
+        "exact_rate": exact_hits / len(stream),
+        "semantic_rate": hits / len(stream),
+        "wrong_rate": wrong / max(hits, 1),
+        "p50_us": stats["lookup_ms"]["p50"] * 1000,
+        "p99_us": stats["lookup_ms"]["p99"] * 1000,
+    }
+
+
+def full_index_latency(capacity: int, dim: int, samples: int = 500) -> float:
+    """Median lookup time (us) with every row of the index in use"""
+    cache = SemanticCache(threshold=0.99, max_entries=capacity, dim=dim, ttl_seconds=1e9)
+    length_req = {"type": "lines", "count": 3}
+    for i in range(capacity):
+        cache.add(f"write 3 lines about product number {i} in catalogue {i * 7}", length_req, "x")
+    timings = []
+    for i in range(samples):
+        prompt = f"3 lines on item {i} from range {i * 3}"
+        start = time.perf_counter()
+        cache.lookup(prompt, length_req)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--capacity", type=int, default=4096)
+    parser.add_argument("--dim", type=int, default=512)
+    args = parser.parse_args()
+
+    stream = make_stream(args.requests)
+    print(f"{len(stream)} requests, {len({key for key, _ in stream})} distinct (topic, length) asks, "
+          f"{len(TEMPLATES)} phrasings, capacity {args.capacity}, dim {args.dim}\n")
+    print(f"{'threshold':>10}{'exact hit':>11}{'semantic hit':>14}{'wrong hits':>12}{'p50 us':>9}{'p99 us':>9}")
+    for threshold in (0.7, 0.8, 0.85, 0.9, 0.95, 0.99):
+        result = replay(stream, threshold, args.capacity, args.dim)
+        print(
+            f"{threshold:>10.2f}{result['exact_rate']:>10.1%}{result['semantic_rate']:>13.1%}"
+            f"{result['wrong_rate']:>11.2%}{result['p50_us']:>9.0f}{result['p99_us']:>9.0f}"
+        )
+
+    print("\nlookup latency with a full index (median, us)")
+    print(f"{'capacity':>10}" + "".join(f"{'dim ' + str(d):>11}" for d in (256, 512, 1024)))
+    for capacity in (1024, 4096, 16384):
+        row = "".join(f"{full_index_latency(capacity, d):>11.0f}" for d in (256, 512, 1024))
+        print(f"{capacity:>10}{row}")
+
+
+if __name__ == "__main__":
+    main()
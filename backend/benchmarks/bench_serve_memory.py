@@ -0,0 +1,192 @@
+# benchmarks/bench_serve_memory.py
+"""
+Memory and throughput of app.serve as the number of API workers grows.
+
+Writes a randomly initialised GPT-2 style model (safetensors, word-level
+tokenizer) to stand in for the 20K model, then for each worker count starts
+benchmarks.fake_server twice: with SERVE_PRELOAD (model loaded once in the
+parent, workers forked with the weights shared copy-on-write) and without it
+(every worker loads its own copy, as uvicorn --workers would). For each run it
+reports the summed RSS and PSS of the supervisor and its workers once they
+have settled, requests/s of POST /api/content/quick over the fake Gemini, and
+PSS again after that load. RSS counts shared pages once per process; PSS
+splits them between the processes sharing them, so it is the real total.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serve_memory --workers 1,2,4 --duration 10
+    python -m benchmarks.bench_serve_memory --layers 12 --hidden 768   # ~120M parameters
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.load_test import RESULTS_DIR, _free_port, run_scenario, wait_ready
+
+WORDS = (
+    "spring summer sale coffee tea launch product email headline customer offer brand "
+    "story friendly short line write about new fresh limited today discount"
+).split()
+
+
+def make_model(path: str, layers: int, hidden: int, vocab: int) -> int:
+    """Save a random model to path (reused if present); returns its parameter count"""
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    config = GPT2Config(
+        vocab_size=vocab, n_positions=512, n_embd=hidden, n_layer=layers, n_head=max(1, hidden // 64),
+        bos_token_id=1, eos_token_id=1
+    )
+    if os.path.exists(os.path.join(path, "model.safetensors")):
+        model = GPT2LMHeadModel.from_pretrained(path)
+        if model.config.n_layer == layers and model.config.n_embd == hidden and model.config.vocab_size == vocab:
+            return model.num_parameters()
+    torch.manual_seed(0)
+    model = GPT2LMHeadModel(config)
+    model.save_pretrained(path)
+
+    tokens = ["<unk>", "<eos>"] + WORDS + [f"w{i}" for i in range(vocab - len(WORDS) - 2)]
+    tokenizer = Tokenizer(models.WordLevel({token: i for i, token in enumerate(tokens)}, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, unk_token="<unk>", eos_token="<eos>", bos_token="<eos>"
+    ).save_pretrained(path)
+    return model.num_parameters()
+
+
+def _memory_kb(pid: int) -> dict:
+    """Rss and Pss of one process, from smaps_rollup (kB)"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            for line in rollup:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values
+
+
+def _children(pid: int) -> list:
+    found = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as stat:
+                    # comm may contain spaces; the fields after it are fixed
+                    ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            if ppid == pid:
+                found.append(int(entry))
+    return found
+
+
+def total_memory_mb(pid: int) -> dict:
+    """Summed RSS/PSS (MB) of the server process and its direct children"""
+    pids = [pid] + _children(pid)
+    samples = [_memory_kb(p) for p in pids]
+    return {
+        "processes": len(pids),
+        "rss": sum(s.get("Rss", 0) for s in samples) / 1024,
+        "pss": sum(s.get("Pss", 0) for s in samples) / 1024,
+    }
+
+
+async def settle(pid: int, workers: int, timeout: float = 300.0) -> dict:
+    """Wait until every worker exists and total RSS stops growing (workers may still be loading)"""
+    deadline = time.monotonic() + timeout
+    last, steady = None, 0
+    while time.monotonic() < deadline:
+        memory = total_memory_mb(pid)
+        expected = workers + 1 if workers > 1 else 1
+        if memory["processes"] >= expected and last is not None and abs(memory["rss"] - last) < 2:
+            steady += 1
+            if steady >= 4:
+                return memory
+        else:
+            steady = 0
+        last = memory["rss"]
+        await asyncio.sleep(0.5)
+    raise SystemExit("Server memory did not settle in time")
+
+
+def start_server(port: int, workers: int, preload: bool, model_path: str, prefer_local: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "SERVE_PRELOAD": str(preload).lower(),
+        "LOCAL_MODEL_PATH": model_path,
+        "LOCAL_MODEL_WORKERS": "0",
+        "PREFER_LOCAL_MODEL": str(prefer_local).lower(),
+        "FAKE_GEMINI_LATENCY": env.get("FAKE_GEMINI_LATENCY", "fixed:0.05"),
+    })
+    # Measure the service path, not the load shedding or the caches
+    env.setdefault("RATE_LIMIT_ENABLED", "false")
+    env.setdefault("RESPONSE_CACHE_ENABLED", "false")
+    env.setdefault("CONVERSATIONS_ENABLED", "false")
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_server", "--port", str(port), "--workers", str(workers)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def measure(args, workers: int, preload: bool) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(port, workers, preload, args.model_path, args.prefer_local)
+    try:
+        await wait_ready(base_url, server, timeout=300.0)
+        idle = await settle(server.pid, workers)
+        load = await run_scenario(base_url, "quick", args.concurrency, args.duration, args.warmup)
+        after = total_memory_mb(server.pid)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return {"idle": idle, "load": load, "after": after}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated API worker counts")
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--hidden", type=int, default=768)
+    parser.add_argument("--vocab", type=int, default=32000)
+    parser.add_argument("--model-path", default=os.path.join(RESULTS_DIR, "serve-bench-model"))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--prefer-local", action="store_true",
+                        help="Route /quick to the local model instead of the fake Gemini")
+    args = parser.parse_args()
+
+    parameters = make_model(args.model_path, args.layers, args.hidden, args.vocab)
+    print(f"model: {parameters / 1e6:.0f}M parameters ({parameters * 4 / 2**20:.0f} MB fp32), "
+          f"{os.cpu_count()} CPUs, /quick via {'local model' if args.prefer_local else 'fake Gemini'}, "
+          f"concurrency {args.concurrency}\n")
+    print(f"{'workers':>8}{'preload':>9}{'RSS MB':>9}{'PSS MB':>9}{'req/s':>9}{'p95 ms':>9}{'PSS after':>11}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        for preload in (True, False):
+            if workers == 1 and not preload:
+                continue  # a single worker does not fork, so preloading changes nothing
+            result = await measure(args, workers, preload)
+            idle, load = result["idle"], result["load"]
+            shown = "-" if workers == 1 else "yes" if preload else "no"
+            print(
+                f"{workers:>8}{shown:>9}{idle['rss']:>9.0f}{idle['pss']:>9.0f}"
+                f"{load['rps']:>9.1f}{load['p95_ms'] or 0:>9.0f}{result['after']['pss']:>11.0f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
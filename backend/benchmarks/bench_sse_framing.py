@@ -0,0 +1,81 @@
+# benchmarks/bench_sse_framing.py
+"""
+Compare the old per-character SSE framing against the coalescing framer.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sse_framing --chars 3000 --chunk-size 40 --repeat 200
+
+The legacy path is measured without its 10 ms sleep (pure framing cost); the
+minimum delivery time the sleep used to add is printed alongside.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+
+from app.api.sse import FlushPolicy, event_stream
+
+WORDS = "the quick brown fox jumps over the lazy dog while content streams by".split()
+
+
+def _make_text(chars: int) -> str:
+    text, i = [], 0
+    while sum(len(w) + 1 for w in text) < chars:
+        text.append(WORDS[i % len(WORDS)])
+        i += 1
+    return " ".join(text)[:chars]
+
+
+async def _chunks(text: str, chunk_size: int):
+    for i in range(0, len(text), chunk_size):
+        yield text[i:i + chunk_size]
+
+
+async def _legacy(text: str, chunk_size: int):
+    """The old generate() closure: one json.dumps event per character"""
+    yield "data: " + json.dumps({"type": "start", "content": ""}) + "\n\n"
+    async for chunk in _chunks(text, chunk_size):
+        for char in chunk:
+            yield "data: " + json.dumps({"type": "chunk", "content": char}) + "\n\n"
+    yield "data: " + json.dumps({"type": "end", "content": ""}) + "\n\n"
+
+
+async def _measure(label: str, factory, repeat: int) -> None:
+    events = size = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        async for frame in factory():
+            events += 1
+            size += len(frame)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<18} events/resp={events // repeat:<6} events/s={events / elapsed:10,.0f} "
+        f"MB/s={size / elapsed / 1e6:7.2f} responses/s={repeat / elapsed:9,.1f}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chars", type=int, default=3000)
+    parser.add_argument("--chunk-size", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    text = _make_text(args.chars)
+    print(f"legacy sleep alone adds >= {len(text) * 0.01:.1f}s per response of {len(text)} chars")
+
+    await _measure("legacy (per char)", lambda: _legacy(text, args.chunk_size), args.repeat)
+    for mode in ("chunk", "word", "interval"):
+        policy = FlushPolicy(mode=mode, interval_ms=50, max_chars=512)
+        await _measure(
+            f"{mode}",
+            lambda: event_stream(_chunks(text, args.chunk_size), policy),
+            args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+# benchmarks/bench_startup.py
+"""
+Measure API import time and time until the app can accept requests.
+
+Each run happens in a fresh interpreter. The script exits non-zero when the
+median time-to-accept exceeds the budget, so it can guard against regressions.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 3000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_PROBE = r"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        accepting = time.perf_counter()
+        heavy = sorted(m for m in ("torch", "transformers") if m in sys.modules)
+        print(json.dumps({
+            "import_ms": (imported - start) * 1000,
+            "accept_ms": (accepting - start) * 1000,
+            "heavy_modules": heavy,
+        }))
+
+asyncio.run(startup())
+"""
+
+
+def _run_once() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+    env.setdefault("CONVERSATIONS_ENABLED", "false")
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE], capture_output=True, text=True, env=env, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=3000.0)
+    args = parser.parse_args()
+
+    results = [_run_once() for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    accept_ms = statistics.median(r["accept_ms"] for r in results)
+    heavy = results[-1]["heavy_modules"]
+
+    print(f"import app.main:       {import_ms:8.1f} ms (median of {args.runs})")
+    print(f"ready to accept:       {accept_ms:8.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"heavy modules at accept: {', '.join(heavy) or 'none'}")
+    if accept_ms > args.budget_ms:
+        print("FAIL: startup exceeded budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
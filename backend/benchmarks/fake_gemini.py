@@ -0,0 +1,128 @@
+# benchmarks/fake_gemini.py
+"""
+Deterministic stand-in for genai.GenerativeModel so benchmarks never call Google.
+
+Latency, chunking and failures are configurable on the class or, for a
+server in another process, through environment variables (see
+configure_from_env). Randomness comes from a seeded generator, so a given
+configuration produces the same sequence of latencies and failures.
+"""
+import math
+import os
+import random
+import threading
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # keep per-request logs out of benchmark output
+
+import google.generativeai as genai
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LatencyModel:
+    """
+    Seconds per call drawn from a distribution spec:
+
+    - "0.2" or "fixed:0.2"
+    - "uniform:0.1,0.5"
+    - "lognormal:0.2,0.5" (median, sigma)
+    - "bimodal:0.1,2.0,0.05" (fast, slow, probability of slow)
+    """
+
+    def __init__(self, spec: str, seed: int = 0):
+        self.spec = spec
+        kind, _, params = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        self.kind = kind
+        self.params = [float(value) for value in params.split(",")]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        if kind not in ("fixed", "uniform", "lognormal", "bimodal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                return self.params[0]
+            if self.kind == "uniform":
+                return self._rng.uniform(self.params[0], self.params[1])
+            if self.kind == "lognormal":
+                median, sigma = self.params
+                return self._rng.lognormvariate(math.log(median), sigma)
+            fast, slow, p_slow = self.params
+            return slow if self._rng.random() < p_slow else fast
+
+
+class FakeGenerativeModel:
+    """Sleeps like a remote call (blocking, as the real SDK does) and returns canned text"""
+
+    latency_seconds = 0.2
+    latency = None  # LatencyModel; falls back to latency_seconds when unset
+    response_text = "\n".join(f"Line {i} of generated content." for i in range(1, 21))
+    chunk_size = 40
+    failure_rate = 0.0
+    _failures = random.Random(0)
+    _failures_lock = threading.Lock()
+
+    def __init__(self, model_name: str = "fake-gemini", **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, contents, *, generation_config=None, stream=False, **kwargs):
+        latency = self.latency.sample() if self.latency is not None else self.latency_seconds
+        if self._should_fail():
+            time.sleep(latency)
+            raise RuntimeError("503 Fake Gemini is unavailable")
+        if stream:
+            return self._stream(latency)
+        time.sleep(latency)
+        return FakeResponse(self.response_text)
+
+    def _stream(self, latency: float):
+        text = self.response_text
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        delay = latency / max(len(chunks), 1)
+        for chunk in chunks:
+            time.sleep(delay)
+            yield FakeChunk(chunk)
+
+    @classmethod
+    def _should_fail(cls) -> bool:
+        if cls.failure_rate <= 0:
+            return False
+        with cls._failures_lock:
+            return cls._failures.random() < cls.failure_rate
+
+
+def configure_from_env(model_cls=FakeGenerativeModel) -> None:
+    """
+    Apply FAKE_GEMINI_LATENCY (distribution spec), FAKE_GEMINI_CHUNK_SIZE,
+    FAKE_GEMINI_FAILURE_RATE, FAKE_GEMINI_RESPONSE_LINES and FAKE_GEMINI_SEED
+    """
+    seed = int(os.environ.get("FAKE_GEMINI_SEED", "0"))
+    if "FAKE_GEMINI_LATENCY" in os.environ:
+        model_cls.latency = LatencyModel(os.environ["FAKE_GEMINI_LATENCY"], seed)
+    if "FAKE_GEMINI_CHUNK_SIZE" in os.environ:
+        model_cls.chunk_size = int(os.environ["FAKE_GEMINI_CHUNK_SIZE"])
+    if "FAKE_GEMINI_FAILURE_RATE" in os.environ:
+        model_cls.failure_rate = float(os.environ["FAKE_GEMINI_FAILURE_RATE"])
+    if "FAKE_GEMINI_RESPONSE_LINES" in os.environ:
+        lines = int(os.environ["FAKE_GEMINI_RESPONSE_LINES"])
+        model_cls.response_text = "\n".join(
+            f"Line {i} of generated content." for i in range(1, lines + 1)
+        )
+    model_cls._failures = random.Random(seed + 1)
+
+
+def install(model_cls=FakeGenerativeModel) -> None:
+    """Swap the SDK entry points for the fake; call before creating ContentService"""
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = model_cls
@@ -0,0 +1,36 @@
+# benchmarks/fake_server.py
+"""
+Run the real API with the fake Gemini backend, configured from FAKE_GEMINI_*
+environment variables (see fake_gemini.configure_from_env).
+
+Usage (from backend/):
+    FAKE_GEMINI_LATENCY=lognormal:0.2,0.4 python -m benchmarks.fake_server --port 8001
+    python -m benchmarks.fake_server --workers 4   # forked workers via app.serve
+"""
+import argparse
+import os
+
+# A benchmark server never writes conversations to disk unless asked to
+os.environ.setdefault("CONVERSATIONS_ENABLED", "false")
+
+from benchmarks import fake_gemini
+
+fake_gemini.configure_from_env()
+fake_gemini.install()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes (0 = one per CPU)")
+    args = parser.parse_args()
+
+    from app.main import app
+    from app.serve import serve
+
+    serve(app, host=args.host, port=args.port, workers=args.workers, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# benchmarks/load_test.py
+"""
+End-to-end load test against a real uvicorn server backed by the fake Gemini.
+
+Starts benchmarks.fake_server in a subprocess, then drives each scenario with
+a closed loop of N concurrent clients for a fixed duration:
+
+- quick: POST /api/content/quick
+- chat: POST /api/content/chat with stream=false
+- chat-stream: POST /api/content/chat with stream=true (SSE)
+
+Every request uses a unique prompt so the response cache cannot help.
+For each scenario and concurrency level the report shows requests/s, error
+rate, p50/p95/p99 latency, time to first byte (for SSE, the first
+content event) and response bytes/s.
+
+Results are written as JSON to benchmarks/results/. With --baseline, the run
+is compared with an earlier results file and the exit status is 1 if any
+throughput drops, or p95 latency / time to first event rises, by more than
+--tolerance.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --concurrency 1,8,32 --duration 10
+    python -m benchmarks.load_test --latency lognormal:0.2,0.5 --failure-rate 0.02
+    python -m benchmarks.load_test --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+SCENARIOS = ("quick", "chat", "chat-stream")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+_CHUNK_EVENT = b'"type":"chunk"'
+# An error event, or an end event with no backend (every backend failed and the
+# error text was streamed as content)
+_ERROR_MARKERS = (b'"type":"error"', b'"backend":null')
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _request(scenario: str, index: int):
+    prompt = f"write 3 lines about load test request {index}"
+    if scenario == "quick":
+        return "/api/content/quick", {"prompt": prompt}
+    return "/api/content/chat", {"message": prompt, "stream": scenario == "chat-stream"}
+
+
+async def _one(client: httpx.AsyncClient, scenario: str, index: int) -> dict:
+    path, body = _request(scenario, index)
+    start = time.perf_counter()
+    first = None
+    size = 0
+    in_band_error = False
+    tail = b""
+    try:
+        async with client.stream("POST", path, json=body) as response:
+            async for chunk in response.aiter_bytes():
+                if scenario == "chat-stream":
+                    window = tail + chunk  # markers may straddle two reads
+                    # The start event goes out before generation; time the first content event
+                    if first is None and _CHUNK_EVENT in window:
+                        first = time.perf_counter()
+                    in_band_error = in_band_error or any(marker in window for marker in _ERROR_MARKERS)
+                    tail = chunk[-32:]
+                elif first is None:
+                    first = time.perf_counter()
+                size += len(chunk)
+        # Errors after the headers are reported in-band
+        ok = response.status_code == 200 and not in_band_error
+        status = "sse-error" if in_band_error else response.status_code
+    except httpx.HTTPError as e:
+        ok, status = False, type(e).__name__
+    end = time.perf_counter()
+    return {
+        "ok": ok,
+        "status": status,
+        "latency": end - start,
+        "ttfb": (first - start) if first is not None else None,
+        "bytes": size,
+    }
+
+
+async def _worker(client, scenario, deadline, counter, results):
+    while time.perf_counter() < deadline:
+        counter[0] += 1
+        results.append(await _one(client, scenario, counter[0]))
+
+
+async def run_scenario(base_url: str, scenario: str, concurrency: int, duration: float, warmup: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(120.0)
+    counter = [0]
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        if warmup > 0:
+            await asyncio.gather(*(
+                _worker(client, scenario, time.perf_counter() + warmup, counter, [])
+                for _ in range(concurrency)
+            ))
+        results = []
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            _worker(client, scenario, start + duration, counter, results)
+            for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["latency"] * 1000 for r in ok]
+    ttfbs = [r["ttfb"] * 1000 for r in ok if r["ttfb"] is not None]
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[str(r["status"])] = errors.get(str(r["status"]), 0) + 1
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "rps": len(ok) / elapsed,
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "errors": errors,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "ttfb_p50_ms": _percentile(ttfbs, 50),
+        "ttfb_p95_ms": _percentile(ttfbs, 95),
+        "bytes_per_sec": sum(r["bytes"] for r in ok) / elapsed,
+    }
+
+
+def start_server(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "FAKE_GEMINI_LATENCY": args.latency,
+        "FAKE_GEMINI_CHUNK_SIZE": str(args.chunk_size),
+        "FAKE_GEMINI_FAILURE_RATE": str(args.failure_rate),
+        "FAKE_GEMINI_RESPONSE_LINES": str(args.response_lines),
+        "FAKE_GEMINI_SEED": str(args.seed),
+    })
+    # Measure the service path, not the load shedding or the cache
+    env.setdefault("RATE_LIMIT_ENABLED", "false")
+    env.setdefault("RESPONSE_CACHE_ENABLED", "false")
+    env.setdefault("CONVERSATIONS_ENABLED", "false")
+    if not args.local_model:
+        env["LOCAL_MODEL_PATH"] = os.path.join(RESULTS_DIR, "no-local-model")
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_server", "--port", str(args.port)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        stdout=subprocess.DEVNULL if not args.server_output else None,
+        stderr=None if args.server_output else subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise SystemExit(f"Server exited with status {server.returncode}")
+            try:
+                response = await client.get("/ready")
+                # Wait for the local model too, so it is not measured mid-load
+                if response.status_code == 200 and not response.json()["local_model_loading"]:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit("Server did not become ready in time")
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Regressions as human-readable strings; empty if the run is within tolerance"""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    for current in results:
+        before = previous.get((current["scenario"], current["concurrency"]))
+        if before is None:
+            continue
+        label = f"{current['scenario']} c={current['concurrency']}"
+        if before["rps"] and current["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{label}: rps {before['rps']:.1f} -> {current['rps']:.1f}")
+        for key in ("p95_ms", "ttfb_p95_ms"):
+            if before.get(key) and current.get(key) and current[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{label}: {key} {before[key]:.0f} -> {current[key]:.0f}")
+        if current["error_rate"] > before["error_rate"] + tolerance / 10:
+            regressions.append(
+                f"{label}: error rate {before['error_rate']:.1%} -> {current['error_rate']:.1%}"
+            )
+    return regressions
+
+
+def _fmt(value, spec=".0f"):
+    return "-" if value is None else format(value, spec)
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds measured per run")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--latency", default="lognormal:0.2,0.3", help="Fake Gemini latency distribution")
+    parser.add_argument("--chunk-size", type=int, default=40)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--response-lines", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--local-model", action="store_true", help="Let the server load the local model too")
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--server-output", action="store_true")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        args.port = args.port or _free_port()
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args)
+
+    results = []
+    try:
+        if server:
+            await wait_ready(base_url, server)
+        print(f"fake Gemini latency {args.latency}, failure rate {args.failure_rate}, "
+              f"{args.duration:.0f}s per run")
+        print(f"{'scenario':<13}{'conc':>5}{'req/s':>8}{'err %':>7}{'p50 ms':>8}{'p95 ms':>8}"
+              f"{'p99 ms':>8}{'ttfb50':>8}{'ttfb95':>8}{'KB/s':>9}")
+        for scenario in scenarios:
+            for concurrency in levels:
+                result = await run_scenario(base_url, scenario, concurrency, args.duration, args.warmup)
+                results.append(result)
+                print(
+                    f"{scenario:<13}{concurrency:>5}{result['rps']:>8.1f}{result['error_rate'] * 100:>7.1f}"
+                    f"{_fmt(result['p50_ms']):>8}{_fmt(result['p95_ms']):>8}{_fmt(result['p99_ms']):>8}"
+                    f"{_fmt(result['ttfb_p50_ms']):>8}{_fmt(result['ttfb_p95_ms']):>8}"
+                    f"{result['bytes_per_sec'] / 1024:>9.1f}"
+                )
+    finally:
+        if server:
+            server.terminate()
+            try:
+                server.wait(10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "latency": args.latency,
+            "chunk_size": args.chunk_size,
+            "failure_rate": args.failure_rate,
+            "response_lines": args.response_lines,
+            "seed": args.seed,
+            "duration": args.duration,
+            "url": args.url,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("latency") != args.latency:
+            print("warning: baseline used a different latency distribution", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -16,7 +16,8 @@ class Settings(BaseSettings):
         extra='ignore',
         env_file='.env',
         env_file_encoding='utf-8',
-        case_sensitive=False
+        case_sensitive=False,
+        protected_namespaces=()
     )
     
     # REQUIRED SETTINGS
@@ -64,7 +65,590 @@ class Settings(BaseSettings):
         env="TEMPERATURE",
         description="Temperature for generation (0.0-2.0)"
     )
-    
+
+    # CONCURRENCY
+    model_executor_workers: int = Field(
+        default=16,
+        ge=1,
+        env="MODEL_EXECUTOR_WORKERS",
+        description="Max concurrent blocking model SDK calls (thread pool size)"
+    )
+
+    # STREAMING (SSE)
+    sse_flush_mode: str = Field(
+        default="chunk",
+        env="SSE_FLUSH_MODE",
+        description="Default SSE batching mode: chunk, word or interval"
+    )
+
+    sse_flush_interval_ms: int = Field(
+        default=50,
+        ge=0,
+        env="SSE_FLUSH_INTERVAL_MS",
+        description="Max time buffered text waits before being flushed (0 disables)"
+    )
+
+    sse_flush_max_chars: int = Field(
+        default=512,
+        ge=1,
+        env="SSE_FLUSH_MAX_CHARS",
+        description="Flush an SSE event once this many characters are buffered"
+    )
+
+    # RESPONSE CACHE
+    response_cache_enabled: bool = Field(
+        default=True,
+        env="RESPONSE_CACHE_ENABLED",
+        description="Cache non-streaming responses for repeated prompts"
+    )
+
+    response_cache_sampled: bool = Field(
+        default=False,
+        env="RESPONSE_CACHE_SAMPLED",
+        description="Also cache when temperature > 0 (repeated prompts get identical output)"
+    )
+
+    response_cache_ttl_seconds: float = Field(
+        default=300.0,
+        gt=0,
+        env="RESPONSE_CACHE_TTL_SECONDS",
+        description="How long a cached response stays valid"
+    )
+
+    response_cache_max_entries: int = Field(
+        default=1024,
+        ge=1,
+        env="RESPONSE_CACHE_MAX_ENTRIES",
+        description="Max number of cached responses"
+    )
+
+    response_cache_max_bytes: int = Field(
+        default=16 * 1024 * 1024,
+        ge=1024,
+        env="RESPONSE_CACHE_MAX_BYTES",
+        description="Approximate memory cap for cached responses"
+    )
+
+    # SEMANTIC CACHE
+    semantic_cache_enabled: bool = Field(
+        default=False,
+        env="SEMANTIC_CACHE_ENABLED",
+        description="Serve paraphrased prompts (same length requirement) from earlier responses"
+    )
+
+    semantic_cache_threshold: float = Field(
+        default=0.9,
+        gt=0.0,
+        le=1.0,
+        env="SEMANTIC_CACHE_THRESHOLD",
+        description="Minimum cosine similarity between prompts for a semantic hit"
+    )
+
+    semantic_cache_max_entries: int = Field(
+        default=4096,
+        ge=1,
+        env="SEMANTIC_CACHE_MAX_ENTRIES",
+        description="Prompts kept in the vector index (least recently used are evicted)"
+    )
+
+    semantic_cache_dim: int = Field(
+        default=512,
+        ge=64,
+        env="SEMANTIC_CACHE_DIM",
+        description="Hashed feature dimensions per prompt embedding"
+    )
+
+    semantic_cache_ttl_seconds: float = Field(
+        default=300.0,
+        gt=0,
+        env="SEMANTIC_CACHE_TTL_SECONDS",
+        description="How long a semantically cached response stays valid"
+    )
+
+    # BATCH GENERATION
+    batch_default_concurrency: int = Field(
+        default=8,
+        ge=1,
+        env="BATCH_DEFAULT_CONCURRENCY",
+        description="Generations run at once for a batch request"
+    )
+
+    batch_max_concurrency: int = Field(
+        default=32,
+        ge=1,
+        env="BATCH_MAX_CONCURRENCY",
+        description="Upper bound on the concurrency a batch request may ask for"
+    )
+
+    # LOCAL MODEL
+    local_model_path: str = Field(
+        default="models/content-generator-20k",
+        env="LOCAL_MODEL_PATH",
+        description="Path to the local 20K model"
+    )
+
+    local_model_precision: str = Field(
+        default="fp32",
+        pattern="^(fp32|int8|bf16)$",
+        env="LOCAL_MODEL_PRECISION",
+        description="CPU inference precision: fp32, int8 (dynamic quantization) or bf16"
+    )
+
+    prefer_local_model: bool = Field(
+        default=False,
+        env="PREFER_LOCAL_MODEL",
+        description="Prefer the local model over Gemini when both can meet the latency budget"
+    )
+
+    local_batch_window_ms: float = Field(
+        default=10.0,
+        ge=0,
+        env="LOCAL_BATCH_WINDOW_MS",
+        description="How long to collect local generation requests into one batch"
+    )
+
+    local_batch_max_size: int = Field(
+        default=8,
+        ge=1,
+        env="LOCAL_BATCH_MAX_SIZE",
+        description="Max prompts per local generate() call"
+    )
+
+    local_batch_max_concurrent: int = Field(
+        default=1,
+        ge=1,
+        env="LOCAL_BATCH_MAX_CONCURRENT",
+        description="Max local batches running at the same time"
+    )
+
+    local_prefix_cache_enabled: bool = Field(
+        default=True,
+        env="LOCAL_PREFIX_CACHE_ENABLED",
+        description="Reuse KV state for the prompt template and frequent prompt heads"
+    )
+
+    local_prefix_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        ge=0,
+        env="LOCAL_PREFIX_CACHE_MAX_BYTES",
+        description="Memory cap for cached prefix KV state"
+    )
+
+    local_prefix_cache_head_tokens: int = Field(
+        default=32,
+        ge=0,
+        env="LOCAL_PREFIX_CACHE_HEAD_TOKENS",
+        description="Length of prompt heads considered for caching (0 = template only)"
+    )
+
+    local_prefix_cache_head_min_hits: int = Field(
+        default=2,
+        ge=1,
+        env="LOCAL_PREFIX_CACHE_HEAD_MIN_HITS",
+        description="Times a prompt head must be seen before its KV state is cached"
+    )
+
+    local_model_workers: int = Field(
+        default=0,
+        ge=0,
+        env="LOCAL_MODEL_WORKERS",
+        description="Worker processes for local inference (0 = run in the API process)"
+    )
+
+    local_model_worker_threads: int = Field(
+        default=0,
+        ge=0,
+        env="LOCAL_MODEL_WORKER_THREADS",
+        description="Intra-op threads per worker process (0 = cpu_count / workers)"
+    )
+
+    local_model_load_timeout_seconds: float = Field(
+        default=600.0,
+        gt=0,
+        env="LOCAL_MODEL_LOAD_TIMEOUT_SECONDS",
+        description="Give up waiting for local model workers to become ready after this long"
+    )
+
+    # SERVING
+    serve_host: str = Field(
+        default="0.0.0.0",
+        env="SERVE_HOST",
+        description="Address the API listens on"
+    )
+
+    serve_port: int = Field(
+        default=8000,
+        ge=1,
+        le=65535,
+        env="SERVE_PORT",
+        description="Port the API listens on"
+    )
+
+    serve_workers: int = Field(
+        default=1,
+        ge=0,
+        env="SERVE_WORKERS",
+        description="API worker processes forked from one preloaded parent (0 = one per CPU)"
+    )
+
+    serve_preload: bool = Field(
+        default=True,
+        env="SERVE_PRELOAD",
+        description="Load the local model in the parent so forked workers share its weights copy-on-write"
+    )
+
+    serve_worker_threads: int = Field(
+        default=0,
+        ge=0,
+        env="SERVE_WORKER_THREADS",
+        description="Intra-op threads per API worker (0 = cpu_count / workers)"
+    )
+
+    serve_restart_backoff_seconds: float = Field(
+        default=5.0,
+        ge=0,
+        env="SERVE_RESTART_BACKOFF_SECONDS",
+        description="Delay before replacing a worker that died soon after it was started"
+    )
+
+    # ROUTING
+    routing_latency_budget_ms: float = Field(
+        default=15000,
+        gt=0,
+        env="ROUTING_LATENCY_BUDGET_MS",
+        description="Default latency budget a backend must be expected to meet"
+    )
+
+    routing_max_error_rate: float = Field(
+        default=0.5,
+        ge=0,
+        le=1,
+        env="ROUTING_MAX_ERROR_RATE",
+        description="Backends with a higher recent error rate are only used as fallbacks"
+    )
+
+    # HEDGING
+    hedging_enabled: bool = Field(
+        default=False,
+        env="HEDGING_ENABLED",
+        description="Send a backup request when a quick generation is unusually slow"
+    )
+
+    hedge_percentile: float = Field(
+        default=95,
+        gt=0,
+        le=100,
+        env="HEDGE_PERCENTILE",
+        description="Hedge once the primary is slower than this latency percentile"
+    )
+
+    hedge_min_delay_ms: float = Field(
+        default=100,
+        ge=0,
+        env="HEDGE_MIN_DELAY_MS",
+        description="Never hedge sooner than this"
+    )
+
+    hedge_default_delay_ms: float = Field(
+        default=2000,
+        ge=0,
+        env="HEDGE_DEFAULT_DELAY_MS",
+        description="Hedge delay until enough latency samples have been collected"
+    )
+
+    hedge_budget_ratio: float = Field(
+        default=0.1,
+        ge=0,
+        le=1,
+        env="HEDGE_BUDGET_RATIO",
+        description="Maximum extra requests sent as hedges, as a share of all requests"
+    )
+
+    hedge_target: str = Field(
+        default="same",
+        pattern="^(same|alternate)$",
+        env="HEDGE_TARGET",
+        description="Hedge to the same backend, or to the next one (e.g. the local model) if loaded"
+    )
+
+    # RESILIENCE
+    circuit_breaker_failure_threshold: int = Field(
+        default=5,
+        ge=1,
+        env="CIRCUIT_BREAKER_FAILURE_THRESHOLD",
+        description="Consecutive failures that open a backend's circuit"
+    )
+
+    circuit_breaker_reset_seconds: float = Field(
+        default=30.0,
+        gt=0,
+        env="CIRCUIT_BREAKER_RESET_SECONDS",
+        description="How long an open circuit rejects calls before letting a probe through"
+    )
+
+    circuit_breaker_half_open_calls: int = Field(
+        default=1,
+        ge=1,
+        env="CIRCUIT_BREAKER_HALF_OPEN_CALLS",
+        description="Probe calls allowed while half-open"
+    )
+
+    concurrency_limit_initial: int = Field(
+        default=32,
+        ge=1,
+        env="CONCURRENCY_LIMIT_INITIAL",
+        description="Starting concurrency limit per backend; calls beyond it are rejected"
+    )
+
+    concurrency_limit_min: int = Field(
+        default=1,
+        ge=1,
+        env="CONCURRENCY_LIMIT_MIN",
+        description="Lowest adaptive concurrency limit per backend"
+    )
+
+    concurrency_limit_max: int = Field(
+        default=64,
+        ge=1,
+        env="CONCURRENCY_LIMIT_MAX",
+        description="Highest adaptive concurrency limit per backend"
+    )
+
+    concurrency_latency_target_ms: float = Field(
+        default=30000,
+        ge=0,
+        env="CONCURRENCY_LATENCY_TARGET_MS",
+        description="Calls slower than this shrink the concurrency limit (0 = errors only)"
+    )
+
+    # ADMISSION CONTROL
+    rate_limit_enabled: bool = Field(
+        default=True,
+        env="RATE_LIMIT_ENABLED",
+        description="Rate limit and queue generation requests (POST /api/content/...)"
+    )
+
+    rate_limit_client_rate: float = Field(
+        default=2.0,
+        gt=0,
+        env="RATE_LIMIT_CLIENT_RATE",
+        description="Sustained generation requests per second per client"
+    )
+
+    rate_limit_client_burst: float = Field(
+        default=20,
+        ge=1,
+        env="RATE_LIMIT_CLIENT_BURST",
+        description="Requests a client may send at once before being limited"
+    )
+
+    rate_limit_global_rate: float = Field(
+        default=100.0,
+        gt=0,
+        env="RATE_LIMIT_GLOBAL_RATE",
+        description="Sustained generation requests per second across all clients"
+    )
+
+    rate_limit_global_burst: float = Field(
+        default=200,
+        ge=1,
+        env="RATE_LIMIT_GLOBAL_BURST",
+        description="Global burst allowance"
+    )
+
+    rate_limit_trust_forwarded: bool = Field(
+        default=False,
+        env="RATE_LIMIT_TRUST_FORWARDED",
+        description="Identify clients by X-Forwarded-For (only behind a trusted proxy)"
+    )
+
+    admission_max_concurrent: int = Field(
+        default=32,
+        ge=1,
+        env="ADMISSION_MAX_CONCURRENT",
+        description="Generation requests processed at once"
+    )
+
+    admission_max_queue: int = Field(
+        default=64,
+        ge=0,
+        env="ADMISSION_MAX_QUEUE",
+        description="Requests allowed to wait for a slot; beyond this they get 503"
+    )
+
+    admission_max_queue_wait_seconds: float = Field(
+        default=5.0,
+        ge=0,
+        env="ADMISSION_MAX_QUEUE_WAIT_SECONDS",
+        description="Longest a request waits for a slot before being shed with 503"
+    )
+
+    # OBSERVABILITY
+    log_level: str = Field(
+        default="INFO",
+        env="LOG_LEVEL",
+        description="Root log level"
+    )
+
+    log_format: str = Field(
+        default="json",
+        pattern="^(json|text)$",
+        env="LOG_FORMAT",
+        description="json: one JSON object per line with structured fields; text: human-readable"
+    )
+
+    metrics_enabled: bool = Field(
+        default=True,
+        env="METRICS_ENABLED",
+        description="Expose Prometheus-format metrics on /metrics"
+    )
+
+    # PROFILING
+    profiling_enabled: bool = Field(
+        default=False,
+        env="PROFILING_ENABLED",
+        description="Allow profiling single requests with X-Profile: 1 or ?profile=1"
+    )
+
+    profiling_max_concurrent: int = Field(
+        default=1,
+        ge=1,
+        env="PROFILING_MAX_CONCURRENT",
+        description="Profiled requests allowed at once; others run unprofiled"
+    )
+
+    profiling_dir: str = Field(
+        default="profiles",
+        env="PROFILING_DIR",
+        description="Where profile artifacts (<id>.prof and <id>.json) are written"
+    )
+
+    profiling_max_artifacts: int = Field(
+        default=100,
+        ge=1,
+        env="PROFILING_MAX_ARTIFACTS",
+        description="Oldest profiles are deleted beyond this many"
+    )
+
+    # DATABASE
+    database_url: str = Field(
+        default="sqlite+aiosqlite:///./content_generator.db",
+        env="DATABASE_URL",
+        description="Async SQLAlchemy URL (sqlite+aiosqlite locally, postgresql+asyncpg in production)"
+    )
+
+    database_pool_size: int = Field(
+        default=5,
+        ge=1,
+        env="DATABASE_POOL_SIZE",
+        description="Connections kept open in the pool"
+    )
+
+    database_max_overflow: int = Field(
+        default=10,
+        ge=0,
+        env="DATABASE_MAX_OVERFLOW",
+        description="Extra connections opened under load beyond the pool size"
+    )
+
+    database_pool_timeout_seconds: float = Field(
+        default=30.0,
+        gt=0,
+        env="DATABASE_POOL_TIMEOUT_SECONDS",
+        description="How long to wait for a pooled connection"
+    )
+
+    database_echo: bool = Field(
+        default=False,
+        env="DATABASE_ECHO",
+        description="Log every SQL statement"
+    )
+
+    # CONVERSATIONS
+    conversations_enabled: bool = Field(
+        default=False,
+        env="CONVERSATIONS_ENABLED",
+        description="Persist /chat messages into conversations (opt-in: creates the DATABASE_URL database)"
+    )
+
+    conversation_write_batch_size: int = Field(
+        default=200,
+        ge=1,
+        env="CONVERSATION_WRITE_BATCH_SIZE",
+        description="Most messages written in one transaction"
+    )
+
+    conversation_write_flush_ms: int = Field(
+        default=250,
+        ge=0,
+        env="CONVERSATION_WRITE_FLUSH_MS",
+        description="Longest a queued message waits before its batch is written"
+    )
+
+    conversation_write_queue_max: int = Field(
+        default=10000,
+        ge=1,
+        env="CONVERSATION_WRITE_QUEUE_MAX",
+        description="Queued writes beyond this are dropped (and counted) rather than slowing requests"
+    )
+
+    conversation_count_cap: int = Field(
+        default=10000,
+        ge=1,
+        env="CONVERSATION_COUNT_CAP",
+        description="Listings count matches only up to this many (reported as capped beyond it)"
+    )
+
+    conversation_count_cache_seconds: float = Field(
+        default=30.0,
+        ge=0.0,
+        env="CONVERSATION_COUNT_CACHE_SECONDS",
+        description="How long a listing's total_count is reused before it is counted again"
+    )
+
+    # CONVERSATION CONTEXT
+    context_enabled: bool = Field(
+        default=True,
+        env="CONTEXT_ENABLED",
+        description="Feed earlier turns of a conversation back to the model"
+    )
+
+    context_budget_tokens: int = Field(
+        default=2000,
+        ge=100,
+        env="CONTEXT_BUDGET_TOKENS",
+        description="Most (estimated) tokens of history sent with a message"
+    )
+
+    context_summary_max_tokens: int = Field(
+        default=300,
+        ge=0,
+        env="CONTEXT_SUMMARY_MAX_TOKENS",
+        description="Size cap of the rolling summary that replaces trimmed turns"
+    )
+
+    context_keep_ratio: float = Field(
+        default=0.75,
+        gt=0.0,
+        le=1.0,
+        env="CONTEXT_KEEP_RATIO",
+        description="Trim history down to this share of the budget, so summaries are not redone every turn"
+    )
+
+    context_max_conversations: int = Field(
+        default=10000,
+        ge=1,
+        env="CONTEXT_MAX_CONVERSATIONS",
+        description="Conversations whose context is kept in memory (least recently used are dropped)"
+    )
+
+    context_hydrate_messages: int = Field(
+        default=50,
+        ge=0,
+        env="CONTEXT_HYDRATE_MESSAGES",
+        description="Recent messages loaded from the database for a conversation not in memory"
+    )
+
     @field_validator('cors_origins', mode='before')
     @classmethod
     def parse_cors_origins(cls, v):
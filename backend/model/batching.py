@@ -0,0 +1,93 @@
+# backend/model/batching.py
+import asyncio
+import logging
+from typing import Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Collects individual requests for a short window (or until max_batch_size
+    is reached) and runs them through batch_fn as one call, then hands each
+    caller its own result.
+
+    At most max_concurrent_batches batches run at once; requests arriving
+    while the limit is reached wait and go out together as soon as a slot
+    frees up, so batches grow naturally under load.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[T]], Awaitable[List[R]]],
+        max_batch_size: int = 8,
+        window_ms: float = 10.0,
+        max_concurrent_batches: int = 1,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running = 0
+        self.batches_run = 0
+        self.items_run = 0
+
+    async def submit(self, item: T) -> R:
+        """Queue one item and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size or self.window == 0:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "running_batches": self._running,
+            "batches_run": self.batches_run,
+            "items_run": self.items_run,
+            "avg_batch_size": round(self.items_run / self.batches_run, 2) if self.batches_run else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.window * 1000,
+        }
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending and self._running < self.max_concurrent_batches:
+            batch = [entry for entry in self._pending[:self.max_batch_size] if not entry[1].done()]
+            self._pending = self._pending[self.max_batch_size:]
+            if batch:
+                self._running += 1
+                asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        try:
+            results = await self.batch_fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.error("local_batch_failed", extra={"size": len(batch), "error": str(e)})
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._running -= 1
+            self.batches_run += 1
+            self.items_run += len(batch)
+            # Requests that queued up behind this batch have waited long enough
+            if self._pending:
+                self._dispatch()
@@ -0,0 +1,82 @@
+# backend/model/executor.py
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncGenerator, Callable, Iterable, Optional, TypeVar
+
+from config.settings import settings
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_SENTINEL = object()
+
+
+class StillRunning(asyncio.CancelledError):
+    """
+    Raised instead of a plain CancelledError when run_blocking is cancelled
+    after its call started: the thread cannot be interrupted, and `future`
+    completes when it returns. Callers that account for upstream load use it
+    to keep the call counted until then.
+    """
+
+    def __init__(self, future: Future):
+        super().__init__()
+        self.future = future
+# Optional hook that can wrap each blocking call (e.g. to profile it); None costs nothing
+_call_wrapper: Optional[Callable[[Callable], Callable]] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the shared thread pool used for blocking model SDK calls"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.model_executor_workers,
+                    thread_name_prefix="model-call",
+                )
+    return _executor
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    """Shut down the shared thread pool (it is recreated on next use)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+def set_call_wrapper(wrapper: Optional[Callable[[Callable], Callable]]) -> None:
+    """Install a function applied to every call before it is sent to the executor"""
+    global _call_wrapper
+    _call_wrapper = wrapper
+
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking call in the model executor without blocking the event loop"""
+    call = functools.partial(func, *args, **kwargs)
+    if _call_wrapper is not None:
+        call = _call_wrapper(call)
+    future = get_executor().submit(call)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # cancel() only succeeds if the call has not started yet
+        if future.cancel() or future.done():
+            raise
+        raise StillRunning(future) from None
+
+
+async def iterate_blocking(iterable: Iterable[T]) -> AsyncGenerator[T, None]:
+    """Iterate a blocking iterable (e.g. a streaming SDK response) one item per executor hop"""
+    iterator = await run_blocking(iter, iterable)
+    while True:
+        item = await run_blocking(next, iterator, _SENTINEL)
+        if item is _SENTINEL:
+            break
+        yield item
@@ -2,6 +2,7 @@
 import google.generativeai as genai
 from .base_model import BaseModel
 from config.settings import settings
+from .executor import run_blocking
 
 class GeminiModel(BaseModel):
     def __init__(self):
@@ -14,7 +15,8 @@ class GeminiModel(BaseModel):
     async def generate_content(self, prompt: str) -> str:
         """Generate with Gemini"""
         try:
-            response = self.model.generate_content(
+            response = await run_blocking(
+                self.model.generate_content,
                 prompt,
                 generation_config=genai.types.GenerationConfig(
                     max_output_tokens=settings.max_tokens,
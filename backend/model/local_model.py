@@ -1,70 +1,192 @@
 # backend/app/models/local_model.py
-import torch
+import logging
 import os
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from typing import AsyncGenerator, Callable, List, Optional
+from config.settings import settings
 from .base_model import BaseModel
+from .batching import MicroBatcher
+from .executor import run_blocking
+from .precision import load_with_precision, resolve_precision
+from .prefix_cache import PrefixCache
+from .streaming import IncrementalDecoder, make_stop_criteria, stream_from_thread
+
+logger = logging.getLogger(__name__)
 
 class Local20KModel(BaseModel):
-    def __init__(self, model_path: str = "models/content-generator-20k"):
+    max_new_tokens = 150
+    template_prefix = "Generate content:"
+
+    def __init__(self, model_path: str = "models/content-generator-20k", precision: Optional[str] = None):
         self.model_path = model_path
+        self.precision = precision or settings.local_model_precision
         self.model = None
         self.tokenizer = None
         self.is_loaded = False
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        
-    async def load_model(self):
-        """Load your 20k model"""
+        self.device = None
+        # Concurrent requests are grouped into one padded generate() call
+        self.batcher = MicroBatcher(
+            self._run_batch,
+            max_batch_size=settings.local_batch_max_size,
+            window_ms=settings.local_batch_window_ms,
+            max_concurrent_batches=settings.local_batch_max_concurrent
+        )
+        # KV state for the shared prompt template (and hot prompt heads)
+        self.prefix_cache = PrefixCache(
+            max_bytes=settings.local_prefix_cache_max_bytes,
+            head_tokens=settings.local_prefix_cache_head_tokens,
+            head_min_hits=settings.local_prefix_cache_head_min_hits
+        ) if settings.local_prefix_cache_enabled else None
+
+    def load(self):
+        """Load your 20k model (blocking)"""
         try:
-            print(f"🔄 Loading 20K model from {self.model_path}...")
+            # Heavy imports happen here, not at module import time
+            import torch
+            from transformers import AutoTokenizer, AutoModelForCausalLM
+
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            logger.info("local_model_loading", extra={"path": self.model_path})
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-            self.model = AutoModelForCausalLM.from_pretrained(
+            # Batched generation needs left padding so every prompt ends at the same position
+            self.tokenizer.padding_side = "left"
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            load_fp32 = lambda: AutoModelForCausalLM.from_pretrained(
                 self.model_path,
                 torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
                 device_map="auto" if torch.cuda.is_available() else None,
                 low_cpu_mem_usage=True
             )
+            if torch.cuda.is_available():
+                self.precision = "fp16"
+                self.model = load_fp32()
+            else:
+                self.precision = resolve_precision(self.precision)
+                self.model = load_with_precision(self.model_path, self.precision, load_fp32)
+            self.model.eval()
+            if self.prefix_cache is not None:
+                self._cache_prefix(self.tokenizer(self.template_prefix)["input_ids"])
             self.is_loaded = True
-            print(f"✅ 20K model loaded successfully on {self.device}")
+            logger.info("local_model_loaded", extra={"device": str(self.device), "precision": self.precision})
         except Exception as e:
-            print(f"❌ 20K model failed to load: {e}")
+            logger.error("local_model_load_failed", extra={"error": str(e)})
             self.is_loaded = False
-    
+
+    async def load_model(self):
+        """Load your 20k model without blocking the event loop"""
+        await run_blocking(self.load)
+
     async def generate_content(self, prompt: str) -> str:
         """Generate with your 20K model"""
         if not self.is_loaded:
             await self.load_model()
-            
+
         if not self.is_loaded:
             raise Exception("20K model not available")
-            
+
         try:
-            # Format prompt for your model
-            formatted_prompt = f"Generate content: {prompt}\n\nOutput:"
-            
-            inputs = self.tokenizer.encode(formatted_prompt, return_tensors="pt").to(self.device)
-            
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    inputs,
-                    max_length=len(inputs[0]) + 150,
-                    num_return_sequences=1,
-                    temperature=0.7,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    repetition_penalty=1.1,
-                    top_p=0.9
-                )
-            
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            response = response.replace(formatted_prompt, "").strip()
-            
-            return response
-            
+            return await self.batcher.submit(prompt)
         except Exception as e:
             raise Exception(f"20K model generation failed: {e}")
-    
+
+    async def _run_batch(self, prompts: List[str]) -> List[str]:
+        return await run_blocking(self.generate_batch, prompts)
+
+    def format_prompt(self, prompt: str) -> str:
+        """Format prompt for your model"""
+        return f"{self.template_prefix} {prompt}\n\nOutput:"
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """Generate for several prompts in one left-padded generate() call (blocking)"""
+        import torch
+
+        if len(prompts) == 1:
+            # A lone prompt has no padding, so it can start from a cached prefix
+            inputs = self._single_inputs(prompts[0])
+        else:
+            formatted_prompts = [self.format_prompt(prompt) for prompt in prompts]
+            inputs = self.tokenizer(
+                formatted_prompts, return_tensors="pt", padding=True
+            ).to(self.device)
+
+        with torch.no_grad():
+            outputs = self.model.generate(**inputs, **self._generation_kwargs())
+
+        # Only decode the newly generated tokens of each row
+        prompt_length = inputs["input_ids"].shape[1]
+        return [
+            self.tokenizer.decode(output[prompt_length:], skip_special_tokens=True).strip()
+            for output in outputs
+        ]
+
+    async def generate_stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        """Stream text from your 20K model token by token (not batched)"""
+        if not self.is_loaded:
+            raise Exception("20K model not available")
+        async for text in stream_from_thread(
+            lambda on_text, should_stop: self.generate_stream_blocking(prompt, on_text, should_stop)
+        ):
+            yield text
+
+    def generate_stream_blocking(
+        self,
+        prompt: str,
+        on_text: Callable[[str], None],
+        should_stop: Callable[[], bool]
+    ) -> None:
+        """Generate for one prompt, calling on_text with each decoded piece (blocking)"""
+        import torch
+
+        inputs = self._single_inputs(prompt)
+        with torch.no_grad():
+            self.model.generate(
+                **inputs,
+                streamer=IncrementalDecoder(self.tokenizer, on_text),
+                stopping_criteria=make_stop_criteria(should_stop),
+                **self._generation_kwargs()
+            )
+
+    def _single_inputs(self, prompt: str) -> dict:
+        """generate() inputs for one prompt, resuming from a cached prefix when possible"""
+        inputs = dict(self.tokenizer(self.format_prompt(prompt), return_tensors="pt").to(self.device))
+        if self.prefix_cache is None:
+            return inputs
+
+        ids = inputs["input_ids"][0].tolist()
+        head = self.prefix_cache.hot_head(ids)
+        if head is not None:
+            self._cache_prefix(head)
+        cached = self.prefix_cache.lookup(ids)
+        if cached is not None:
+            # generate() only runs the model over the tokens after the cached prefix
+            inputs["past_key_values"] = cached[1]
+        return inputs
+
+    def _cache_prefix(self, ids: List[int]) -> None:
+        """Run the model over a token prefix once and keep its KV state"""
+        import torch
+
+        if self.prefix_cache.contains(ids):
+            return
+        with torch.no_grad():
+            output = self.model(
+                torch.tensor([ids], device=self.device), use_cache=True
+            )
+        self.prefix_cache.store(ids, output.past_key_values)
+
+    def _generation_kwargs(self) -> dict:
+        return dict(
+            max_new_tokens=self.max_new_tokens,
+            num_return_sequences=1,
+            temperature=0.7,
+            do_sample=True,
+            pad_token_id=self.tokenizer.pad_token_id,
+            repetition_penalty=1.1,
+            top_p=0.9
+        )
+
     def is_available(self) -> bool:
         return self.is_loaded and os.path.exists(self.model_path)
-    
+
     def get_model_name(self) -> str:
         return "Local 20K Model"
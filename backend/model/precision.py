@@ -0,0 +1,161 @@
+# backend/model/precision.py
+import hashlib
+import logging
+import os
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "int8", "bf16")
+
+
+def cpu_supports_bf16() -> bool:
+    """True when the CPU has native bf16 matmul (AVX512-BF16 or AMX)"""
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            flags = cpuinfo.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def resolve_precision(requested: str) -> str:
+    """Precision actually used on this CPU; bf16 falls back to fp32 without hardware support"""
+    if requested not in PRECISIONS:
+        raise ValueError(f"Unknown local model precision: {requested}")
+    if requested == "bf16" and not cpu_supports_bf16():
+        logger.warning("bf16_unsupported", extra={"fallback": "fp32"})
+        return "fp32"
+    return requested
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of the model's linear layers (weights int8, activations fp32)"""
+    import torch
+
+    _conv1d_to_linear(model)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _int8_skeleton(model_path: str):
+    """
+    The module structure quantize_int8 produces, built without reading or
+    converting any weights (they come from the cached state_dict)
+    """
+    import torch
+    from transformers import AutoConfig, AutoModelForCausalLM
+    from transformers.pytorch_utils import Conv1D
+
+    with torch.device("meta"):
+        model = AutoModelForCausalLM.from_config(AutoConfig.from_pretrained(model_path))
+
+    def swap(module) -> None:
+        for name, child in module.named_children():
+            if isinstance(child, Conv1D):
+                shape = (child.weight.shape[0], child.nf)
+            elif isinstance(child, torch.nn.Linear):
+                shape = (child.in_features, child.out_features)
+            else:
+                swap(child)
+                continue
+            setattr(module, name, torch.ao.nn.quantized.dynamic.Linear(
+                *shape, bias_=child.bias is not None, dtype=torch.qint8
+            ))
+
+    swap(model)
+    return model
+
+
+# Non-persistent buffers (e.g. rotary inv_freq) are not in a state_dict but
+# are saved alongside it, since the meta-device skeleton cannot compute them
+_BUFFER_PREFIX = "non_persistent_buffer."
+
+
+def _int8_state(model) -> dict:
+    state = model.state_dict()
+    for name, buffer in model.named_buffers():
+        if name not in state:
+            state[_BUFFER_PREFIX + name] = buffer
+    return state
+
+
+def _load_int8(model_path: str, state: dict):
+    """Rebuild the quantized model from a cached state and check that it runs"""
+    import itertools
+
+    import torch
+
+    buffers = {key[len(_BUFFER_PREFIX):]: state.pop(key) for key in list(state) if key.startswith(_BUFFER_PREFIX)}
+    model = _int8_skeleton(model_path)
+    model.load_state_dict(state, assign=True)
+    for name, tensor in buffers.items():
+        module_name, _, buffer_name = name.rpartition(".")
+        model.get_submodule(module_name)._buffers[buffer_name] = tensor
+    for name, tensor in itertools.chain(model.named_parameters(), model.named_buffers()):
+        if tensor.is_meta:
+            raise ValueError(f"Cached model has no value for {name}")
+    # Fail here, where we can re-quantize, rather than on the first request
+    with torch.no_grad():
+        model(torch.tensor([[0]]))
+    return model
+
+
+def _conv1d_to_linear(module) -> None:
+    """GPT-2 style models use transformers' Conv1D, which quantize_dynamic skips"""
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            linear = torch.nn.Linear(child.weight.shape[0], child.nf)
+            linear.weight = torch.nn.Parameter(child.weight.detach().t().contiguous())
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
+
+def artifact_path(model_path: str, precision: str) -> str:
+    """Where the converted model for a precision is cached, keyed on the weights and torch version"""
+    import torch
+
+    fingerprint = hashlib.sha256(torch.__version__.encode())
+    for name in sorted(os.listdir(model_path)):
+        path = os.path.join(model_path, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            fingerprint.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return os.path.join(model_path, ".cache", f"{precision}-{fingerprint.hexdigest()[:16]}.pt")
+
+
+def load_with_precision(model_path: str, precision: str, load_fp32: Callable):
+    """
+    Load the model at the given CPU precision. int8 conversion is slow, so the
+    quantized weights are cached on disk and reused by later starts. The cache
+    holds a state_dict read with weights_only=True: unpickling a whole module
+    would run any code planted in the model directory. A cached model that does
+    not load or run is replaced by a fresh quantization.
+    """
+    import torch
+
+    if precision == "bf16":
+        return load_fp32().to(torch.bfloat16)
+    if precision != "int8":
+        return load_fp32()
+
+    path = artifact_path(model_path, precision)
+    if os.path.exists(path):
+        try:
+            return _load_int8(model_path, torch.load(path, weights_only=True))
+        except Exception as e:
+            logger.warning("quantized_model_unreadable", extra={"path": path, "error": str(e)})
+
+    model = quantize_int8(load_fp32())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save(_int8_state(model), tmp_path)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("quantized_model_cache_failed", extra={"path": path, "error": str(e)})
+    return model
@@ -0,0 +1,121 @@
+# backend/model/prefix_cache.py
+import copy
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+
+def cache_nbytes(past_key_values) -> int:
+    """Approximate memory held by a transformers KV cache"""
+    layers = getattr(past_key_values, "layers", None)
+    if layers is not None:
+        return sum(
+            tensor.nbytes
+            for layer in layers
+            for tensor in (getattr(layer, "keys", None), getattr(layer, "values", None))
+            if tensor is not None
+        )
+    key_cache = getattr(past_key_values, "key_cache", None)
+    if key_cache is not None:
+        return sum(t.nbytes for t in key_cache) + sum(t.nbytes for t in past_key_values.value_cache)
+    return sum(t.nbytes for layer in past_key_values for t in layer)
+
+
+class PrefixCache:
+    """
+    LRU store of past key/values for token prefixes, bounded by memory.
+
+    lookup() finds the longest cached prefix of a token sequence and returns a
+    private copy of its KV state, so generation can skip re-encoding it. Prompt
+    heads (the first head_tokens tokens) are counted and become worth caching
+    once they have been seen head_min_hits times.
+    """
+
+    def __init__(self, max_bytes: int, head_tokens: int = 32, head_min_hits: int = 2,
+                 max_tracked_heads: int = 4096):
+        self.max_bytes = max_bytes
+        self.head_tokens = head_tokens
+        self.head_min_hits = head_min_hits
+        self.max_tracked_heads = max_tracked_heads
+        self._entries: "OrderedDict[Tuple[int, ...], Tuple[object, int]]" = OrderedDict()
+        self._head_counts: "OrderedDict[Tuple[int, ...], int]" = OrderedDict()
+        self._lengths: dict = {}  # prefix length -> number of entries with that length
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokens_saved = 0
+
+    def lookup(self, ids: Sequence[int]) -> Optional[Tuple[int, object]]:
+        """Return (prefix_length, copied_past_key_values) for the longest cached prefix"""
+        with self._lock:
+            entry = None
+            # Need at least one uncached token left to run the model on
+            for length in sorted(self._lengths, reverse=True):
+                if length >= len(ids):
+                    continue
+                key = tuple(ids[:length])
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    entry = (length, self._entries[key][0])
+                    break
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.tokens_saved += entry[0]
+        # Generation mutates the cache in place, so hand out a copy
+        return entry[0], copy.deepcopy(entry[1])
+
+    def contains(self, ids: Sequence[int]) -> bool:
+        with self._lock:
+            return tuple(ids) in self._entries
+
+    def store(self, ids: Sequence[int], past_key_values) -> None:
+        size = cache_nbytes(past_key_values)
+        if size > self.max_bytes:
+            return
+        key = tuple(ids)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (past_key_values, size)
+            self._lengths[len(key)] = self._lengths.get(len(key), 0) + 1
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self._lengths[len(old_key)] -= 1
+                if not self._lengths[len(old_key)]:
+                    del self._lengths[len(old_key)]
+                self.evictions += 1
+
+    def hot_head(self, ids: Sequence[int]) -> Optional[List[int]]:
+        """Count this prompt's head; return it once it is frequent enough to cache"""
+        if self.head_tokens <= 0 or len(ids) <= self.head_tokens:
+            return None
+        head = tuple(ids[:self.head_tokens])
+        with self._lock:
+            if head in self._entries:
+                return None
+            count = self._head_counts.pop(head, 0) + 1
+            self._head_counts[head] = count
+            while len(self._head_counts) > self.max_tracked_heads:
+                self._head_counts.popitem(last=False)
+        return list(head) if count >= self.head_min_hits else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "tokens_saved": self.tokens_saved,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
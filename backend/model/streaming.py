@@ -0,0 +1,114 @@
+# backend/model/streaming.py
+import asyncio
+import threading
+from typing import AsyncGenerator, Callable, List
+
+from .executor import run_blocking
+
+_END = object()
+
+
+class IncrementalDecoder:
+    """
+    transformers streamer that turns generated token ids into text deltas.
+
+    Only a small window of recent tokens is re-decoded per step (the
+    prefix/read offset technique), so cost per token stays constant instead of
+    growing with the output length. Partial multi-byte characters are held
+    back until they are complete.
+    """
+
+    def __init__(self, tokenizer, on_text: Callable[[str], None], skip_prompt: bool = True):
+        self.tokenizer = tokenizer
+        self.on_text = on_text
+        self.skip_prompt = skip_prompt
+        self.tokens: List[int] = []
+        self._prefix_offset = 0
+        self._read_offset = 0
+        self._prompt_seen = False
+
+    def put(self, value) -> None:
+        """Called by generate() with the prompt ids first, then each new token"""
+        if self.skip_prompt and not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        if value.dim() > 1:
+            if value.shape[0] > 1:
+                raise ValueError("IncrementalDecoder only supports batch size 1")
+            value = value[0]
+        self.tokens.extend(value.tolist())
+        text = self._decode_new()
+        if text:
+            self.on_text(text)
+
+    def end(self) -> None:
+        """Flush whatever is left once generation finishes"""
+        text = self._decode(self._prefix_offset, len(self.tokens))
+        prefix = self._decode(self._prefix_offset, self._read_offset)
+        if len(text) > len(prefix):
+            self.on_text(text[len(prefix):])
+        self._prefix_offset = self._read_offset = len(self.tokens)
+
+    def _decode(self, start: int, end: int) -> str:
+        return self.tokenizer.decode(self.tokens[start:end], skip_special_tokens=True)
+
+    def _decode_new(self) -> str:
+        prefix_text = self._decode(self._prefix_offset, self._read_offset)
+        new_text = self._decode(self._prefix_offset, len(self.tokens))
+        if len(new_text) > len(prefix_text) and not new_text.endswith("�"):
+            self._prefix_offset = self._read_offset
+            self._read_offset = len(self.tokens)
+            return new_text[len(prefix_text):]
+        return ""
+
+
+def make_stop_criteria(should_stop: Callable[[], bool]):
+    """StoppingCriteriaList that ends generation as soon as should_stop() is true"""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class _StopWhen(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full(
+                (input_ids.shape[0],), bool(should_stop()), dtype=torch.bool, device=input_ids.device
+            )
+
+    return StoppingCriteriaList([_StopWhen()])
+
+
+async def stream_from_thread(
+    run: Callable[[Callable[[str], None], Callable[[], bool]], None]
+) -> AsyncGenerator[str, None]:
+    """
+    Run a blocking generate loop in the model executor and yield its text as it
+    is produced. run(on_text, should_stop) is called in a worker thread; closing
+    this generator (e.g. on client disconnect) makes should_stop() return True.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(item) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            stop.set()  # event loop closed, nobody is listening
+
+    def target() -> None:
+        try:
+            run(put, stop.is_set)
+        finally:
+            put(_END)
+
+    task = asyncio.ensure_future(run_blocking(target))
+    # The consumer may leave early; don't warn about an unretrieved error then
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    try:
+        while True:
+            text = await queue.get()
+            if text is _END:
+                break
+            yield text
+        await task  # surface generation errors
+    finally:
+        stop.set()
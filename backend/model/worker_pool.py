@@ -0,0 +1,350 @@
+# backend/model/worker_pool.py
+import asyncio
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import connection
+from typing import AsyncGenerator, Dict, List, Optional, Tuple, Union
+
+from config.settings import settings
+from .base_model import BaseModel
+from .batching import MicroBatcher
+from .executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+_STOP = None
+
+
+def _worker_main(model_path: str, threads: int, conn, cancel) -> None:
+    """Entry point of a worker process: load the model once, then serve requests"""
+    # Pin the intra-op thread pool before torch spins it up
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+    from .local_model import Local20KModel
+
+    model = Local20KModel(model_path)
+    model.load()
+    conn.send(("ready", None, model.is_loaded))
+    if not model.is_loaded:
+        return
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break  # API process went away
+        if message is _STOP:
+            break
+        kind, request_id, payload = message
+        try:
+            if kind == "stream":
+                model.generate_stream_blocking(
+                    payload,
+                    lambda text: conn.send(("chunk", request_id, text)),
+                    lambda: cancel.value == request_id
+                )
+                conn.send(("end", request_id, None))
+            else:
+                conn.send(("result", request_id, model.generate_batch(payload)))
+        except Exception as e:
+            conn.send(("error", request_id, str(e)))
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.conn: Optional[connection.Connection] = None
+        self.cancel = None  # shared id of the stream the worker should abandon
+        self.send_lock = threading.Lock()  # one writer per pipe at a time
+        self.channel_open = False
+        self.ready = False
+        self.load_failed = False
+        self.in_flight: Dict[int, int] = {}  # request_id -> batch size
+        self.restarts = 0
+        self.started_at = 0.0
+
+
+class LocalModelWorkerPool(BaseModel):
+    """
+    Runs the local model in separate processes so CPU-bound generation never
+    touches the API process's event loop. Each worker loads the model once and
+    serves batches and token streams over its own pipe, so a crashed worker
+    cannot wedge the others; a background thread reads results. Crashed workers are restarted
+    and their in-flight requests fail fast so callers can fall back to Gemini.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        num_workers: int,
+        intra_op_threads: int = 0,
+        restart_backoff_seconds: float = 5.0,
+    ):
+        self.model_path = model_path
+        self.num_workers = max(1, num_workers)
+        self.intra_op_threads = intra_op_threads or max(1, (os.cpu_count() or 1) // self.num_workers)
+        self.restart_backoff_seconds = restart_backoff_seconds
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(i) for i in range(self.num_workers)]
+        # request_id -> (loop, future for a batch | queue for a stream)
+        self._pending: Dict[int, Tuple[asyncio.AbstractEventLoop, Union[asyncio.Future, asyncio.Queue]]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.started = False
+        # Batch in the API process, one batch in flight per worker
+        self.batcher = MicroBatcher(
+            self.generate_batch,
+            max_batch_size=settings.local_batch_max_size,
+            window_ms=settings.local_batch_window_ms,
+            max_concurrent_batches=self.num_workers
+        )
+
+    def start(self) -> None:
+        """Spawn the worker processes and the result/monitor threads"""
+        if self.started:
+            return
+        self.started = True
+        for worker in self._workers:
+            self._spawn(worker)
+        for target, name in ((self._read_results, "worker-results"), (self._monitor, "worker-monitor")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Ask workers to exit, then terminate any that do not"""
+        if not self.started or self._stopping.is_set():
+            return
+        self._stopping.set()
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                try:
+                    self._send(worker, _STOP)
+                except OSError:
+                    pass
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(max(0.0, deadline - time.monotonic()))
+                if worker.process.is_alive():
+                    worker.process.terminate()
+        self._fail_all("Local model worker pool stopped")
+
+    async def generate_content(self, prompt: str) -> str:
+        """Generate with the local model in a worker process (batched)"""
+        if not self.is_available():
+            raise Exception("No local model worker is ready")
+        return await self.batcher.submit(prompt)
+
+    async def generate_batch(self, prompts: List[str]) -> List[str]:
+        """Send one batch to the least loaded ready worker and await its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self._submit("batch", prompts, (loop, future), len(prompts))
+        return await future
+
+    async def generate_stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        """Stream text for one prompt from a worker; closing the generator cancels it"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        worker, request_id = await self._submit("stream", prompt, (loop, queue), 1)
+        finished = False
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == "chunk":
+                    yield payload
+                elif kind == "end":
+                    finished = True
+                    return
+                else:
+                    finished = True
+                    raise Exception(payload)
+        finally:
+            if not finished:
+                # Tell the worker to stop generating tokens nobody will read
+                worker.cancel.value = request_id
+
+    async def _submit(self, kind: str, payload, entry, size: int) -> Tuple[_Worker, int]:
+        """
+        Assign a request to the least loaded ready worker and send it. Failures
+        after assignment are delivered to the request's future or queue.
+        """
+        with self._lock:
+            ready = [worker for worker in self._workers if worker.ready]
+            if not ready:
+                raise Exception("No local model worker is ready")
+            worker = min(ready, key=lambda w: sum(w.in_flight.values()))
+            request_id = next(self._ids)
+            self._pending[request_id] = entry
+            worker.in_flight[request_id] = size
+        try:
+            # A pipe write blocks once the buffer is full (large batch, busy
+            # worker), so it never runs on the event loop or under self._lock
+            await run_blocking(self._send, worker, (kind, request_id, payload))
+        except OSError as e:
+            worker.ready = False
+            with self._lock:
+                worker.in_flight.pop(request_id, None)
+                lost = self._pending.pop(request_id, None)
+            if lost is not None:
+                _apply(lost[1], "error", f"Local model worker {worker.index} is unreachable: {e}")
+        return worker, request_id
+
+    @staticmethod
+    def _send(worker: _Worker, message) -> None:
+        with worker.send_lock:
+            worker.conn.send(message)
+
+    def is_available(self) -> bool:
+        return self.started and any(worker.ready for worker in self._workers)
+
+    @property
+    def load_failed(self) -> bool:
+        """Every worker reported that it could not load the model (they are not restarted)"""
+        return self.started and all(worker.load_failed for worker in self._workers)
+
+    def get_model_name(self) -> str:
+        return f"Local 20K Model ({self.num_workers} workers)"
+
+    def stats(self) -> dict:
+        return {
+            "workers": [
+                {
+                    "index": worker.index,
+                    "pid": worker.process.pid if worker.process else None,
+                    "alive": bool(worker.process and worker.process.is_alive()),
+                    "ready": worker.ready,
+                    "in_flight": sum(worker.in_flight.values()),
+                    "restarts": worker.restarts,
+                }
+                for worker in self._workers
+            ],
+            "intra_op_threads": self.intra_op_threads,
+            "batcher": self.batcher.stats(),
+        }
+
+    def _spawn(self, worker: _Worker) -> None:
+        if worker.conn is not None:
+            # A send to the dead worker fails with a broken pipe rather than blocking
+            with worker.send_lock:
+                worker.conn.close()
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        worker.cancel = self._ctx.Value("q", -1, lock=False)
+        worker.ready = False
+        worker.started_at = time.monotonic()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.model_path, self.intra_op_threads, child_conn, worker.cancel),
+            name=f"local-model-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        child_conn.close()
+        worker.conn = parent_conn
+        worker.channel_open = True
+        logger.info("local_worker_started", extra={"worker": worker.index, "pid": worker.process.pid})
+
+    def _read_results(self) -> None:
+        while not self._stopping.is_set():
+            conns = {
+                worker.conn: worker for worker in self._workers
+                if worker.conn is not None and worker.channel_open
+            }
+            try:
+                readable = connection.wait(list(conns), timeout=0.5)
+            except (OSError, ValueError):
+                continue  # a pipe was replaced by a restart mid-wait
+            for conn in readable:
+                worker = conns[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    # Worker died; the monitor fails its requests and restarts it
+                    worker.channel_open = False
+                    worker.ready = False
+                    continue
+                self._handle_message(worker, message)
+
+    def _handle_message(self, worker: _Worker, message) -> None:
+        kind, request_id, payload = message
+        if kind == "ready":
+            worker.ready = bool(payload)
+            worker.load_failed = not payload
+            if not payload:
+                logger.error("local_worker_load_failed", extra={"worker": worker.index})
+            return
+        with self._lock:
+            if kind == "chunk":
+                entry = self._pending.get(request_id)
+            else:
+                worker.in_flight.pop(request_id, None)
+                entry = self._pending.pop(request_id, None)
+        if entry is not None:
+            _deliver(entry, kind, payload)
+
+    def _monitor(self) -> None:
+        while not self._stopping.wait(1.0):
+            for worker in self._workers:
+                if worker.process is None or worker.process.is_alive():
+                    continue
+                with self._lock:
+                    worker.ready = False
+                    lost = list(worker.in_flight)
+                    worker.in_flight.clear()
+                    entries = [self._pending.pop(rid, None) for rid in lost]
+                for entry in entries:
+                    if entry is not None:
+                        _deliver(entry, "error", "Local model worker crashed")
+                # A model that cannot load will not load on retry either
+                if worker.load_failed:
+                    continue
+                # Avoid a tight crash loop
+                if time.monotonic() - worker.started_at < self.restart_backoff_seconds:
+                    continue
+                logger.warning("local_worker_restarting", extra={
+                    "worker": worker.index, "exit_code": worker.process.exitcode
+                })
+                worker.restarts += 1
+                with self._lock:
+                    self._spawn(worker)
+
+    def _fail_all(self, message: str) -> None:
+        with self._lock:
+            entries = list(self._pending.values())
+            self._pending.clear()
+            for worker in self._workers:
+                worker.in_flight.clear()
+        for entry in entries:
+            _deliver(entry, "error", message)
+
+
+def _deliver(entry, kind: str, payload) -> None:
+    """Hand a worker message to its waiting future or stream queue (from any thread)"""
+    loop, sink = entry
+    try:
+        loop.call_soon_threadsafe(_apply, sink, kind, payload)
+    except RuntimeError:
+        pass  # event loop already closed
+
+
+def _apply(sink, kind: str, payload) -> None:
+    if isinstance(sink, asyncio.Queue):
+        sink.put_nowait((kind, payload))
+    elif not sink.done():
+        if kind == "result":
+            sink.set_result(payload)
+        else:
+            sink.set_exception(Exception(payload))
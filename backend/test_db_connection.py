@@ -1,19 +1,24 @@
 # test_db_connection.py
-from database import engine
-from models import Conversation, Message
-from sqlalchemy.orm import sessionmaker
+import asyncio
+
+from sqlalchemy import func, select
+
+from app.database import engine, async_session, init_models
+from app.models import Conversation
+
+async def _count_conversations():
+    try:
+        await init_models()
+        async with async_session() as session:
+            return await session.scalar(select(func.count()).select_from(Conversation))
+    finally:
+        await engine.dispose()
 
 def test_connection():
     try:
-        SessionLocal = sessionmaker(bind=engine)
-        db = SessionLocal()
-        
-        # Test query
-        count = db.query(Conversation).count()
+        count = asyncio.run(_count_conversations())
         print(f"✅ Database connection successful!")
         print(f"✅ Current conversations in database: {count}")
-        
-        db.close()
         return True
     except Exception as e:
         print(f"❌ Database connection failed: {e}")